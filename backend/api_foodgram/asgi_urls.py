@@ -0,0 +1,11 @@
+"""URLs of the ASGI application: the read endpoints of the API are served
+by async views, the rest by the same views as in the WSGI application."""
+
+from api.urls import async_urlpatterns
+from django.urls import include, path
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include(async_urlpatterns)),
+] + sync_urlpatterns
@@ -48,19 +48,28 @@ INSTALLED_APPS = [
     'recipes.apps.RecipesConfig',
     'shopping_carts.apps.ShoppingCartsConfig',
     'api.apps.ApiConfig',
+    'benchmarks.apps.BenchmarksConfig',
+    'monitoring.apps.MonitoringConfig',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.RequestIdMiddleware',
+    'monitoring.middleware.MetricsMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.throttling.ThrottleMiddleware',
+    'monitoring.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'api_foodgram.urls'
+# The ASGI application (asgi.py) uses api_foodgram.asgi_urls with the async
+# read path of the API
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'api_foodgram.urls')
 
 TEMPLATES = [
     {
@@ -90,16 +99,123 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Seconds to keep a connection open between requests, 0 closes it
+        # at the end of every request
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Check reused connections before requests (monitoring.connections)
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'),
+        # Required behind a pooler in transaction mode, e.g. PgBouncer
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True'),
     }
 }
 
+# Read replicas of the default database: comma separated hosts (`host` or
+# `host:port`) of PostgreSQL replicas, or paths to copies of the database
+# file for SQLite. GET requests of the API read from them (api.replicas)
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        # Tests use the default database instead
+        'TEST': {'MIRROR': 'default'},
+    }
+    if 'sqlite' in DATABASES[alias]['ENGINE']:
+        DATABASES[alias]['NAME'] = replica.strip()
+    else:
+        host, _, port = replica.strip().partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# For how long a user reads from the primary after a write, so they see
+# their own changes in spite of the replication lag
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+# The pins are kept in a cache of their own, so they are not culled to
+# make room for the other values
+REPLICA_PIN_CACHE = 'replica_pins'
+
+# Cache
+# The default local memory cache is per process, use a shared backend
+# (for example FileBasedCache) with several workers
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+# A full cache removes 1/CACHE_CULL_FREQUENCY of its entries, FileBasedCache
+# lists all its files to do it
+CACHE_OPTIONS = {
+    'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    'CULL_FREQUENCY': int(os.getenv('CACHE_CULL_FREQUENCY', 10)),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': CACHE_OPTIONS,
+    },
+    REPLICA_PIN_CACHE: {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'REPLICA_PIN_CACHE_LOCATION', f'{CACHE_LOCATION}_replica_pins'),
+        'OPTIONS': CACHE_OPTIONS,
+    },
+}
+# Cache of tags, ingredients and recipes of the API (api.caching): an
+# in-process LRU of API_CACHE_LOCAL_SIZE values in front of the shared
+# API_CACHE. API_CACHE_TIMEOUT=0 disables it
+API_CACHE = os.getenv('API_CACHE', 'default')
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 300))
+API_CACHE_LOCAL_SIZE = int(os.getenv('API_CACHE_LOCAL_SIZE', 1000))
+# Full-page cache of the recipe list for anonymous users (api.page_cache),
+# kept in API_CACHE. PAGE_CACHE_TIMEOUT=0 disables it
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 600))
+# Favorites, cart and followings of the users (api.memberships), kept in
+# API_CACHE. MEMBERSHIP_CACHE_TIMEOUT=0 disables it
+MEMBERSHIP_CACHE_TIMEOUT = int(os.getenv('MEMBERSHIP_CACHE_TIMEOUT', 600))
+
+# Seconds in which the weight of a favorite or a cart addition in the
+# trending score of a recipe halves (api.popularity)
+TRENDING_HALF_LIFE = int(os.getenv('TRENDING_HALF_LIFE', 24 * 60 * 60))
+
+# Bytes of the body of POST /api/recipes/import/, so the import finishes
+# well under GUNICORN_TIMEOUT. The import_recipes command has no limit
+RECIPE_IMPORT_MAX_SIZE = int(
+    os.getenv('RECIPE_IMPORT_MAX_SIZE', 5 * 1024 * 1024))
+
+# Token bucket limits of the endpoints by URL name (api.throttling), e.g.
+# THROTTLE_RATES=token-login=10/min,ingredients-list:anon=60/min:20
+# The buckets are kept in THROTTLE_CACHE, its backend should be shared by
+# the workers
+THROTTLE_RATES = dict(
+    item.strip().split('=', 1)
+    for item in os.getenv(
+        'THROTTLE_RATES',
+        'token-login=10/min,'
+        'recipes-download-shopping-cart=10/min,'
+        'users-export=2/min,'
+        'recipes-import=2/min,'
+        'ingredients-list=120/min:30',
+    ).split(',')
+    if item.strip()
+)
+THROTTLE_STORE = os.getenv(
+    'THROTTLE_STORE', 'api.throttling.CacheBucketStore')
+THROTTLE_CACHE = os.getenv('THROTTLE_CACHE', 'default')
 
 # Rest Framework
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': (
         'api.pagination.PageLimitPagination'
     ),
+    # Proxies in front of the backend, which add the client address to
+    # X-Forwarded-For header (throttling of anonymous clients)
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
     'PAGE_SIZE': 100,
 
     'DEFAULT_PERMISSION_CLASSES': [
@@ -107,39 +223,82 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'api.authentication.TokenAuthentication',
+    ],
+
+    # orjson based, fall back to the standard ones without orjson
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Counts of querysets estimated by PostgreSQL planner above this number of
+# rows are not counted exactly (api.estimates), 0 always counts exactly
+EXACT_COUNT_THRESHOLD = int(os.getenv('EXACT_COUNT_THRESHOLD', 10000))
+
+# Responses larger than this (in bytes) are compressed by brotli or gzip
+# (api.middleware), 0 disables the compression
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
 # Logging
+# The records are written into the file as JSON lines by a background thread
+# (monitoring.logs). Under gunicorn with preload the master process writes
+# the records of all the workers
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
+os.makedirs(LOGS_DIR, exist_ok=True)
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING')
+# The file is rotated at this size (in bytes), 0 disables the rotation
+LOG_FILE_MAX_BYTES = int(os.getenv('LOG_FILE_MAX_BYTES', 10 * 1024 * 1024))
+LOG_FILE_BACKUP_COUNT = int(os.getenv('LOG_FILE_BACKUP_COUNT', 5))
 
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'standard': {
-            'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        'json': {
+            '()': 'monitoring.logs.JsonFormatter',
         },
     },
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'formatter': 'standard',
+            'class': 'monitoring.logs.QueueFileHandler',
+            'formatter': 'json',
             'filename': os.path.join(LOGS_DIR, 'logs.log'),
+            'max_bytes': LOG_FILE_MAX_BYTES,
+            'backup_count': LOG_FILE_BACKUP_COUNT,
         }
     },
+    # The records of the views and of the libraries reach the file too
+    'root': {
+        'handlers': ['file'],
+        'level': LOG_LEVEL,
+    },
     'loggers': {
         'django': {
-            'handlers': ['file'],
             'level': LOG_LEVEL,
             'propagate': True,
         },
     },
 }
 
+# Metrics
+# Directory shared by all the gunicorn workers, so /metrics endpoint
+# aggregates the metrics of all of them. It should be emptied on server start
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+# How often (in seconds) every worker dumps its metrics into the directory
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+
+# Profiling of requests on demand of staff users
+PROFILES_DIR = os.getenv('PROFILES_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILER_MAX_PROFILES = int(os.getenv('PROFILER_MAX_PROFILES', 50))
+
 # Swagger
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
@@ -147,6 +306,9 @@ SWAGGER_SETTINGS = {
         'Token': {'type': 'apiKey', 'name': 'Authorization', 'in': "header"}
     },
 }
+# The schema written by generate_schema command, served by api.schema
+SWAGGER_SCHEMA_FILE = os.getenv(
+    'SWAGGER_SCHEMA_FILE', os.path.join(BASE_DIR, 'swagger.json'))
 
 
 # Password validation
@@ -189,6 +351,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Files generated for the users (api.files). They are not public: nginx
+# sends them from its internal location PROTECTED_MEDIA_URL when the
+# response has X-Accel-Redirect header. Without nginx Django sends them
+PROTECTED_MEDIA_URL = '/protected/'
+PROTECTED_MEDIA_ROOT = os.getenv(
+    'PROTECTED_MEDIA_ROOT', os.path.join(BASE_DIR, 'protected'))
+USE_X_ACCEL_REDIRECT = os.getenv('USE_X_ACCEL_REDIRECT', 'False') == 'True'
+
 # Font direcroty
 FONT_ROOT = os.path.join(STATIC_ROOT, 'fonts')
 
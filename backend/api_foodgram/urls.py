@@ -1,14 +1,15 @@
+from api.schema import CachedSchemaView
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path, re_path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
+from monitoring.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Is not proxied by nginx, so it is available inside the docker network
+    path('metrics', metrics, name='metrics'),
 ]
 
 # For media files
@@ -17,30 +18,16 @@ if settings.DEBUG:
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
 
-# For Swagger
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Snippets API",
-        default_version='v1',
-        description="Test description",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@snippets.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
-
-
+# For Swagger, the schema is generated once (api.schema)
 urlpatterns += [
     re_path(
         r'^swagger(?P<format>\.json|\.yaml)$',
-        schema_view.without_ui(cache_timeout=0),
+        CachedSchemaView.without_ui(),
         name='schema-json'
     ),
     re_path(
         r'^swagger/$',
-        schema_view.with_ui('swagger', cache_timeout=0),
+        CachedSchemaView.with_ui('swagger'),
         name='schema-swagger-ui'
     ),
 ]
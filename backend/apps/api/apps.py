@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import caching, checks, page_cache  # noqa: F401
+
+        caching.connect_signals()
+        page_cache.connect_signals()
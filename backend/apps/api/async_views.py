@@ -0,0 +1,47 @@
+"""Async versions of the read endpoints of the API for the ASGI application.
+
+Django ORM is sync only, so the view itself still runs in a worker thread,
+but the requests do not pass the whole middleware chain through sync
+adapters. Reads run in the shared thread pool of the event loop, so the
+threads and their database connections are reused between the requests
+(Django creates a new thread for every request otherwise). Writes keep the
+default thread sensitive mode.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from monitoring.connections import check_connections
+from monitoring.profiling import profile_thread
+from rest_framework.permissions import SAFE_METHODS
+
+
+def async_view(view):
+    """Wraps the sync DRF view into an async one."""
+    def read(request, *args, **kwargs):
+        # The connections of pool threads are not handled by the request
+        # signals, so expired and broken ones are closed here
+        close_old_connections()
+        check_connections()
+        try:
+            with profile_thread():
+                response = view(request, *args, **kwargs)
+                # Rendering is CPU bound, so it is kept out of the loop too
+                if hasattr(response, 'render'):
+                    response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    async_read = sync_to_async(read, thread_sensitive=False)
+    async_write = sync_to_async(view)
+
+    # Keeps `cls`, `actions` and `csrf_exempt` attributes of the view
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await async_read(request, *args, **kwargs)
+        return await async_write(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,14 @@
+"""Authentication of the API requests."""
+
+from rest_framework import authentication
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """TokenAuthentication which reuses the token checked by the throttling
+    (api.throttling) of the request."""
+
+    def authenticate(self, request):
+        token = getattr(request._request, 'checked_token', None)
+        if token is not None:
+            return token.user, token
+        return super().authenticate(request)
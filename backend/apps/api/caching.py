@@ -0,0 +1,274 @@
+"""Two-tier cache of the API reads.
+
+The values are kept in a bounded in-process LRU in front of the shared
+cache API_CACHE. Their keys contain the versions of the namespaces the
+value depends on (tags, ingredients, recipes, users), kept in the shared
+cache too, so a write bumps the version of its namespace and the stale
+entries of all the workers are never read again and expire by themselves.
+The versions are read from the shared cache on every lookup, one round
+trip per request.
+
+A value missing in both tiers is computed by one thread of the process,
+the others wait for it, and by one process: the one which has taken the
+fill lock of the shared cache (api.locks), the rest wait for the lock for
+up to LOCK_TIMEOUT seconds and read the value. The fills are single-flight
+with the file, database, memcached and redis backends. With other
+backends (`has_lock()` is False) the processes may fill a value at the
+same time. The fills read from the primary database, so replication lag
+is not cached under a new version.
+
+The cached values are shared between requests and must not be mutated.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Sequence, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import signals
+from django.utils.functional import cached_property
+from rest_framework.response import Response
+
+from .locks import cache_lock
+from .replicas import read_from_primary
+
+# For how long the other processes wait for the fill of a value
+LOCK_TIMEOUT = 10
+
+_missing = object()
+
+
+def _make_version() -> int:
+    # A namespace evicted from the shared cache gets a new version, which is
+    # greater than any of its previous ones
+    return time.time_ns() // 1000
+
+
+class LocalLRUCache:
+    """Thread safe in-process cache of up to `size` values."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, timeout: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class TwoTierCache:
+    """Local LRU in front of the shared cache with namespace versions."""
+
+    def __init__(self):
+        self._fill_locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    @cached_property
+    def local(self) -> LocalLRUCache:
+        return LocalLRUCache(size=settings.API_CACHE_LOCAL_SIZE)
+
+    @property
+    def shared(self):
+        return caches[settings.API_CACHE]
+
+    @staticmethod
+    def _version_key(namespace: str) -> str:
+        return f'api-cache:version:{namespace}'
+
+    def get_versions(self, namespaces: Sequence[str]) -> Dict[str, int]:
+        keys = {self._version_key(namespace) for namespace in namespaces}
+        versions = self.shared.get_many(keys)
+        for key in keys - versions.keys():
+            # Under the lock, as the add of FileBasedCache is not atomic and
+            # the processes would use different versions
+            with cache_lock(
+                settings.API_CACHE, key, wait=LOCK_TIMEOUT,
+                timeout=LOCK_TIMEOUT,
+            ):
+                self.shared.add(key, _make_version(), timeout=None)
+            versions[key] = self.shared.get(key)
+        return {
+            namespace: versions[self._version_key(namespace)]
+            for namespace in namespaces
+        }
+
+    def bump(self, namespace: str) -> None:
+        key = self._version_key(namespace)
+        try:
+            self.shared.incr(key)
+        except ValueError:
+            self.shared.set(key, _make_version(), timeout=None)
+
+    def make_key(self, namespaces: Sequence[str], key: str) -> str:
+        versions = self.get_versions(namespaces)
+        prefix = ':'.join(
+            f'{namespace}.{versions[namespace]}'
+            for namespace in sorted(namespaces)
+        )
+        digest = hashlib.md5(key.encode()).hexdigest()
+        return f'api-cache:{prefix}:{digest}'
+
+    def get_or_set(
+        self, namespaces: Sequence[str], key: str, compute: Callable[[], Any]
+    ):
+        """Returns the cached value of the key, which depends on the
+        namespaces, computing and caching it if it is missing."""
+        timeout = settings.API_CACHE_TIMEOUT
+        if not timeout:
+            return compute()
+
+        key = self.make_key(namespaces, key)
+        value = self._get(key, timeout)
+        if value is not _missing:
+            return value
+
+        with self._guard:
+            lock = self._fill_locks.setdefault(key, threading.Lock())
+        with lock:
+            try:
+                # Filled by another thread meanwhile
+                value = self._get(key, timeout)
+                if value is _missing:
+                    value = self._fill(key, compute, timeout)
+                    self.local.set(key, value, timeout)
+            finally:
+                with self._guard:
+                    self._fill_locks.pop(key, None)
+        return value
+
+    def _get(self, key: str, timeout: int):
+        value = self.local.get(key, _missing)
+        if value is _missing:
+            value = self.shared.get(key, _missing)
+            if value is not _missing:
+                self.local.set(key, value, timeout)
+        return value
+
+    def _fill(self, key: str, compute: Callable[[], Any], timeout: int):
+        with cache_lock(
+            settings.API_CACHE, key, wait=LOCK_TIMEOUT, timeout=LOCK_TIMEOUT,
+        ) as taken:
+            if taken:
+                # Filled by the process which has held the lock
+                value = self.shared.get(key, _missing)
+                if value is not _missing:
+                    return value
+            # Has taken the lock, or the process holding it takes too long
+            with read_from_primary():
+                value = compute()
+            self.shared.set(key, value, timeout=timeout)
+        return value
+
+
+api_cache = TwoTierCache()
+
+
+def bump_versions(namespaces: Iterable[str]) -> None:
+    """Invalidates the cached values of the namespaces. The versions are
+    bumped at once, so the reads of the current transaction miss the
+    values cached before it, and after the commit, so the other requests
+    miss the old rows they may have cached until then."""
+    namespaces = tuple(namespaces)
+
+    def bump():
+        for namespace in namespaces:
+            api_cache.bump(namespace)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+class CachedReadMixin:
+    """Viewset mixin which caches the data of list and retrieve actions
+    in `api_cache` by the query string and the object id. The data should
+    depend only on `cache_namespaces`, not on the user."""
+    cache_namespaces: Tuple[str, ...] = ()
+
+    def list(self, request, *args, **kwargs):
+        list_ = super().list
+        data = api_cache.get_or_set(
+            namespaces=self.cache_namespaces,
+            key=f'{self.basename}:list:{request.GET.urlencode()}',
+            compute=lambda: list_(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        retrieve = super().retrieve
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        data = api_cache.get_or_set(
+            namespaces=self.cache_namespaces,
+            key=f'{self.basename}:detail:{lookup}',
+            compute=lambda: retrieve(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+
+def connect_signals() -> None:
+    """Bumps the versions of the namespaces on the writes of the models
+    whose data they contain."""
+    from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                                RecipeIngredientMap, Tag)
+
+    def bump_on_write(model, namespaces, delete=True):
+        def receiver(sender, **kwargs):
+            # Logins update only last_login
+            if kwargs.get('update_fields') == frozenset(['last_login']):
+                return
+            bump_versions(namespaces)
+
+        uid = f'api.caching.{model._meta.label}'
+        signals.post_save.connect(
+            receiver, sender=model, weak=False, dispatch_uid=f'{uid}.save')
+        if delete:
+            signals.post_delete.connect(
+                receiver, sender=model, weak=False,
+                dispatch_uid=f'{uid}.delete',
+            )
+
+    # Recipes contain their author, tags and ingredients
+    bump_on_write(Tag, ('tags', 'recipes'))
+    bump_on_write(Ingredient, ('ingredients', 'recipes'))
+    bump_on_write(MeasurementUnit, ('ingredients', 'recipes'))
+    bump_on_write(get_user_model(), ('users', 'recipes'))
+    bump_on_write(Recipe, ('recipes', ))
+    # The recipe serializers write the ingredient maps and the tags of a
+    # recipe together with the recipe itself, and save the recipe or add
+    # the tags last. Receivers of the deletes of the maps would disable the
+    # fast deletes of Django
+    bump_on_write(RecipeIngredientMap, ('recipes', ), delete=False)
+
+    def tags_changed(sender, action, **kwargs):
+        if action.startswith('post_'):
+            bump_versions(('recipes', ))
+
+    signals.m2m_changed.connect(
+        tags_changed, sender=Recipe.tags.through, weak=False,
+        dispatch_uid='api.caching.recipe_tags',
+    )
@@ -0,0 +1,34 @@
+"""System checks of the settings of the API."""
+
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from .locks import has_lock
+from .throttling import LOCAL_CACHE_BACKENDS
+
+
+@register()
+def check_throttle_cache(app_configs, **kwargs):
+    """The token buckets of the throttling must be shared by the workers
+    and updated under a lock."""
+    if (
+        not settings.THROTTLE_RATES
+        or settings.THROTTLE_STORE != 'api.throttling.CacheBucketStore'
+    ):
+        return []
+    backend = settings.CACHES[settings.THROTTLE_CACHE]['BACKEND']
+    if not has_lock(settings.THROTTLE_CACHE):
+        return [Error(
+            f'THROTTLE_CACHE backend {backend} has no lock (api.locks), '
+            'simultaneous requests may take the same token.',
+            hint='Use a file, database, memcached or redis cache backend.',
+            id='api.E001',
+        )]
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        f'THROTTLE_CACHE backend {backend} is not shared by the workers, '
+        'every worker process throttles the requests by its own buckets.',
+        hint='Use a file, database, memcached or redis cache backend.',
+        id='api.W001',
+    )]
@@ -0,0 +1,157 @@
+"""Row counts of large querysets estimated by the database planner.
+
+COUNT(*) of PostgreSQL reads the whole table or index, so on big tables it
+takes longer than the page itself. The planner estimate of EXPLAIN is
+instant and precise enough for the number of pages. Small results, and
+all the results of the other databases, are counted exactly. The sizes of
+the tables (`pg_class.reltuples`) are kept by the process for a while: the
+querysets of small tables are counted without EXPLAIN, the unfiltered
+querysets of large tables are not queried at all.
+"""
+
+import json
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+# Seconds the sizes of the tables are reused for
+TABLE_SIZE_TIMEOUT = 60
+
+_table_sizes: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+
+def table_estimate(queryset: QuerySet) -> Optional[int]:
+    """Number of rows of the table of the queryset by PostgreSQL
+    statistics, None for the other databases and the tables which have not
+    been analyzed yet."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    table = queryset.model._meta.db_table
+    key = (queryset.db, table)
+    cached = _table_sizes.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(table)],
+        )
+        row = cursor.fetchone()
+    # -1 before the first ANALYZE of PostgreSQL 14
+    rows = int(row[0]) if row is not None and row[0] >= 0 else None
+    _table_sizes[key] = (time.monotonic() + TABLE_SIZE_TIMEOUT, rows)
+    return rows
+
+
+def _is_unfiltered(queryset: QuerySet) -> bool:
+    query = queryset.query
+    return (
+        not query.where and not query.distinct
+        and query.low_mark == 0 and query.high_mark is None
+    )
+
+
+def planner_estimate(queryset: QuerySet) -> Optional[int]:
+    """Number of rows of the queryset estimated by PostgreSQL planner, None
+    for the other databases."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_estimate(
+    queryset: QuerySet, threshold: Optional[int] = None
+) -> Optional[int]:
+    """Planner estimate of the number of rows if it is not less than
+    `threshold` (EXACT_COUNT_THRESHOLD by default), None if the rows
+    should be counted exactly."""
+    if threshold is None:
+        threshold = settings.EXACT_COUNT_THRESHOLD
+    if not threshold:
+        return None
+    table_rows = table_estimate(queryset)
+    if table_rows is not None:
+        if table_rows < threshold:
+            return None
+        if _is_unfiltered(queryset):
+            return table_rows
+    estimate = planner_estimate(queryset)
+    if estimate is None or estimate < threshold:
+        return None
+    return estimate
+
+
+def estimated_count(
+    queryset: QuerySet, threshold: Optional[int] = None
+) -> int:
+    """Planner estimate of the number of rows if it is not less than
+    `threshold` (EXACT_COUNT_THRESHOLD by default), else the exact count."""
+    estimate = get_estimate(queryset, threshold)
+    return estimate if estimate is not None else queryset.count()
+
+
+class EstimatedPage(Page):
+    """Page of an estimated count, which knows whether there is the next
+    page by the row after the page."""
+
+    def __init__(self, object_list, number, paginator, has_next: bool):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator of the admin changelists and the API lists with the
+    estimated count. The pages are not limited by an estimated count, the
+    next page exists if there are rows after the page."""
+    _estimated = False
+
+    @cached_property
+    def count(self) -> int:
+        if isinstance(self.object_list, QuerySet):
+            estimate = get_estimate(self.object_list)
+            if estimate is not None:
+                self._estimated = True
+                return estimate
+        return super().count
+
+    @property
+    def is_estimated(self) -> bool:
+        return self.count is not None and self._estimated
+
+    def validate_number(self, number) -> int:
+        if not self.is_estimated:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        if not self.is_estimated:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return EstimatedPage(
+            rows[:self.per_page], number, self,
+            has_next=len(rows) > self.per_page,
+        )
@@ -0,0 +1,125 @@
+"""NDJSON export of everything a user owns.
+
+Every line is a JSON object with `type`: the `user` itself first, then its
+authored recipes (`recipe`, with the tags and the ingredients), favorites
+(`favorite`), followings (`following`) and cart (`cart_item`). The rows are
+read by `iterator(chunk_size)` (server-side cursors in PostgreSQL) and the
+tags and the ingredients of every chunk of the recipes are selected by one
+query each, so the memory does not depend on the size of the export.
+"""
+
+import base64
+import logging
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.db.models import F, QuerySet
+from recipes.models import Recipe
+from shopping_carts.models import CartItem
+
+from .renderers import ORJSONRenderer
+from .rows import RecipeRowSerializer
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+# Ways to export the images of the recipes
+IMAGES = ('none', 'url', 'base64')
+
+USER_COLUMNS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'date_joined')
+RECIPE_COLUMNS = ('id', 'name', 'text', 'cooking_time', 'pub_date', 'image')
+
+_renderer = ORJSONRenderer()
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _line(type_: str, row: Dict) -> bytes:
+    return _renderer.render({'type': type_, **row}) + b'\n'
+
+
+def _image_getter(
+    images: str, url: Callable[[str], str]
+) -> Callable[[str], Optional[str]]:
+    storage = Recipe._meta.get_field('image').storage
+
+    def get_image(name: str) -> Optional[str]:
+        if not name:
+            return None
+        if images == 'url':
+            return url(storage.url(name))
+        # The headers are already sent, so a missing or unreadable file
+        # is exported as null instead of breaking the stream
+        try:
+            with storage.open(name) as file:
+                return base64.b64encode(file.read()).decode()
+        except OSError as error:
+            logger.warning('Image %s is not exported: %s', name, error)
+            return None
+
+    return get_image
+
+
+def _recipe_lines(
+    recipes: QuerySet, images: str, url: Callable[[str], str],
+    chunk_size: int,
+) -> Iterator[bytes]:
+    get_image = _image_getter(images, url)
+    columns = RECIPE_COLUMNS if images != 'none' else RECIPE_COLUMNS[:-1]
+    rows = recipes.order_by('pk').values(*columns).iterator(
+        chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        recipe_ids = [row['id'] for row in chunk]
+        tags = RecipeRowSerializer.get_tags(recipe_ids)
+        ingredients = RecipeRowSerializer.get_ingredients(recipe_ids)
+        for row in chunk:
+            if images != 'none':
+                row['image'] = get_image(row['image'])
+            row['tags'] = tags.get(row['id'], [])
+            row['ingredients'] = ingredients.get(row['id'], [])
+            yield _line('recipe', row)
+
+
+def _lines(type_: str, rows: QuerySet, chunk_size: int) -> Iterator[bytes]:
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield _line(type_, row)
+
+
+def export_user(
+    user: User, images: str = 'url', url: Callable[[str], str] = str,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """NDJSON lines of the export of the user. `images` is one of IMAGES,
+    `url` makes the absolute URLs of the images from the media URLs."""
+    users = User.objects.filter(pk=user.pk)
+    yield _line('user', users.values(*USER_COLUMNS).get())
+    yield from _recipe_lines(
+        Recipe.objects.filter(author_id=user.pk), images, url, chunk_size)
+    yield from _lines('favorite', Recipe.followers.through.objects.filter(
+        user_id=user.pk
+    ).order_by('recipe_id').values(
+        'recipe_id', name=F('recipe__name'),
+        author_id=F('recipe__author_id'),
+    ), chunk_size)
+    yield from _lines('following', User.followings.through.objects.filter(
+        from_user_id=user.pk
+    ).order_by('to_user_id').values(
+        user_id=F('to_user_id'), username=F('to_user__username'),
+    ), chunk_size)
+    yield from _lines('cart_item', CartItem.objects.filter(
+        user_id=user.pk
+    ).order_by('added_at', 'pk').values(
+        'recipe_id', 'added_at', name=F('recipe__name'),
+    ), chunk_size)
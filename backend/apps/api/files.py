@@ -0,0 +1,90 @@
+"""Files generated for the users (shopping lists, exports) in the protected
+media area.
+
+The area is not served publicly. Django authorizes the request and returns
+the path in `X-Accel-Redirect` header, then nginx sends the file from its
+internal location by sendfile, so the transfer to slow clients does not
+hold a worker. Without nginx (USE_X_ACCEL_REDIRECT is off) Django streams
+the file itself.
+"""
+
+import os
+import tempfile
+import time
+from typing import Iterable
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+# Seconds in which a served file may still be waiting for nginx, so it is
+# not removed with the outdated files
+KEEP_SECONDS = 60
+
+FILE_MODE = 0o644
+
+
+def protected_path(name: str) -> str:
+    """Absolute path of the file by its name relative to the area."""
+    return os.path.join(settings.PROTECTED_MEDIA_ROOT, name)
+
+
+def touch_protected_file(name: str) -> bool:
+    """Marks the file as just served, so it is not removed before nginx
+    has opened it. Returns False if there is no file."""
+    try:
+        os.utime(protected_path(name))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def write_protected_file(name: str, content: bytes) -> None:
+    path = protected_path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Concurrent requests (of any thread) never send a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        # Readable by nginx like the files created by open()
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def remove_protected_files(directory: str, keep: Iterable[str] = ()) -> None:
+    """Removes the files of the directory of the area except `keep` and
+    the files served (or written) within KEEP_SECONDS."""
+    path = protected_path(directory)
+    if not os.path.isdir(path):
+        return
+    keep = {os.path.basename(name) for name in keep}
+    served_since = time.time() - KEEP_SECONDS
+    for file_name in os.listdir(path):
+        if file_name in keep or file_name.endswith('.tmp'):
+            continue
+        file_path = os.path.join(path, file_name)
+        try:
+            if os.path.getmtime(file_path) < served_since:
+                os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def protected_file_response(
+    name: str, filename: str, content_type: str
+) -> HttpResponse:
+    """Response which sends the file of the area as an attachment."""
+    if settings.USE_X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.PROTECTED_MEDIA_URL + quote(name))
+    else:
+        response = FileResponse(
+            open(protected_path(name), 'rb'), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
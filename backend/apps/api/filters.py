@@ -1,9 +1,81 @@
-from django.db.models import Q
+from typing import Optional, Tuple
+
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
 from django_filters import rest_framework as filters
 from recipes.models import Recipe
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import (BaseFilterBackend, SearchFilter, coreapi,
                                     coreschema)
 
+from .popularity import ORDERINGS
+
+
+def get_recipes_limit(request) -> Optional[int]:
+    """Returns `recipes_limit` query parameter of the request."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            'Incorrect type of recipes_limit query parameter')
+    if recipes_limit < 0:
+        raise ValidationError('recipes_limit must not be negative')
+    return recipes_limit
+
+
+# Top level fields of RecipeGetSerializer
+RECIPE_FIELDS = (
+    'id', 'tags', 'author', 'ingredients', 'is_favorited',
+    'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+)
+
+# Predefined sets of the recipe fields for `view` query parameter
+RECIPE_VIEWS = {
+    'card': (
+        'id', 'name', 'image', 'cooking_time', 'is_favorited',
+        'is_in_shopping_cart',
+    ),
+    'full': RECIPE_FIELDS,
+}
+
+
+def _split_fields(value: str) -> Tuple[str, ...]:
+    return tuple(name.strip() for name in value.split(',') if name.strip())
+
+
+def get_recipe_fields(request) -> Optional[Tuple[str, ...]]:
+    """Returns the recipe fields requested by `fields`, `view` and `expand`
+    query parameters, or None if all the fields are requested.
+
+    `fields` is a comma separated list of the fields, `view` is the name of
+    a predefined list (`card` or `full`), `expand` adds the fields to the
+    list of `fields` or `view`."""
+    fields = request.query_params.get('fields')
+    view = request.query_params.get('view')
+    expand = request.query_params.get('expand')
+    if fields is None and view is None:
+        return None
+
+    if fields is not None:
+        selected = _split_fields(fields)
+    elif view in RECIPE_VIEWS:
+        selected = RECIPE_VIEWS[view]
+    else:
+        raise ValidationError(
+            f'view must be one of: {", ".join(RECIPE_VIEWS)}')
+    if expand is not None:
+        selected += _split_fields(expand)
+
+    unknown = set(selected) - set(RECIPE_FIELDS)
+    if unknown:
+        raise ValidationError(
+            f'Unknown recipe fields: {", ".join(sorted(unknown))}')
+    if set(selected) == set(RECIPE_FIELDS):
+        return None
+    return tuple(name for name in RECIPE_FIELDS if name in selected)
+
 
 class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='is_favorited_filter',)
@@ -11,12 +83,16 @@ class RecipeFilter(filters.FilterSet):
         method='is_in_shopping_cart_filter')
     author = filters.NumberFilter(field_name='author_id')
     tags = filters.CharFilter(method='tags_filter')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in ORDERINGS],
+        method='ordering_filter',
+    )
 
     def is_favorited_filter(self, queryset, name, value):
         return queryset.filter(followers=self.request.user)
 
     def is_in_shopping_cart_filter(self, queryset, name, value):
-        return queryset.filter(shopping_carts__owner=self.request.user)
+        return queryset.filter(cart_items__user=self.request.user)
 
     def tags_filter(self, queryset, name, value):
         tags = self.request.query_params.getlist('tags')
@@ -24,12 +100,34 @@ class RecipeFilter(filters.FilterSet):
             queryset = queryset.filter(tags__slug=tag)
         return queryset
 
+    def ordering_filter(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
+
     class Meta:
         model = Recipe
         fields = ('is_favorited', 'is_in_shopping_cart', )
 
 
 class RecipesLimitFilterBackend(BaseFilterBackend):
+    """Prefetches recipes of the users (no more than `recipes_limit` newest
+    recipes for each user) and annotates the users with `recipes_count`,
+    so serialization of the users does not hit the database."""
+
+    def filter_queryset(self, request, queryset, view):
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(request=request)
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        return queryset.annotate(
+            recipes_count=Count('recipes')
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        )
+
     def get_schema_fields(self, view):
         fields = [
             coreapi.Field(name='recipes_limit', description='Recipes limit',
@@ -0,0 +1,45 @@
+"""Decoding of the base64 images of the imported recipes.
+
+The functions run in the worker processes of the recipe import
+(api.recipe_import), which are spawned without Django, so the module
+depends on Pillow only.
+"""
+
+import base64
+import binascii
+import io
+import os
+import uuid
+from typing import Optional, Tuple
+
+from PIL import Image
+
+# Like Base64ImageField of the recipe serializer
+IMAGE_TYPES = ('jpeg', 'jpg', 'png', 'gif', 'webp')
+
+
+def decode_image(
+    data: str, directory: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """Decodes the base64 image (or data URI), checks it and writes it into
+    the directory under a random name. Returns the file name or the
+    error."""
+    if data.startswith('data:') and ';base64,' in data:
+        data = data.split(';base64,', 1)[1]
+    try:
+        content = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        return None, 'Invalid base64 image'
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.verify()
+            extension = image.format.lower()
+    except Exception:  # Pillow raises many types on broken images
+        return None, 'Invalid image'
+    if extension not in IMAGE_TYPES:
+        return None, f'Image type {extension} is not allowed'
+
+    name = f'{uuid.uuid4().hex}.{extension}'
+    with open(os.path.join(directory, name), 'wb') as file:
+        file.write(content)
+    return name, None
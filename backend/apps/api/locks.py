@@ -0,0 +1,98 @@
+"""Locks shared by the workers, kept next to the values of a cache.
+
+A lock of a backend with an atomic `add` (ATOMIC_ADD_BACKENDS: database,
+memcached, redis and the per-process local memory) is a key of the cache
+taken by `add`, which expires after the timeout of the lock. The `add` of
+FileBasedCache checks and writes the file in two steps, so its locks are
+`fcntl` locks of LOCK_STRIPES files in the directory of the cache, which
+the keys with the same hash share. Other backends have no lock
+(`has_lock()` is False).
+"""
+
+import fcntl
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, ContextManager
+
+from django.conf import settings
+from django.core.cache import caches
+
+FILE_BACKEND = 'django.core.cache.backends.filebased.FileBasedCache'
+ATOMIC_ADD_BACKENDS = (
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.MemcachedCache',
+    'django.core.cache.backends.redis.RedisCache',
+    'django_redis.cache.RedisCache',
+)
+LOCK_STRIPES = 1024
+POLL_INTERVAL = 0.01
+
+
+def has_lock(alias: str) -> bool:
+    """Whether the locks of the cache exclude each other."""
+    backend = settings.CACHES[alias]['BACKEND']
+    return backend == FILE_BACKEND or backend in ATOMIC_ADD_BACKENDS
+
+
+def _poll(try_lock: Callable[[], bool], wait: float) -> bool:
+    deadline = time.monotonic() + wait
+    while not try_lock():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(POLL_INTERVAL)
+    return True
+
+
+@contextmanager
+def _add_lock(alias: str, key: str, wait: float, timeout: float):
+    cache = caches[alias]
+    lock_key = f'{key}:lock'
+    taken = _poll(lambda: cache.add(lock_key, True, timeout=timeout), wait)
+    try:
+        yield taken
+    finally:
+        if taken:
+            cache.delete(lock_key)
+
+
+def _try_flock(fd: int) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+@contextmanager
+def _file_lock(alias: str, key: str, wait: float):
+    directory = os.path.abspath(settings.CACHES[alias]['LOCATION'])
+    os.makedirs(directory, exist_ok=True)
+    stripe = int(hashlib.md5(key.encode()).hexdigest(), 16) % LOCK_STRIPES
+    # Not *.djcache, so the cache does not cull or clear the files
+    fd = os.open(
+        os.path.join(directory, f'{stripe}.lock'), os.O_RDWR | os.O_CREAT,
+        0o644,
+    )
+    try:
+        yield _poll(lambda: _try_flock(fd), wait)
+    finally:
+        # Releases the lock
+        os.close(fd)
+
+
+def cache_lock(
+    alias: str, key: str, wait: float, timeout: float
+) -> ContextManager[bool]:
+    """Lock of the key of the cache for the block, waited for up to `wait`
+    seconds. Yields whether it is taken: a lock held by another process is
+    neither taken nor released. An `add` lock expires after `timeout`
+    seconds, a file lock is held till the end of the block."""
+    if settings.CACHES[alias]['BACKEND'] == FILE_BACKEND:
+        return _file_lock(alias, key, wait)
+    return _add_lock(alias, key, wait, timeout)
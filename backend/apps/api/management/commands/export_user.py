@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ...export import CHUNK_SIZE, IMAGES, export_user
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the user, its recipes, favorites, followings and cart as '
+        'NDJSON, like /api/users/me/export/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--images', choices=IMAGES, default='url')
+        parser.add_argument(
+            '--output', help='NDJSON file, standard output by default')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["username"]} does not exist')
+
+        lines = export_user(
+            user=user, images=options['images'],
+            chunk_size=options['chunk_size'],
+        )
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as file:
+            file.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(
+            f'Export of {user.username} saved to {options["output"]}'))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...schema import write_schema
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates Swagger schema of the API into SWAGGER_SCHEMA_FILE, so '
+        'the application serves it without generating it at runtime.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.SWAGGER_SCHEMA_FILE,
+            help=f'Default: {settings.SWAGGER_SCHEMA_FILE}',
+        )
+
+    def handle(self, *args, **options):
+        document = write_schema(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Schema ({len(document)} bytes) saved to {options["output"]}'))
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ...recipe_import import BATCH_SIZE, ImportReport, import_recipes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports the recipes of the NDJSON file (a recipe of '
+        'POST /api/recipes/ per line) as the recipes of the author.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file, - for standard input')
+        parser.add_argument('--author', required=True, help='Username')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes decoding the images',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["author"]} does not exist')
+
+        started = time.perf_counter()
+
+        def progress(report: ImportReport):
+            rate = report.imported / (time.perf_counter() - started)
+            self.stdout.write(
+                f'Imported {report.imported}, failed {report.failed} '
+                f'({rate:.0f} recipes/s)'
+            )
+
+        path = options['path']
+        with (
+            open(path, 'rb') if path != '-' else nullcontext(sys.stdin.buffer)
+        ) as file:
+            report = import_recipes(
+                author=author, lines=file, batch_size=options['batch_size'],
+                workers=options['workers'], progress=progress,
+            )
+        for error in report.errors:
+            self.stderr.write(
+                f'Line {error["line"]}: {json.dumps(error["errors"])}')
+        if report.failed > len(report.errors):
+            self.stderr.write(
+                f'{report.failed - len(report.errors)} more errors')
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.imported} recipes imported, {report.failed} failed'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from ...popularity import decay_trending_scores, recount_favorites
+
+
+class Command(BaseCommand):
+    help = (
+        'Decays the trending scores of the recipes to the current time and '
+        'counts their favorites again, in batches. Run it periodically, '
+        'e.g. every 10 minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip-favorites', action='store_true',
+            help='Do not count the favorites of the recipes',
+        )
+
+    def handle(self, *args, **options):
+        decayed = decay_trending_scores(batch_size=options['batch_size'])
+        self.stdout.write(f'Trending scores decayed: {decayed}')
+        if not options['skip_favorites']:
+            recounted = recount_favorites(batch_size=options['batch_size'])
+            self.stdout.write(f'Favorites counts fixed: {recounted}')
+        self.stdout.write(self.style.SUCCESS('Popularity refreshed'))
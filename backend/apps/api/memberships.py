@@ -0,0 +1,193 @@
+"""Per-user cache of the favorite recipes, the cart and the followings.
+
+The flags of the serialized recipes and users (`is_favorited`,
+`is_in_shopping_cart`, `is_subscribed`) are computed from the sets of ids
+of the request user instead of subqueries. The sets are kept in API_CACHE
+as compact sorted arrays, all three by one entry per user: a request reads
+them by one cache lookup, a miss selects them by one query.
+
+The toggles of api.utils update the cached sets write-through. The entry
+of a user is filled and updated under a lock of the user (api.locks), so
+a fill does not overwrite a concurrent update and concurrent updates do
+not lose each other. With a cache without locks (`has_lock()` is False)
+the toggles delete the entry instead, the next read selects it. The other
+writes (the admin, cascade deletes) are seen after MEMBERSHIP_CACHE_TIMEOUT.
+"""
+
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import ContextManager, Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import IntegerField, Value
+from recipes.models import Recipe
+from shopping_carts.models import CartItem
+
+from .caching import LOCK_TIMEOUT, api_cache
+from .locks import cache_lock, has_lock
+from .replicas import read_from_primary
+
+User = get_user_model()
+
+FAVORITES, CART, FOLLOWINGS = 'favorites', 'cart', 'followings'
+KINDS = (FAVORITES, CART, FOLLOWINGS)
+
+
+class IdSet:
+    """Sorted array of ids."""
+    __slots__ = ('ids', )
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.ids = array('q', sorted(set(ids)))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'IdSet':
+        id_set = cls()
+        id_set.ids.frombytes(data)
+        return id_set
+
+    def to_bytes(self) -> bytes:
+        return self.ids.tobytes()
+
+    def _index(self, pk: int) -> Tuple[int, bool]:
+        index = bisect_left(self.ids, pk)
+        return index, index < len(self.ids) and self.ids[index] == pk
+
+    def __contains__(self, pk) -> bool:
+        return pk is not None and self._index(pk)[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, pk: int) -> None:
+        index, found = self._index(pk)
+        if not found:
+            self.ids.insert(index, pk)
+
+    def discard(self, pk: int) -> None:
+        index, found = self._index(pk)
+        if found:
+            del self.ids[index]
+
+
+@dataclass
+class Memberships:
+    favorites: IdSet
+    cart: IdSet
+    followings: IdSet
+
+    @classmethod
+    def empty(cls) -> 'Memberships':
+        return cls(IdSet(), IdSet(), IdSet())
+
+    @classmethod
+    def from_entry(cls, entry: Tuple[bytes, ...]) -> 'Memberships':
+        return cls(*(IdSet.from_bytes(data) for data in entry))
+
+    def to_entry(self) -> Tuple[bytes, ...]:
+        return tuple(getattr(self, kind).to_bytes() for kind in KINDS)
+
+
+def select_memberships(user_id: int) -> Memberships:
+    """Memberships of the user selected by one query."""
+
+    def rows(queryset, kind: int, column: str):
+        return queryset.annotate(
+            kind=Value(kind, output_field=IntegerField())
+        ).values_list('kind', column)
+
+    favorites = rows(Recipe.followers.through.objects.filter(
+        user_id=user_id), 0, 'recipe_id')
+    cart = rows(CartItem.objects.filter(user_id=user_id), 1, 'recipe_id')
+    followings = rows(User.followings.through.objects.filter(
+        from_user_id=user_id), 2, 'to_user_id')
+    ids = ([], [], [])
+    for kind, pk in favorites.union(cart, followings, all=True):
+        ids[kind].append(pk)
+    return Memberships(*(IdSet(kind_ids) for kind_ids in ids))
+
+
+def _key(user_id: int) -> str:
+    return f'memberships:{user_id}'
+
+
+def _lock(key: str, wait: bool) -> ContextManager[bool]:
+    return cache_lock(
+        settings.API_CACHE, key, wait=LOCK_TIMEOUT if wait else 0,
+        timeout=LOCK_TIMEOUT,
+    )
+
+
+def get_memberships(user) -> Memberships:
+    """Memberships of the user, empty for anonymous users."""
+    if not user.is_authenticated:
+        return Memberships.empty()
+    timeout = settings.MEMBERSHIP_CACHE_TIMEOUT
+    if not timeout:
+        return select_memberships(user.pk)
+
+    key = _key(user.pk)
+    entry = api_cache.shared.get(key)
+    if entry is not None:
+        return Memberships.from_entry(entry)
+    with _lock(key, wait=False) as taken:
+        if not taken:
+            # Filled or updated by another request at the moment
+            return select_memberships(user.pk)
+        # Not from a lagging replica, the entry lives for the timeout
+        with read_from_primary():
+            memberships = select_memberships(user.pk)
+        api_cache.shared.set(key, memberships.to_entry(), timeout=timeout)
+    return memberships
+
+
+def get_context_memberships(context: Dict) -> Memberships:
+    """Memberships of the request user kept in the serializer context, so
+    they are shared by all the serialized (and nested) objects."""
+    if 'memberships' not in context:
+        request = context.get('request')
+        context['memberships'] = (
+            get_memberships(request.user) if request is not None
+            else Memberships.empty()
+        )
+    return context['memberships']
+
+
+def update_memberships(
+    user, kind: str, pk: int, member: bool
+) -> None:
+    """Adds the id to (or removes it from) the cached set of the user after
+    the write of the membership. Inside a transaction the set is updated
+    after the commit, so a rolled back write never reaches the cache."""
+    key = _key(user.pk)
+
+    def update():
+        if not settings.MEMBERSHIP_CACHE_TIMEOUT:
+            return
+        if not has_lock(settings.API_CACHE):
+            api_cache.shared.delete(key)
+            return
+        with _lock(key, wait=True) as taken:
+            if not taken:
+                api_cache.shared.delete(key)
+                return
+            entry = api_cache.shared.get(key)
+            if entry is None:
+                # Selected by the next read
+                return
+            memberships = Memberships.from_entry(entry)
+            ids = getattr(memberships, kind)
+            if member:
+                ids.add(pk)
+            else:
+                ids.discard(pk)
+            api_cache.shared.set(
+                key, memberships.to_entry(),
+                timeout=settings.MEMBERSHIP_CACHE_TIMEOUT,
+            )
+
+    # Runs at once outside of transactions
+    transaction.on_commit(update)
@@ -0,0 +1,87 @@
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from monitoring.middleware import AsyncCapableMiddleware
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+"""Compression of large responses negotiated by Accept-Encoding header."""
+
+# Fast levels for responses compressed on every request
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+ACCEPT_ENCODING_RE = re.compile(r'^\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+def accepted_encodings(header: str) -> set:
+    """Encodings of Accept-Encoding header, except the ones with q=0."""
+    encodings = set()
+    for item in header.split(','):
+        match = ACCEPT_ENCODING_RE.match(item)
+        if match is None:
+            continue
+        encoding, quality = match.groups()
+        try:
+            if quality is not None and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(encoding.lower())
+    return encodings
+
+
+def choose_encoding(header: str):
+    encodings = accepted_encodings(header)
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """Compresses the responses larger than COMPRESSION_MIN_SIZE by brotli
+    (if it is installed) or gzip, depending on what the client accepts."""
+
+    def process(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    @staticmethod
+    def compress(request, response):
+        min_size = settings.COMPRESSION_MIN_SIZE
+        if (
+            not min_size
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < min_size
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        else:
+            content = gzip.compress(
+                response.content, compresslevel=GZIP_LEVEL, mtime=0)
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # The compressed body is not byte-for-byte equal to the original
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,234 @@
+"""Full-page cache of the recipe list for anonymous users.
+
+The pages are cached by the normalized query string and tagged with
+surrogate keys of their content and of the list they are a page of:
+
+- `recipe:<id>` of every recipe on the page,
+- `user:<id>` of the authors and `tag:<id>` of the tags shown on the page,
+  `ingredients` if the ingredients are shown,
+- `recipes:tag:<id>` of every `tags` filter of the page,
+  `recipes:author:<id>` of `author` filter, `recipes:all` of the pages
+  without them.
+
+Every surrogate key has a version in the shared cache, the time of its last
+purge, and a page is stored with the versions of its keys. A page is valid
+while none of them has changed, so a purge of a key invalidates exactly the
+pages tagged with it in all the workers. A new or deleted recipe purges the
+lists it belongs to, a changed one the pages which show it, a changed tag
+or author the pages which show them. A page is not stored if any of its
+keys has been purged since its rows were selected.
+"""
+
+import hashlib
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import signals
+from recipes.models import Ingredient, MeasurementUnit, Recipe, Tag
+
+from .caching import api_cache
+
+# Filters of the users and the orderings by their activity, which changes
+# the pages all the time, the anonymous pages with them are not cached
+UNCACHED_PARAMS = ('is_favorited', 'is_in_shopping_cart', 'ordering')
+
+_missing = object()
+
+
+def now() -> int:
+    return time.time_ns() // 1000
+
+
+def _version_key(surrogate_key: str) -> str:
+    return f'page-cache:version:{surrogate_key}'
+
+
+def get_page_key(request) -> Optional[str]:
+    """Cache key of the page of the request, None if it is not cached."""
+    if not settings.PAGE_CACHE_TIMEOUT or request.user.is_authenticated:
+        return None
+    if any(name in request.GET for name in UNCACHED_PARAMS):
+        return None
+    query = urlencode(sorted(
+        (name, value)
+        for name, values in request.GET.lists() for value in values
+    ))
+    url = f'{request.build_absolute_uri(request.path)}?{query}'
+    return f'page-cache:page:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def get_page(key: str) -> Optional[Any]:
+    """Returns the cached page, unless any of its keys has been purged."""
+    entry = api_cache.local.get(key)
+    if entry is None:
+        entry = api_cache.shared.get(key)
+        if entry is None:
+            return None
+        api_cache.local.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+    versions, data = entry
+    current = api_cache.shared.get_many(versions.keys())
+    if any(
+        current.get(version_key, _missing) != version
+        for version_key, version in versions.items()
+    ):
+        return None
+    return data
+
+
+def set_page(
+    key: str, data, surrogate_keys: Iterable[str], started: int
+) -> None:
+    """Caches the page, whose rows have been selected after `started`
+    time (`now()`), tagged with the surrogate keys."""
+    version_keys = {_version_key(name) for name in surrogate_keys}
+    versions = api_cache.shared.get_many(version_keys)
+    for version_key in version_keys - versions.keys():
+        # Never purged, or evicted
+        api_cache.shared.add(version_key, started - 1, timeout=None)
+        versions[version_key] = api_cache.shared.get(version_key)
+    if any(
+        version is None or version >= started
+        for version in versions.values()
+    ):
+        # Purged while the page was built
+        return
+    entry = (versions, data)
+    api_cache.shared.set(key, entry, timeout=settings.PAGE_CACHE_TIMEOUT)
+    api_cache.local.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+
+
+def purge(surrogate_keys: Iterable[str]) -> None:
+    """Invalidates the pages tagged with any of the keys, at once and after
+    the commit of the current transaction, like `bump_versions`."""
+    version_keys = [_version_key(name) for name in surrogate_keys]
+    if not version_keys:
+        return
+
+    def bump():
+        api_cache.shared.set_many(
+            dict.fromkeys(version_keys, now()), timeout=None)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def get_tag_ids() -> Dict[str, int]:
+    """Ids of the tags by their slugs."""
+    return api_cache.get_or_set(
+        namespaces=('tags', ),
+        key='tags:ids',
+        compute=lambda: dict(Tag.objects.values_list('slug', 'id')),
+    )
+
+
+def get_list_keys(request) -> Optional[Set[str]]:
+    """Surrogate keys of the list of recipes filtered by the request."""
+    keys = set()
+    tags = [slug for slug in request.GET.getlist('tags') if slug]
+    if tags:
+        tag_ids = get_tag_ids()
+        if any(slug not in tag_ids for slug in tags):
+            return None
+        keys.update(f'recipes:tag:{tag_ids[slug]}' for slug in tags)
+    author = request.GET.get('author')
+    if author:
+        try:
+            keys.add(f'recipes:author:{int(author)}')
+        except ValueError:
+            return None
+    return keys or {'recipes:all'}
+
+
+def get_recipe_page_keys(
+    request, rows: List[Dict], results: List[Dict]
+) -> Optional[Set[str]]:
+    """Surrogate keys of the page of the recipe list with the values() rows
+    and the serialized recipes. None, if the page is not cached."""
+    keys = get_list_keys(request)
+    if keys is None:
+        return None
+    for row in rows:
+        keys.add(f'recipe:{row["id"]}')
+        if 'author_id' in row:
+            keys.add(f'user:{row["author_id"]}')
+    for recipe in results:
+        keys.update(f'tag:{tag["id"]}' for tag in recipe.get('tags', ()))
+        if 'ingredients' in recipe:
+            keys.add('ingredients')
+    return keys
+
+
+def _recipe_saved(sender, instance, created, **kwargs):
+    keys = [f'recipe:{instance.pk}']
+    if created:
+        # The tags are added later
+        keys += ['recipes:all', f'recipes:author:{instance.author_id}']
+    purge(keys)
+
+
+def _recipe_deleted(sender, instance, **kwargs):
+    tag_ids = instance.tags.values_list('pk', flat=True)
+    purge([
+        f'recipe:{instance.pk}', 'recipes:all',
+        f'recipes:author:{instance.author_id}',
+        *(f'recipes:tag:{tag_id}' for tag_id in tag_ids),
+    ])
+
+
+def _recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        pk_set = (
+            instance.recipe_set if reverse else instance.tags
+        ).values_list('pk', flat=True)
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if reverse:
+        # Recipes added to or removed from the tag
+        keys = [f'tag:{instance.pk}', f'recipes:tag:{instance.pk}']
+        keys += [f'recipe:{pk}' for pk in pk_set]
+    else:
+        keys = [f'recipe:{instance.pk}']
+        keys += [f'recipes:tag:{pk}' for pk in pk_set]
+    purge(keys)
+
+
+def _tag_changed(sender, instance, **kwargs):
+    purge([f'tag:{instance.pk}', f'recipes:tag:{instance.pk}'])
+
+
+def _user_saved(sender, instance, update_fields, **kwargs):
+    # Logins update only last_login
+    if update_fields != frozenset(['last_login']):
+        purge([f'user:{instance.pk}'])
+
+
+def _ingredients_changed(sender, **kwargs):
+    purge(['ingredients'])
+
+
+def connect_signals() -> None:
+    """Purges the pages on the writes of the recipes, the tags, the users
+    and the ingredients."""
+    receivers = [
+        (signals.post_save, Recipe, _recipe_saved),
+        (signals.pre_delete, Recipe, _recipe_deleted),
+        (signals.m2m_changed, Recipe.tags.through, _recipe_tags_changed),
+        (signals.post_save, Tag, _tag_changed),
+        (signals.post_delete, Tag, _tag_changed),
+        (signals.post_save, get_user_model(), _user_saved),
+        (signals.post_save, Ingredient, _ingredients_changed),
+        (signals.post_delete, Ingredient, _ingredients_changed),
+        (signals.post_save, MeasurementUnit, _ingredients_changed),
+        (signals.post_delete, MeasurementUnit, _ingredients_changed),
+    ]
+    for signal, sender, receiver in receivers:
+        signal.connect(
+            receiver, sender=sender,
+            dispatch_uid=f'api.page_cache.{receiver.__name__}.'
+                         f'{sender._meta.label}',
+        )
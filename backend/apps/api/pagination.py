@@ -1,5 +1,10 @@
 from rest_framework.pagination import PageNumberPagination
 
+from .estimates import EstimatedCountPaginator
+
 
 class PageLimitPagination(PageNumberPagination):
+    """Pages of `limit` objects with the `count` estimated for large lists
+    (api.estimates)."""
     page_size_query_param = 'limit'
+    django_paginator_class = EstimatedCountPaginator
@@ -9,5 +9,5 @@ class ReadAllCreateAuthenticatedChangeAuthor(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if request.method in ('PUT', 'PATCH', 'DELETE'):
-            return obj.author == request.user
+            return obj.author_id == request.user.id
         return True
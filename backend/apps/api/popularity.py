@@ -0,0 +1,108 @@
+"""Popularity of the recipes for the orderings of the recipe list.
+
+`favorites_count` of a recipe is changed together with its favorites.
+`trending_score` is the sum of the weights of the favorites and the cart
+additions of the recipe, every weight halves every TRENDING_HALF_LIFE
+seconds. The score is stored decayed to `trending_updated_at` time: an
+addition decays it to the current time and adds its weight by one UPDATE,
+`refresh_popularity` command decays the scores of all the recipes in
+batches, so the scores of the recipes without recent activity go down too.
+Both fields are indexed with `pub_date`, the orderings read the top rows of
+the indexes.
+"""
+
+import time
+from typing import Iterator, List
+
+from django.conf import settings
+from django.db.models import (Count, F, IntegerField, OuterRef, QuerySet,
+                              Subquery, Value)
+from django.db.models.functions import Coalesce, Least, Power
+from recipes.models import Recipe
+
+FAVORITE_WEIGHT = 1.0
+CART_WEIGHT = 1.0
+
+# The decayed scores below are reset to zero, so they are not updated again
+MIN_TRENDING_SCORE = 0.01
+
+# Halvings of a score at most, 0.5 ** 1000 does not underflow in PostgreSQL
+MAX_HALVINGS = 1000.0
+
+ORDERINGS = {
+    'popular': ('-favorites_count', '-pub_date'),
+    'trending': ('-trending_score', '-pub_date'),
+}
+
+
+def _decayed_score(now: float):
+    """Expression of the trending score decayed to `now` (Unix time)."""
+    halvings = (Value(now) - F('trending_updated_at')) / Value(
+        float(settings.TRENDING_HALF_LIFE))
+    return F('trending_score') * Power(
+        Value(0.5), Least(halvings, Value(MAX_HALVINGS)))
+
+
+def record_activity(
+    recipe: Recipe, weight: float, favorites: int = 0
+) -> None:
+    """Adds the weight to the trending score of the recipe and `favorites`
+    to its favorites count."""
+    now = time.time()
+    Recipe.objects.filter(pk=recipe.pk).update(
+        trending_score=_decayed_score(now) + Value(weight),
+        trending_updated_at=Value(now),
+        favorites_count=F('favorites_count') + favorites,
+    )
+
+
+def record_favorite_removal(recipe: Recipe) -> None:
+    """Subtracts the removed favorite from the favorites count of the recipe,
+    the trending score keeps its weight."""
+    Recipe.objects.filter(pk=recipe.pk, favorites_count__gt=0).update(
+        favorites_count=F('favorites_count') - 1)
+
+
+def _batches(queryset: QuerySet, batch_size: int) -> Iterator[List[int]]:
+    """Primary keys of the recipes of the queryset in ascending batches."""
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def decay_trending_scores(batch_size: int) -> int:
+    """Decays the trending scores of all the recipes to the current time.
+    Returns the number of the updated recipes."""
+    now = time.time()
+    updated = 0
+    recipes = Recipe.objects.filter(trending_score__gt=0)
+    for pks in _batches(recipes, batch_size):
+        updated += Recipe.objects.filter(pk__in=pks).update(
+            trending_score=_decayed_score(now),
+            trending_updated_at=Value(now),
+        )
+        Recipe.objects.filter(
+            pk__in=pks, trending_score__lt=MIN_TRENDING_SCORE
+        ).update(trending_score=0)
+    return updated
+
+
+def recount_favorites(batch_size: int) -> int:
+    """Counts the favorites of all the recipes again, the deleted users
+    remove their favorites without changing the counts. Returns the
+    number of the recipes whose count has changed."""
+    favorites = Recipe.followers.through.objects.filter(
+        recipe_id=OuterRef('pk')
+    ).values('recipe_id').annotate(count=Count('*')).values('count')
+    count = Coalesce(Subquery(favorites, output_field=IntegerField()), 0)
+    updated = 0
+    for pks in _batches(Recipe.objects.all(), batch_size):
+        updated += Recipe.objects.filter(pk__in=pks).annotate(
+            count=count
+        ).exclude(favorites_count=F('count')).update(favorites_count=count)
+    return updated
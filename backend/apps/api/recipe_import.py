@@ -0,0 +1,249 @@
+"""Bulk import of the recipes of a user from NDJSON.
+
+Every line is a recipe like the request of `POST /api/recipes/` (the
+`recipe` lines of the export of api.export are accepted too, the other
+lines of the export are skipped). The lines are processed in batches:
+
+- the fields are validated by RecipeImportSerializer, the ids of the tags
+  and the ingredients of the batch are checked by one query each,
+- the images are decoded, checked and written on a process pool (the
+  import_recipes command) or in the request thread (the endpoint),
+- the recipes, their ingredients and tags are inserted by `bulk_create`
+  in one transaction per batch.
+
+Bulk inserts send no signals, the caches of the recipe lists are
+invalidated after every batch. The invalid lines are reported and skipped.
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from itertools import islice, repeat
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional, Set,
+                    Tuple)
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from recipes.models import Ingredient, Recipe, RecipeIngredientMap, Tag
+from rest_framework.exceptions import ValidationError
+
+from . import page_cache
+from .caching import bump_versions
+from .images import decode_image
+from .renderers import orjson
+from .serializers import RecipeImportSerializer
+
+User = get_user_model()
+
+BATCH_SIZE = 200
+
+# Errors kept in the report, the rest are only counted
+MAX_ERRORS = 100
+
+IMAGE_DIRECTORY = Recipe._meta.get_field('image').upload_to
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    errors: List[Dict] = field(default_factory=list)
+
+    def add_error(self, line: int, errors) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+
+class KnownIds:
+    """Ids of the existing objects of the model, selected for the ids not
+    seen by the import before."""
+
+    def __init__(self, model):
+        self.model = model
+        self.existing: Set[int] = set()
+        self.checked: Set[int] = set()
+
+    def get_unknown(self, ids: Iterable[int]) -> Set[int]:
+        ids = set(ids)
+        new = ids - self.checked
+        if new:
+            self.existing.update(self.model.objects.filter(
+                pk__in=new).values_list('pk', flat=True))
+            self.checked.update(new)
+        return ids - self.existing
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BatchValidator:
+    """Validates the recipes of the batches of the lines. The tags and the
+    ingredients of a batch are checked by one query each, the serializer
+    is reused for all the lines."""
+
+    def __init__(self):
+        self.serializer = RecipeImportSerializer()
+        self.tags = KnownIds(Tag)
+        self.ingredients = KnownIds(Ingredient)
+
+    def parse(
+        self, number: int, line: bytes, report: ImportReport
+    ) -> Optional[Dict]:
+        try:
+            data = loads(line)
+        except ValueError:
+            report.add_error(number, 'Invalid JSON')
+            return None
+        if not isinstance(data, dict):
+            report.add_error(number, 'Recipe must be a JSON object')
+            return None
+        if data.get('type', 'recipe') != 'recipe':
+            return None
+        try:
+            return self.serializer.run_validation(data)
+        except ValidationError as exc:
+            report.add_error(number, exc.detail)
+            return None
+
+    def validate(
+        self, lines: List[Tuple[int, bytes]], report: ImportReport
+    ) -> List[Tuple[int, Dict]]:
+        """Valid recipes of the numbered lines."""
+        recipes = []
+        for number, line in lines:
+            if line.strip():
+                recipe = self.parse(number, line, report)
+                if recipe is not None:
+                    recipes.append((number, recipe))
+
+        unknown_tags = self.tags.get_unknown(
+            tag_id for _, recipe in recipes for tag_id in recipe['tags'])
+        unknown_ingredients = self.ingredients.get_unknown(
+            item['id']
+            for _, recipe in recipes for item in recipe['ingredients']
+        )
+        valid = []
+        for number, recipe in recipes:
+            errors = {}
+            tag_ids = sorted(unknown_tags.intersection(recipe['tags']))
+            if tag_ids:
+                errors['tags'] = [f'Unknown tags: {tag_ids}']
+            ingredient_ids = sorted(unknown_ingredients.intersection(
+                item['id'] for item in recipe['ingredients']))
+            if ingredient_ids:
+                errors['ingredients'] = [
+                    f'Unknown ingredients: {ingredient_ids}']
+            if errors:
+                report.add_error(number, errors)
+            else:
+                valid.append((number, recipe))
+        return valid
+
+
+def _get_maps(recipe: Recipe, data: Dict) -> List[RecipeIngredientMap]:
+    # The amounts of the repeated ingredients are summed like in the API
+    amounts = {}
+    for item in data['ingredients']:
+        amounts[item['id']] = amounts.get(item['id'], 0) + item['amount']
+    return [
+        RecipeIngredientMap(
+            recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+        for ingredient_id, amount in amounts.items()
+    ]
+
+
+def save_batch(author: User, recipes: List[Tuple[Dict, str]]) -> None:
+    """Inserts the recipes with their image names in one transaction."""
+    with transaction.atomic():
+        objects = Recipe.objects.bulk_create([
+            Recipe(
+                author=author, name=data['name'], text=data['text'],
+                cooking_time=data['cooking_time'], image=image,
+            )
+            for data, image in recipes
+        ])
+        RecipeIngredientMap.objects.bulk_create([
+            recipe_map
+            for recipe, (data, _) in zip(objects, recipes)
+            for recipe_map in _get_maps(recipe, data)
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, (data, _) in zip(objects, recipes)
+            for tag_id in set(data['tags'])
+        ])
+
+    tag_ids = {tag_id for data, _ in recipes for tag_id in data['tags']}
+    bump_versions(('recipes', ))
+    page_cache.purge([
+        'recipes:all', f'recipes:author:{author.pk}',
+        *(f'recipes:tag:{tag_id}' for tag_id in tag_ids),
+    ])
+
+
+def _import_batch(
+    author: User, recipes: List[Tuple[int, Dict]], map_images: Callable,
+    report: ImportReport,
+) -> None:
+    directory = os.path.join(settings.MEDIA_ROOT, IMAGE_DIRECTORY)
+    images = map_images(
+        decode_image, [recipe['image'] for _, recipe in recipes],
+        repeat(directory),
+    )
+    decoded = []
+    for (number, recipe), (name, error) in zip(recipes, images):
+        if error is not None:
+            report.add_error(number, {'image': [error]})
+        else:
+            decoded.append((recipe, os.path.join(IMAGE_DIRECTORY, name)))
+    if not decoded:
+        return
+    try:
+        save_batch(author, decoded)
+    except Exception:
+        for _, image in decoded:
+            os.remove(os.path.join(settings.MEDIA_ROOT, image))
+        raise
+    report.imported += len(decoded)
+
+
+def import_recipes(
+    author: User, lines: Iterable[bytes], batch_size: int = BATCH_SIZE,
+    workers: int = 1,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """Imports the recipes of the NDJSON lines as recipes of the author.
+    The images are decoded by `workers` processes, `progress` is called
+    with the report after every batch."""
+    os.makedirs(
+        os.path.join(settings.MEDIA_ROOT, IMAGE_DIRECTORY), exist_ok=True)
+    report = ImportReport()
+    validator = BatchValidator()
+    # Spawned, as forking a process with threads (the server, the logging)
+    # may deadlock the children
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+    ) if workers > 1 else nullcontext()
+    with executor:
+        map_images = executor.map if workers > 1 else map
+        numbered = enumerate(lines, start=1)
+        for lines_batch in _chunks(numbered, batch_size):
+            recipes = validator.validate(lines_batch, report)
+            if recipes:
+                _import_batch(author, recipes, map_images, report)
+            if progress is not None:
+                progress(report)
+    return report
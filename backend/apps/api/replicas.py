@@ -0,0 +1,114 @@
+"""Routing of the reads of the API to the database replicas.
+
+Safe requests of the viewsets with `ReplicaReadMixin` read from one of the
+DATABASE_REPLICAS, chosen per request. A user who has made a write request
+is pinned to the primary for REPLICA_PIN_SECONDS, so they read their own
+writes in spite of the replication lag. The pins are kept in the cache
+REPLICA_PIN_CACHE, which should be shared by all the workers. The token is
+always checked on the primary, as a just created token may be missing on
+the replicas.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Database alias for the reads of the current request of the viewsets with
+# ReplicaReadMixin, None outside of them
+_replica: ContextVar[Optional[str]] = ContextVar('replica', default=None)
+
+
+def _pin_key(user_id: int) -> str:
+    return f'replicas:pinned:{user_id}'
+
+
+def pin_to_primary(user_id: int) -> None:
+    caches[settings.REPLICA_PIN_CACHE].set(
+        _pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id: int) -> bool:
+    return caches[settings.REPLICA_PIN_CACHE].get(
+        _pin_key(user_id), False)
+
+
+@contextmanager
+def read_from_primary():
+    """Sends the reads of the block to the primary."""
+    token = _replica.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """Database router which sends the reads of the requests of
+    `ReplicaReadMixin` viewsets to the database chosen for the request.
+    Everything else uses the primary."""
+
+    def db_for_read(self, model, **hints):
+        # The explicit alias takes precedence over the database of the
+        # related instance, so the objects read from a replica do not drag
+        # the reads of a pinned user there and vice versa
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas have the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas receive the schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Viewset mixin which reads from a replica in safe requests, unless
+    the user is pinned to the primary, and pins the user to the primary
+    after successful write requests."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not settings.DATABASE_REPLICAS:
+            return super().dispatch(request, *args, **kwargs)
+
+        # Until the user is known, see perform_authentication
+        token = _replica.set(DEFAULT_DB_ALIAS)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+
+        # DRF sets the authenticated user to the Django request too
+        user = getattr(request, 'user', None)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin_to_primary(user.id)
+        return response
+
+    def perform_authentication(self, request):
+        super().perform_authentication(request)
+        if _replica.get() is None or request.method not in SAFE_METHODS:
+            return
+        user = request.user
+        if user.is_authenticated and is_pinned_to_primary(user.id):
+            return
+        # Reset by dispatch
+        _replica.set(random.choice(settings.DATABASE_REPLICAS))
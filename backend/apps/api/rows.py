@@ -0,0 +1,218 @@
+"""Read path of the hot list and retrieve endpoints without model instances.
+
+The views select values() rows and the row serializers build the output
+dicts from them directly, skipping model and serializer field objects. The
+output is the same as of the model serializers (TagSerializer,
+IngredientSerializer and RecipeGetSerializer), which still describe the
+endpoints in the API schema.
+"""
+
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from recipes.models import Recipe, RecipeIngredientMap, Tag
+
+from .filters import RECIPE_FIELDS
+from .memberships import get_context_memberships
+
+
+class RowSerializer(ABC):
+    """Read only serializer of values() rows with the interface of DRF
+    serializers used by the generic views."""
+    columns: Tuple[str, ...] = ()
+
+    def __init__(self, instance=None, many=False, context=None, fields=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.fields = fields
+
+    @classmethod
+    def get_columns(cls, fields: Optional[Sequence[str]] = None):
+        return cls.columns
+
+    @abstractmethod
+    def to_representation(self, row: Dict) -> Dict:
+        """Output dict of the row."""
+
+    def to_representation_many(self, rows: List[Dict]) -> List[Dict]:
+        return [self.to_representation(row) for row in rows]
+
+    @property
+    def data(self):
+        if self.many:
+            return self.to_representation_many(list(self.instance))
+        return self.to_representation_many([self.instance])[0]
+
+
+class TagRowSerializer(RowSerializer):
+    """Rows of TagSerializer."""
+    columns = ('id', 'name', 'hexcolor', 'slug')
+
+    def to_representation(self, row: Dict) -> Dict:
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'color': row['hexcolor'],
+            'slug': row['slug'],
+        }
+
+
+class IngredientRowSerializer(RowSerializer):
+    """Rows of IngredientSerializer."""
+    columns = ('id', 'name', 'measurement_unit__name')
+
+    def to_representation(self, row: Dict) -> Dict:
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'measurement_unit': row['measurement_unit__name'],
+        }
+
+
+# Flags of the recipes by the sets of the memberships
+MEMBERSHIP_FIELDS = {
+    'is_favorited': 'favorites', 'is_in_shopping_cart': 'cart'}
+
+AUTHOR_COLUMNS = (
+    'author__email', 'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+)
+
+
+class RecipeRowSerializer(RowSerializer):
+    """Rows of RecipeGetSerializer limited to `fields`. The tags and the
+    ingredients of all the rows are selected by one query each, like the
+    prefetches of the model queryset. The flags of the request user are
+    computed from its memberships (api.memberships)."""
+
+    @classmethod
+    def get_columns(cls, fields: Optional[Sequence[str]] = None):
+        columns = ['id']
+        for name in fields or RECIPE_FIELDS:
+            if name == 'author':
+                columns.extend(AUTHOR_COLUMNS)
+            elif name not in ('id', 'tags', 'ingredients', *MEMBERSHIP_FIELDS):
+                columns.append(name)
+        return columns
+
+    def get_image_url(self, name: str) -> Optional[str]:
+        if not name:
+            return None
+        url = Recipe._meta.get_field('image').storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    @staticmethod
+    def get_tags(recipe_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+        tags = defaultdict(list)
+        rows = Tag.objects.filter(recipe__id__in=recipe_ids).values_list(
+            'recipe__id', 'id', 'name', 'hexcolor', 'slug')
+        for recipe_id, tag_id, name, color, slug in rows:
+            tags[recipe_id].append(
+                {'id': tag_id, 'name': name, 'color': color, 'slug': slug})
+        return tags
+
+    @staticmethod
+    def get_ingredients(recipe_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+        ingredients = defaultdict(list)
+        rows = RecipeIngredientMap.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit__name', 'amount',
+        )
+        for recipe_id, ingredient_id, name, unit, amount in rows:
+            ingredients[recipe_id].append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+        return ingredients
+
+    def to_representation_many(self, rows: List[Dict]) -> List[Dict]:
+        # In the order of the fields of the model serializer
+        fields = [
+            name for name in RECIPE_FIELDS
+            if self.fields is None or name in self.fields
+        ]
+        recipe_ids = [row['id'] for row in rows]
+        tags = self.get_tags(recipe_ids) if 'tags' in fields else {}
+        ingredients = (
+            self.get_ingredients(recipe_ids) if 'ingredients' in fields
+            else {}
+        )
+        memberships = (
+            get_context_memberships(self.context)
+            if set(fields).intersection(('author', *MEMBERSHIP_FIELDS))
+            else None
+        )
+
+        getters = []
+        for name in fields:
+            if name == 'tags':
+                getter = lambda row: tags.get(row['id'], [])  # noqa: E731
+            elif name == 'ingredients':
+                getter = lambda row: ingredients.get(  # noqa: E731
+                    row['id'], [])
+            elif name == 'author':
+                getter = lambda row: {  # noqa: E731
+                    'email': row['author__email'],
+                    'id': row['author_id'],
+                    'username': row['author__username'],
+                    'first_name': row['author__first_name'],
+                    'last_name': row['author__last_name'],
+                    'is_subscribed': (
+                        row['author_id'] in memberships.followings),
+                }
+            elif name in MEMBERSHIP_FIELDS:
+                ids = getattr(memberships, MEMBERSHIP_FIELDS[name])
+                getter = lambda row, ids=ids: row['id'] in ids  # noqa: E731
+            elif name == 'image':
+                getter = lambda row: self.get_image_url(  # noqa: E731
+                    row['image'])
+            else:
+                getter = itemgetter(name)
+            getters.append((name, getter))
+
+        return [
+            {name: getter(row) for name, getter in getters} for row in rows
+        ]
+
+    def to_representation(self, row: Dict) -> Dict:
+        return self.to_representation_many([row])[0]
+
+
+class RowSerializerMixin:
+    """Serializes list and retrieve actions of the view from values() rows
+    by `row_serializer_class`. The schema generator sees the model
+    serializer of the view."""
+    row_serializer_class = None
+
+    def use_rows(self) -> bool:
+        return (
+            self.action in ('list', 'retrieve')
+            and not getattr(self, 'swagger_fake_view', False)
+        )
+
+    def get_serializer_fields(self) -> Optional[Sequence[str]]:
+        return None
+
+    def get_rows(self, queryset):
+        if not self.use_rows():
+            return queryset
+        return queryset.values(*self.row_serializer_class.get_columns(
+            self.get_serializer_fields()))
+
+    def get_queryset(self):
+        return self.get_rows(super().get_queryset())
+
+    def get_serializer_class(self):
+        if self.use_rows():
+            return self.row_serializer_class
+        return super().get_serializer_class()
@@ -0,0 +1,143 @@
+"""Swagger schema of the API generated once instead of on every request.
+
+The schema depends only on the code, so `generate_schema` command writes it
+into SWAGGER_SCHEMA_FILE on deploy, and every process reads the file once.
+Without the file the schema is generated on the first request and kept in
+memory. The documents are served with an ETag, so clients revalidate them
+with a 304 response.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, yaml_sane_dump
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import _SpecRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_INFO = openapi.Info(
+    title="Snippets API",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@snippets.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+
+def generate_schema() -> bytes:
+    """Generates the JSON document of the schema of all the endpoints."""
+    # The views inspect the request, so they get an anonymous one. The empty
+    # URL leaves the host out of the schema, clients use the current one
+    request = APIView().initialize_request(
+        APIRequestFactory().get('/swagger.json'))
+    generator = OpenAPISchemaGenerator(SCHEMA_INFO, url='')
+    schema = generator.get_schema(request=request, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def write_schema(path: str) -> bytes:
+    document = generate_schema()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Workers started in the meantime never read a half-written file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(document)
+    os.replace(tmp_path, path)
+    return document
+
+
+class SchemaCache:
+    """Rendered documents of the schema with their ETags per format."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._documents: Dict[str, Tuple[bytes, str]] = {}
+
+    def _load(self) -> bytes:
+        path = settings.SWAGGER_SCHEMA_FILE
+        if path and os.path.exists(path):
+            with open(path, 'rb') as file:
+                return file.read()
+        logger.warning(
+            'Swagger schema file %s does not exist, generating the schema. '
+            'Run generate_schema command on deploy.', path,
+        )
+        return generate_schema()
+
+    def _render(self, format: str) -> bytes:
+        if format == 'json':
+            return self._load()
+        document = json.loads(
+            self.get('json')[0], object_pairs_hook=OrderedDict)
+        return yaml_sane_dump(document, binary=True)
+
+    def get(self, format: str) -> Tuple[bytes, str]:
+        """Returns the document of the `json` or `yaml` format and its
+        ETag."""
+        if format not in self._documents:
+            # Concurrent first requests wait for a single generation
+            with self._lock:
+                if format not in self._documents:
+                    document = self._render(format)
+                    etag = hashlib.sha256(document).hexdigest()[:32]
+                    self._documents[format] = (document, f'"{etag}"')
+        return self._documents[format]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._documents.clear()
+
+
+schema_cache = SchemaCache()
+
+
+class CachedSchemaView(get_schema_view(
+    SCHEMA_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)):
+    """Serves the schema documents from `schema_cache`. Swagger UI page
+    needs only the title and the version of the schema, it loads the
+    document by a separate request, so the page is rendered without
+    generating the schema."""
+
+    def get(self, request, version='', format=None):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, _SpecRenderer):
+            return Response(openapi.Swagger(
+                info=SCHEMA_INFO, _prefix='/',
+                _version=request.version or version,
+                paths=openapi.Paths(paths={}),
+            ))
+
+        document_format = 'yaml' if 'yaml' in renderer.format else 'json'
+        document, etag = schema_cache.get(document_format)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                document,
+                content_type=f'{renderer.media_type}; '
+                             f'charset={renderer.charset}',
+            )
+        response['ETag'] = etag
+        # The schema changes only on deploy, clients revalidate it by ETag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
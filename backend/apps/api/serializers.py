@@ -6,7 +6,9 @@ from drf_extra_fields.fields import Base64ImageField
 from recipes.models import Ingredient, Recipe, RecipeIngredientMap, Tag
 from rest_framework import serializers
 
-from .utils import email_authentication, get_is_subscribed
+from .filters import get_recipes_limit
+from .memberships import get_context_memberships
+from .utils import email_authentication
 
 User = get_user_model()
 
@@ -48,7 +50,15 @@ class TokenLoginResponseSerializer(serializers.Serializer):
     auth_token = serializers.CharField()
 
 
-class UserGetSerializer(serializers.ModelSerializer):
+class IsSubscribedMixin:
+    """Computes `is_subscribed` field from the ids of the request user's
+    followings (api.memberships)."""
+
+    def get_is_subscribed(self, obj) -> bool:
+        return obj.pk in get_context_memberships(self.context).followings
+
+
+class UserGetSerializer(IsSubscribedMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
 
@@ -59,10 +69,6 @@ class UserGetSerializer(serializers.ModelSerializer):
             'is_subscribed',
         )
 
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return get_is_subscribed(following=obj, follower=user)
-
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
@@ -114,19 +120,18 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    amount = serializers.SerializerMethodField(method_name='get_amount')
-    measurement_unit = serializers.CharField(source='measurement_unit.name')
+    """Ingredient of the recipe with its amount. Serializes
+    RecipeIngredientMap objects, which should be fetched together with
+    `ingredient__measurement_unit`."""
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit.name')
 
     class Meta:
-        model = Ingredient
+        model = RecipeIngredientMap
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
-    def get_amount(self, obj):
-        recipe = self.context['recipe']
-        amount = recipe.ingredients.through.objects.get(
-            recipe=recipe, ingredient=obj).amount
-        return amount
-
 
 class RecipeBriefSerializer(serializers.ModelSerializer):
 
@@ -135,13 +140,24 @@ class RecipeBriefSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Serializes only the fields listed in `fields` argument, if it is
+    given."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeGetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = UserGetSerializer()
-    ingredients = serializers.SerializerMethodField(
-        method_name='get_ingredients')
-    is_favorited = serializers.BooleanField()
-    is_in_shopping_cart = serializers.BooleanField()
+    ingredients = RecipeIngredientSerializer(
+        source='ingredient_maps', many=True)
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -150,11 +166,11 @@ class RecipeGetSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
         )
 
-    def get_ingredients(self, obj) -> List[Dict]:
-        ingredients = obj.ingredients.all()
-        serializer = RecipeIngredientSerializer(
-            instance=ingredients, many=True, context={'recipe': obj})
-        return serializer.data
+    def get_is_favorited(self, obj) -> bool:
+        return obj.pk in get_context_memberships(self.context).favorites
+
+    def get_is_in_shopping_cart(self, obj) -> bool:
+        return obj.pk in get_context_memberships(self.context).cart
 
 
 class RecipeIngredientMapSerializer(serializers.ModelSerializer):
@@ -193,16 +209,16 @@ class RecipeCreateUpdateRequestSerializer(serializers.ModelSerializer):
                 ingredient_data_distinct[ingredient] += amount
             else:
                 ingredient_data_distinct[ingredient] = amount
-        for ingredient, amount in ingredient_data_distinct.items():
-            RecipeIngredientMap.objects.create(
-                recipe=instance,
-                ingredient=ingredient,
-                amount=amount,
-            )
-
+        RecipeIngredientMap.objects.bulk_create([
+            RecipeIngredientMap(
+                recipe=instance, ingredient=ingredient, amount=amount)
+            for ingredient, amount in ingredient_data_distinct.items()
+        ])
+
+        # Only the changed tags are removed and added, so the signals name
+        # them (api.page_cache)
         tag_data = validated_data.pop('tag_maps')
-        instance.tags.clear()
-        instance.tags.add(*tag_data)
+        instance.tags.set(tag_data)
 
         super().update(instance=instance, validated_data=validated_data)
 
@@ -221,16 +237,43 @@ class RecipeCreateUpdateRequestSerializer(serializers.ModelSerializer):
                 ingredient_data_distinct[ingredient] += amount
             else:
                 ingredient_data_distinct[ingredient] = amount
-        for ingredient, amount in ingredient_data_distinct.items():
-            RecipeIngredientMap.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=amount,
-            )
+        RecipeIngredientMap.objects.bulk_create([
+            RecipeIngredientMap(
+                recipe=recipe, ingredient=ingredient, amount=amount)
+            for ingredient, amount in ingredient_data_distinct.items()
+        ])
+        # The tags go last, their signal invalidates the cached recipe
+        # (api.caching)
         recipe.tags.add(*tag_data)
         return recipe
 
 
+class RecipeImportIngredientSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=0)
+
+
+class RecipeImportTagField(serializers.IntegerField):
+    """Id of the tag, or the tag object of the export."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            data = data.get('id')
+        return super().to_internal_value(data)
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    """Recipe of the bulk import (api.recipe_import), like the request of
+    RecipeCreateUpdateRequestSerializer. The ids of the tags and the
+    ingredients and the image are checked by the import in batches."""
+    ingredients = RecipeImportIngredientSerializer(many=True)
+    tags = serializers.ListField(child=RecipeImportTagField())
+    image = serializers.CharField()
+    name = serializers.CharField(max_length=250)
+    text = serializers.CharField()
+    cooking_time = serializers.IntegerField(min_value=0)
+
+
 class RecipeResponseSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all())
@@ -245,13 +288,16 @@ class RecipeResponseSerializer(serializers.ModelSerializer):
         )
 
     def get_ingredients(self, obj) -> List[Dict]:
-        ingredients = obj.ingredients.all()
+        ingredient_maps = obj.ingredient_maps.select_related(
+            'ingredient__measurement_unit')
         serializer = RecipeIngredientSerializer(
-            instance=ingredients, many=True, context={'recipe': obj})
+            instance=ingredient_maps, many=True)
         return serializer.data
 
 
-class UserSubscriptionSerializer(serializers.ModelSerializer):
+class UserSubscriptionSerializer(
+    IsSubscribedMixin, serializers.ModelSerializer
+):
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed')
     recipes = serializers.SerializerMethodField(method_name='get_recipes')
@@ -265,25 +311,17 @@ class UserSubscriptionSerializer(serializers.ModelSerializer):
             'is_subscribed', 'recipes', 'recipes_count',
         )
 
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return get_is_subscribed(following=obj, follower=user)
-
     def get_recipes(self, obj) -> RecipeBriefSerializer.data:
+        # Slicing of prefetched recipes does not hit the database
         recipes = obj.recipes.all()
-        recipes_limit = self.context['request'].query_params.get(
-            'recipes_limit')
+        recipes_limit = get_recipes_limit(request=self.context['request'])
         if recipes_limit is not None:
-            try:
-                recipes_limit = int(recipes_limit)
-            except (TypeError, ValueError):
-                raise serializers.ValidationError(
-                    'Incorrect type of recipes_limit query parameter'
-                )
-            else:
-                recipes = recipes[:recipes_limit]
+            recipes = recipes[:recipes_limit]
         serializer = RecipeBriefSerializer(instance=recipes, many=True)
         return serializer.data
 
     def get_recipes_count(self, obj) -> int:
+        # Annotated by RecipesLimitFilterBackend
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
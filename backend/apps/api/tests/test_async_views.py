@@ -0,0 +1,107 @@
+"""The async read path of the ASGI application returns the same responses
+as the sync views."""
+
+import json
+import shutil
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from monitoring.metrics import REGISTRY
+from monitoring.profiling import ProfileStore
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .test_query_budgets import seed
+
+ASGI_URLCONF = 'api_foodgram.asgi_urls'
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PROTECTED_MEDIA_ROOT=MEDIA_ROOT)
+class AsyncReadPathTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # The async read views use their own connections, so the data must
+        # be committed
+        self.fixture = seed(scale=1)
+        self.token = Token.objects.create(user=self.fixture.actor).key
+
+    def get_sync(self, path: str, auth: bool):
+        client = APIClient()
+        if auth:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        return client.get(path)
+
+    async def get_async(self, path: str, auth: bool):
+        # AsyncClient takes the extra arguments as request headers
+        headers = {'authorization': f'Token {self.token}'} if auth else {}
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            return await AsyncClient().get(path, **headers)
+
+    async def test_responses_are_the_same(self):
+        paths = [
+            ('/api/tags/', False),
+            ('/api/tags/{tag}/', False),
+            ('/api/ingredients/?name=s', False),
+            ('/api/ingredients/{ingredient}/', False),
+            ('/api/recipes/?limit=5', False),
+            ('/api/recipes/?limit=5&is_favorited=1', True),
+            ('/api/recipes/{recipe}/', True),
+            ('/api/recipes/{recipe}/', False),
+            ('/api/users/me/', True),
+            ('/api/users/me/', False),
+        ]
+        for path, auth in paths:
+            path = self.fixture.format(path)
+            with self.subTest(path=path, auth=auth):
+                response = await self.get_async(path, auth)
+                expected = await sync_to_async(self.get_sync)(path, auth)
+
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(
+                    json.loads(response.content),
+                    json.loads(expected.content),
+                )
+
+    async def test_writes_are_served(self):
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            response = await AsyncClient().delete(
+                self.fixture.format('/api/recipes/{own_recipe}/'),
+                authorization=f'Token {self.token}',
+            )
+
+        self.assertEqual(response.status_code, 204)
+
+    async def test_queries_are_recorded_in_metrics(self):
+        key = (
+            'foodgram_db_queries_total',
+            (('view', 'TagViewSet'), ('action', 'list')),
+        )
+        with override_settings(
+                METRICS_MULTIPROC_DIR=None, API_CACHE_TIMEOUT=0):
+            before = REGISTRY.collect()['foodgram_db_queries'].get(key, 0)
+            await self.get_async('/api/tags/', auth=False)
+            after = REGISTRY.collect()['foodgram_db_queries'][key]
+
+        self.assertEqual(after - before, 1)
+
+    async def test_requests_are_profiled(self):
+        actor = self.fixture.actor
+        actor.is_staff = True
+        await sync_to_async(actor.save)()
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILES_DIR=directory):
+                response = await self.get_async(
+                    '/api/recipes/?profile=1', auth=True)
+                profile = ProfileStore().get(response['X-Profile-Id'])
+
+        self.assertEqual(profile['path'], '/api/recipes/')
+        self.assertTrue(profile['functions'])
+        self.assertGreater(profile['queries'], 0)
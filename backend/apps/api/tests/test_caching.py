@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from api.caching import TwoTierCache, api_cache
+from api.locks import cache_lock
+from api.warmup import warm_up
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class ApiCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.tag = Tag.objects.create(name='Lunch', slug='lunch')
+        cls.recipe = Recipe.objects.create(
+            name='Soup', text='Boil', image='recipes/soup.png',
+            author=cls.user, cooking_time=10,
+        )
+        cls.recipe.tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+        api_cache.local.clear()
+        self.client = APIClient()
+
+    def get(self, path: str, queries: int = None):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        if queries is not None:
+            self.assertEqual(len(captured), queries)
+        return response.json()
+
+    def test_warm_up_fills_cached_lists(self):
+        with mock.patch('api.warmup.connections'):
+            warm_up()
+
+        self.assertEqual(self.get('/api/tags/', queries=0)[0]['name'], 'Lunch')
+        self.get('/api/ingredients/', queries=0)
+
+    def test_tags_are_invalidated_on_write(self):
+        self.get('/api/tags/')
+        self.assertEqual(self.get('/api/tags/', queries=0)[0]['name'], 'Lunch')
+
+        self.tag.name = 'Dinner'
+        self.tag.save()
+        self.assertEqual(self.get('/api/tags/')[0]['name'], 'Dinner')
+        tag = self.get(f'/api/tags/{self.tag.pk}/')
+        self.assertEqual(tag['name'], 'Dinner')
+
+    def test_recipe_flags_are_not_cached(self):
+        path = f'/api/recipes/{self.recipe.pk}/'
+        anonymous = self.get(path)
+        self.assertEqual(self.get(path, queries=0), anonymous)
+
+        self.recipe.followers.add(self.user)
+        self.client.force_authenticate(self.user)
+        recipe = self.get(path, queries=1)
+        self.assertIs(recipe['is_favorited'], True)
+        self.assertIs(recipe['is_in_shopping_cart'], False)
+        with override_settings(API_CACHE_TIMEOUT=0):
+            self.assertEqual(recipe, self.get(path))
+        self.assertEqual(
+            self.get(f'{path}?fields=id,name'),
+            {'id': self.recipe.pk, 'name': 'Soup'},
+        )
+
+        self.recipe.name = 'Borsch'
+        self.recipe.save()
+        self.assertEqual(self.get(path)['name'], 'Borsch')
+
+    def test_missing_value_is_computed_once(self):
+        two_tier_cache = TwoTierCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                two_tier_cache.get_or_set(('tags', ), 'key', compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_processes_fill_value_once_with_file_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        # Caches of separate processes share only the files
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                TwoTierCache().get_or_set(('tags', ), 'key', compute)))
+            for _ in range(5)
+        ]
+        with override_settings(CACHES={
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': directory,
+            },
+        }):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_fill_does_not_release_lock_of_other_process(self):
+        two_tier_cache = TwoTierCache()
+        key = two_tier_cache.make_key(('tags', ), 'key')
+        with mock.patch('api.caching.LOCK_TIMEOUT', 0.05), cache_lock(
+                'default', key, wait=0, timeout=10):
+            value = two_tier_cache.get_or_set(
+                ('tags', ), 'key', lambda: 'value')
+            self.assertEqual(value, 'value')
+            self.assertTrue(caches['default'].get(f'{key}:lock'))
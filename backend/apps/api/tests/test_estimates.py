@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(
+    EXACT_COUNT_THRESHOLD=100, PAGE_CACHE_TIMEOUT=0, API_CACHE_TIMEOUT=0)
+class EstimatedPaginationTest(TestCase):
+    """The statistics of PostgreSQL are replaced by the given estimates."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'cook{number}', email=f'cook{number}@example.com',
+                password='password',
+            )
+            for number in range(5)
+        ]
+        for user in cls.users[:3]:
+            Recipe.objects.create(
+                name='Soup', text='Boil', image='recipes/soup.png',
+                author=user, cooking_time=10,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, path: str, table_rows=None, planner_rows=None):
+        with mock.patch(
+            'api.estimates.table_estimate', return_value=table_rows
+        ), mock.patch(
+            'api.estimates.planner_estimate', return_value=planner_rows
+        ) as planner_estimate:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), planner_estimate.called
+
+    def test_unfiltered_list_counted_by_table_size(self):
+        page, explained = self.get('/api/users/?limit=2', table_rows=1000)
+        self.assertEqual(page['count'], 1000)
+        self.assertFalse(explained)
+
+        # The next page is known by the rows, not by the estimate
+        page, _ = self.get('/api/users/?limit=2&page=3', table_rows=1000)
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNone(page['next'])
+        page, _ = self.get('/api/users/?limit=2&page=9', table_rows=1000)
+        self.assertEqual(page['results'], [])
+
+    def test_filtered_list_counted_by_planner(self):
+        path = f'/api/recipes/?author={self.users[0].pk}'
+        page, explained = self.get(path, table_rows=1000, planner_rows=500)
+        self.assertEqual(page['count'], 500)
+        self.assertTrue(explained)
+
+        page, _ = self.get(path, table_rows=1000, planner_rows=50)
+        self.assertEqual(page['count'], 1)
+        page, explained = self.get('/api/recipes/', table_rows=10)
+        self.assertEqual(page['count'], 3)
+        self.assertFalse(explained)
@@ -0,0 +1,126 @@
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from recipes.models import Ingredient, MeasurementUnit, Recipe, Tag
+from rest_framework.test import APIClient
+from shopping_carts.models import CartItem
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THROTTLE_RATES={})
+class UserExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cook = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.chef = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password')
+        tag = Tag.objects.create(name='Lunch', slug='lunch')
+        salt = Ingredient.objects.create(
+            name='Salt', measurement_unit=MeasurementUnit.objects.create(
+                name='g'))
+        cls.recipes = []
+        for number in range(3):
+            recipe = Recipe(
+                name=f'Soup {number}', text='Boil', author=cls.cook,
+                cooking_time=10,
+            )
+            recipe.image.save(
+                f'soup{number}.png', ContentFile(b'image'), save=False)
+            recipe.save()
+            recipe.tags.add(tag)
+            recipe.ingredients.add(salt, through_defaults={'amount': 5})
+            cls.recipes.append(recipe)
+        steak = Recipe.objects.create(
+            name='Steak', text='Fry', image='recipes/steak.png',
+            author=cls.chef, cooking_time=20,
+        )
+        steak.followers.add(cls.cook)
+        cls.cook.followings.add(cls.chef)
+        CartItem.objects.create(user=cls.cook, recipe=steak)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.cook)
+
+    def export(self, query: str = ''):
+        response = self.client.get(f'/api/users/me/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+
+    def test_export(self):
+        lines = self.export()
+        self.assertEqual(
+            [line['type'] for line in lines],
+            ['user', 'recipe', 'recipe', 'recipe', 'favorite', 'following',
+             'cart_item'],
+        )
+        self.assertEqual(lines[0]['username'], 'cook')
+        recipe = lines[1]
+        self.assertEqual(recipe['name'], 'Soup 0')
+        self.assertEqual(recipe['tags'][0]['slug'], 'lunch')
+        self.assertEqual(recipe['ingredients'][0]['amount'], 5)
+        self.assertTrue(recipe['image'].startswith('http://testserver/'))
+        self.assertEqual(lines[4]['name'], 'Steak')
+        self.assertEqual(lines[5]['username'], 'chef')
+        self.assertEqual(lines[6]['name'], 'Steak')
+
+        recipe = self.export('?images=base64')[1]
+        self.assertEqual(base64.b64decode(recipe['image']), b'image')
+        self.assertNotIn('image', self.export('?images=none')[1])
+        self.assertEqual(
+            self.client.get('/api/users/me/export/?images=raw').status_code,
+            400,
+        )
+        self.client.force_authenticate(None)
+        self.assertEqual(
+            self.client.get('/api/users/me/export/').status_code, 401)
+
+    def test_missing_image_is_exported_as_null(self):
+        recipe = Recipe.objects.create(
+            name='Stew', text='Stew', image='recipes/missing.png',
+            author=self.cook, cooking_time=60,
+        )
+
+        with self.assertLogs('api.export', 'WARNING'):
+            lines = self.export('?images=base64')
+        self.assertEqual(lines[-4]['id'], recipe.pk)
+        self.assertIsNone(lines[-4]['image'])
+        self.assertEqual(lines[-1]['type'], 'cart_item')
+
+    def test_command_reads_recipes_in_chunks(self):
+        output = os.path.join(MEDIA_ROOT, 'cook.ndjson')
+        call_command(
+            'export_user', 'cook', output=output, chunk_size=2,
+            stderr=io.StringIO(),
+        )
+        with open(output) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(
+            [line['name'] for line in lines if line['type'] == 'recipe'],
+            ['Soup 0', 'Soup 1', 'Soup 2'],
+        )
+        self.assertTrue(all(
+            line['tags'] and line['ingredients']
+            for line in lines if line['type'] == 'recipe'
+        ))
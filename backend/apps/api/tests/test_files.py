@@ -0,0 +1,122 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from api.files import protected_path, write_protected_file
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredientMap)
+from rest_framework.test import APIClient
+from shopping_carts.models import CartItem
+
+User = get_user_model()
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class DownloadShoppingCartTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings = override_settings(PROTECTED_MEDIA_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        ingredient = Ingredient.objects.create(
+            name='Flour',
+            measurement_unit=MeasurementUnit.objects.create(name='g'),
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                name=f'Recipe {number}', image='recipes/recipe.png',
+                text='Text', author=self.user, cooking_time=5,
+            )
+            for number in range(2)
+        ]
+        for recipe in self.recipes:
+            RecipeIngredientMap.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100)
+        CartItem.objects.create(user=self.user, recipe=self.recipes[0])
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cart_files(self):
+        return os.listdir(
+            os.path.join(self.root, f'shopping_carts/{self.user.pk}'))
+
+    @override_settings(USE_X_ACCEL_REDIRECT=True)
+    def test_nginx_sends_file(self):
+        response = self.client.get(URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename=Shopping list.pdf',
+        )
+        name, = self.cart_files()
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            f'/protected/shopping_carts/{self.user.pk}/{name}',
+        )
+
+    @mock.patch('api.files.KEEP_SECONDS', 0)
+    def test_file_is_rendered_after_change_only(self):
+        with mock.patch(
+            'api.utils.make_shopping_cart_pdf_from_ingredients',
+            return_value=b'%PDF',
+        ) as render:
+            first = b''.join(self.client.get(URL).streaming_content)
+            self.client.get(URL)
+            self.assertEqual(render.call_count, 1)
+
+            CartItem.objects.create(user=self.user, recipe=self.recipes[1])
+            self.client.get(URL)
+            self.assertEqual(render.call_count, 2)
+
+        self.assertEqual(first, b'%PDF')
+        self.assertEqual(len(self.cart_files()), 1)
+
+    def test_recently_served_file_is_kept(self):
+        with mock.patch(
+            'api.utils.make_shopping_cart_pdf_from_ingredients',
+            return_value=b'%PDF',
+        ):
+            self.client.get(URL)
+            CartItem.objects.create(user=self.user, recipe=self.recipes[1])
+            self.client.get(URL)
+
+        # The first file may still be waiting for nginx
+        self.assertEqual(len(self.cart_files()), 2)
+
+    def test_concurrent_writes_of_file(self):
+        name = 'shopping_carts/list.pdf'
+        errors = []
+
+        def write(content):
+            try:
+                write_protected_file(name, content)
+            except OSError as error:
+                errors.append(error)
+
+        threads = [
+            threading.Thread(target=write, args=(bytes([number]) * 10000, ))
+            for number in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with open(protected_path(name), 'rb') as file:
+            content = file.read()
+        self.assertEqual(content, content[:1] * 10000)
+        self.assertEqual(os.listdir(os.path.dirname(protected_path(name))),
+                         ['list.pdf'])
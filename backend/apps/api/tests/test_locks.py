@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from api.locks import cache_lock, has_lock
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+CACHE_DIR = tempfile.mkdtemp()
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'locks',
+    },
+    'files': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    },
+    'custom': {
+        'BACKEND': 'example.cache.CustomCache',
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class CacheLockTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def test_has_lock(self):
+        self.assertTrue(has_lock('default'))
+        self.assertTrue(has_lock('files'))
+        self.assertFalse(has_lock('custom'))
+
+    def test_lock_excludes_other_holders(self):
+        for alias in ('default', 'files'):
+            with self.subTest(alias=alias):
+                with cache_lock(alias, 'key', wait=0, timeout=10) as taken:
+                    self.assertTrue(taken)
+                    with cache_lock(alias, 'key', wait=0.05,
+                                    timeout=10) as other:
+                        self.assertFalse(other)
+                    # The lock which is not taken is not released
+                    with cache_lock(alias, 'key', wait=0,
+                                    timeout=10) as other:
+                        self.assertFalse(other)
+                with cache_lock(alias, 'key', wait=0, timeout=10) as taken:
+                    self.assertTrue(taken)
+
+    def test_file_lock_is_atomic(self):
+        # FileBasedCache.add checks and writes the file in two steps
+        def increment():
+            for _ in range(20):
+                with cache_lock('files', 'key', wait=10, timeout=10):
+                    value = caches['files'].get('counter', 0)
+                    caches['files'].set('counter', value + 1)
+
+        threads = [threading.Thread(target=increment) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(caches['files'].get('counter'), 100)
+        # The lock files are not entries of the cache
+        self.assertTrue(any(
+            name.endswith('.lock') for name in os.listdir(CACHE_DIR)))
+        caches['files'].clear()
+        self.assertTrue(any(
+            name.endswith('.lock') for name in os.listdir(CACHE_DIR)))
@@ -0,0 +1,144 @@
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from api.memberships import (FAVORITES, IdSet, get_memberships,
+                             update_memberships)
+from api.utils import add_recipe_to_favorites
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(
+    THROTTLE_RATES={}, API_CACHE_TIMEOUT=0, PAGE_CACHE_TIMEOUT=0)
+class MembershipsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.chef = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password')
+        cls.recipe = Recipe.objects.create(
+            name='Soup', text='Boil', image='recipes/soup.png',
+            author=cls.chef, cooking_time=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_id_set(self):
+        ids = IdSet([5, 1, 3, 3])
+        ids.add(2)
+        ids.add(5)
+        ids.discard(3)
+        ids.discard(4)
+
+        self.assertEqual(list(ids.ids), [1, 2, 5])
+        self.assertIn(2, ids)
+        self.assertNotIn(3, ids)
+        self.assertNotIn(None, ids)
+        self.assertEqual(list(IdSet.from_bytes(ids.to_bytes()).ids), [1, 2, 5])
+
+    def test_toggles_update_cached_memberships(self):
+        path = f'/api/recipes/{self.recipe.pk}/'
+        # Cached by the first read
+        recipe = self.client.get(path).json()
+        self.assertFalse(recipe['is_favorited'])
+        self.assertFalse(recipe['author']['is_subscribed'])
+
+        # The cached sets are updated after the commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{path}favorite/')
+            self.client.post(f'{path}shopping_cart/')
+            self.client.post(f'/api/users/{self.chef.pk}/subscribe/')
+        with self.assertNumQueries(0):
+            memberships = get_memberships(self.user)
+        self.assertIn(self.recipe.pk, memberships.favorites)
+        self.assertIn(self.recipe.pk, memberships.cart)
+        self.assertIn(self.chef.pk, memberships.followings)
+
+        recipe = self.client.get(path).json()
+        self.assertTrue(recipe['is_favorited'])
+        self.assertTrue(recipe['is_in_shopping_cart'])
+        self.assertTrue(recipe['author']['is_subscribed'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'{path}favorite/')
+            self.client.delete(f'/api/users/{self.chef.pk}/subscribe/')
+        recipe = self.client.get(
+            '/api/recipes/?is_in_shopping_cart=1').json()['results'][0]
+        self.assertFalse(recipe['is_favorited'])
+        self.assertTrue(recipe['is_in_shopping_cart'])
+        self.assertFalse(recipe['author']['is_subscribed'])
+
+    def test_rolled_back_toggle_is_not_cached(self):
+        get_memberships(self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            add_recipe_to_favorites(recipe=self.recipe, user=self.user)
+            raise IntegrityError('duplicate key')
+
+        with self.assertNumQueries(0):
+            memberships = get_memberships(self.user)
+        self.assertNotIn(self.recipe.pk, memberships.favorites)
+
+    def test_flags_of_cached_memberships(self):
+        self.client.get('/api/recipes/?view=card')
+        # The count and the rows, the flags need no query
+        with self.assertNumQueries(2):
+            recipe, = self.client.get(
+                '/api/recipes/?view=card').json()['results']
+        self.assertFalse(recipe['is_favorited'])
+
+    def test_disabled_cache(self):
+        self.recipe.followers.add(self.user)
+        with override_settings(MEMBERSHIP_CACHE_TIMEOUT=0):
+            self.assertIn(self.recipe.pk, get_memberships(self.user).favorites)
+            self.recipe.followers.remove(self.user)
+            self.assertNotIn(
+                self.recipe.pk, get_memberships(self.user).favorites)
+
+    def test_concurrent_toggles_with_file_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(CACHES={
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': directory,
+            },
+        }):
+            get_memberships(self.user)
+            # Outside of the transaction of the test the sets are updated
+            # at once
+            threads = [
+                threading.Thread(target=update_memberships, args=(
+                    self.user, FAVORITES, pk, True))
+                for pk in range(1, 21)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            with self.assertNumQueries(0):
+                memberships = get_memberships(self.user)
+        self.assertEqual(list(memberships.favorites.ids), list(range(1, 21)))
+
+    def test_toggle_deletes_entry_of_cache_without_locks(self):
+        get_memberships(self.user)
+        with mock.patch('api.memberships.has_lock', return_value=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                add_recipe_to_favorites(recipe=self.recipe, user=self.user)
+
+        with self.assertNumQueries(1):
+            memberships = get_memberships(self.user)
+        self.assertIn(self.recipe.pk, memberships.favorites)
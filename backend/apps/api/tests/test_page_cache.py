@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class RecipePageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cook = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.chef = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password')
+        cls.lunch = Tag.objects.create(name='Lunch', slug='lunch')
+        cls.dinner = Tag.objects.create(name='Dinner', slug='dinner')
+        cls.soup = cls.create_recipe('Soup', cls.cook, cls.lunch)
+        cls.steak = cls.create_recipe('Steak', cls.chef, cls.dinner)
+
+    @staticmethod
+    def create_recipe(name: str, author, tag) -> Recipe:
+        recipe = Recipe.objects.create(
+            name=name, text='Cook', image='recipes/dish.png', author=author,
+            cooking_time=10,
+        )
+        recipe.tags.add(tag)
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, path: str):
+        """Returns the names of the recipes of the page and whether it has
+        been served from the cache."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        names = [recipe['name'] for recipe in response.json()['results']]
+        return names, not queries
+
+    def test_anonymous_pages_are_cached(self):
+        self.get('/api/recipes/?tags=lunch&limit=5')
+        self.assertEqual(
+            self.get('/api/recipes/?limit=5&tags=lunch'), (['Soup'], True))
+
+        self.client.force_authenticate(self.cook)
+        self.assertEqual(
+            self.get('/api/recipes/?tags=lunch&limit=5'), (['Soup'], False))
+
+    def test_new_recipe_purges_its_lists(self):
+        paths = (
+            '/api/recipes/', '/api/recipes/?tags=lunch',
+            '/api/recipes/?tags=dinner',
+            f'/api/recipes/?author={self.chef.pk}',
+        )
+        for path in paths:
+            self.get(path)
+
+        self.create_recipe('Salad', self.cook, self.lunch)
+
+        self.assertEqual(
+            self.get('/api/recipes/'), (['Salad', 'Steak', 'Soup'], False))
+        self.assertEqual(
+            self.get('/api/recipes/?tags=lunch'), (['Salad', 'Soup'], False))
+        self.assertEqual(self.get(paths[2]), (['Steak'], True))
+        self.assertEqual(self.get(paths[3]), (['Steak'], True))
+
+    def test_changes_purge_the_pages_showing_them(self):
+        lunch, dinner = '/api/recipes/?tags=lunch', '/api/recipes/?tags=dinner'
+        self.get(lunch)
+        self.get(dinner)
+
+        self.soup.name = 'Borsch'
+        self.soup.save()
+        self.assertEqual(self.get(lunch), (['Borsch'], False))
+        self.assertEqual(self.get(dinner), (['Steak'], True))
+
+        self.steak.tags.set([self.lunch])
+        self.assertEqual(self.get(lunch), (['Steak', 'Borsch'], False))
+        self.assertEqual(self.get(dinner), ([], False))
+
+        self.soup.delete()
+        self.assertEqual(self.get(lunch), (['Steak'], False))
@@ -0,0 +1,105 @@
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE=3600)
+class RecipePopularityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cook = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.guests = [
+            User.objects.create_user(
+                username=f'guest{number}', email=f'guest{number}@example.com',
+                password='password',
+            )
+            for number in range(3)
+        ]
+        cls.soup, cls.steak, cls.salad = [
+            Recipe.objects.create(
+                name=name, text='Cook', image='recipes/dish.png',
+                author=cls.cook, cooking_time=10,
+            )
+            for name in ('Soup', 'Steak', 'Salad')
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def post(self, user, recipe: Recipe, action: str, method: str = 'post'):
+        self.client.force_authenticate(user)
+        response = getattr(self.client, method)(
+            f'/api/recipes/{recipe.pk}/{action}/')
+        self.assertIn(response.status_code, (201, 204))
+
+    def get_names(self, ordering: str):
+        self.client.force_authenticate(None)
+        response = self.client.get(f'/api/recipes/?ordering={ordering}')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_orderings(self):
+        for guest in self.guests:
+            self.post(guest, self.steak, 'favorite')
+        self.post(self.guests[0], self.soup, 'favorite')
+        for guest in self.guests[:2]:
+            self.post(guest, self.salad, 'shopping_cart')
+        self.post(self.guests[0], self.salad, 'shopping_cart', 'delete')
+
+        self.assertEqual(self.get_names('popular'), ['Steak', 'Soup', 'Salad'])
+        self.assertEqual(
+            self.get_names('trending'), ['Steak', 'Salad', 'Soup'])
+        self.assertEqual(
+            self.client.get('/api/recipes/?ordering=name').status_code, 400)
+
+        self.post(self.guests[0], self.steak, 'favorite', 'delete')
+        self.steak.refresh_from_db()
+        self.assertEqual(self.steak.favorites_count, 2)
+        self.assertAlmostEqual(self.steak.trending_score, 3, places=3)
+
+    def test_duplicate_favorite_is_not_counted(self):
+        # Added by a concurrent request
+        self.soup.followers.add(self.guests[0])
+        Recipe.objects.filter(pk=self.soup.pk).update(favorites_count=1)
+
+        self.client.force_authenticate(self.guests[0])
+        response = self.client.post(f'/api/recipes/{self.soup.pk}/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.favorites_count, 1)
+
+        self.post(self.guests[0], self.soup, 'favorite', 'delete')
+        response = self.client.delete(
+            f'/api/recipes/{self.soup.pk}/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.favorites_count, 0)
+
+    def test_refresh_decays_scores_and_recounts_favorites(self):
+        self.post(self.guests[0], self.soup, 'favorite')
+        self.post(self.guests[1], self.steak, 'favorite')
+        # The favorite of the soup has been added two half-lives ago
+        Recipe.objects.filter(pk=self.soup.pk).update(
+            trending_updated_at=time.time() - 2 * 3600)
+        self.guests[1].delete()
+
+        call_command('refresh_popularity', batch_size=1, stdout=io.StringIO())
+
+        self.soup.refresh_from_db()
+        self.steak.refresh_from_db()
+        self.assertAlmostEqual(self.soup.trending_score, 0.25, places=3)
+        self.assertAlmostEqual(self.steak.trending_score, 1, places=3)
+        self.assertEqual(self.soup.favorites_count, 1)
+        self.assertEqual(self.steak.favorites_count, 0)
+        self.assertEqual(
+            self.get_names('trending'), ['Steak', 'Soup', 'Salad'])
@@ -0,0 +1,436 @@
+"""Query count and latency budgets of the API endpoints.
+
+Every endpoint is requested with a small and a large dataset. The number
+of SQL queries must not depend on the amount of data (no N+1 queries)
+and must not exceed the declared budget. Each request is rolled back,
+so all the endpoints see the same data.
+"""
+
+import base64
+import json
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from api.popularity import recount_favorites
+from api.urls import urlpatterns
+from benchmarks.synthetic import (PNG_PIXEL, SyntheticConfig,
+                                  SyntheticDataGenerator, flush_synthetic_data)
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver
+from recipes.models import Ingredient, Recipe, RecipeIngredientMap, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from shopping_carts.models import CartItem
+
+User = get_user_model()
+
+ACTOR_PASSWORD = 'budget-actor-password'
+IMAGE = 'data:image/png;base64,' + base64.b64encode(PNG_PIXEL).decode()
+
+SIZES = {
+    'small': 1,
+    'large': 3,
+}
+
+
+def make_config(scale: int) -> SyntheticConfig:
+    return SyntheticConfig(
+        users=10 * scale,
+        recipes=20 * scale,
+        tags=3,
+        ingredients=20 * scale,
+        ingredients_per_recipe=3,
+        tags_per_recipe=2,
+        follows_per_user=2,
+        favorites_per_user=3,
+        cart_per_user=2,
+        seed=scale,
+        batch_size=100,
+    )
+
+
+@dataclass
+class Budget:
+    """Budget of one request. `path` and `data` may contain placeholders
+    of the Fixture fields."""
+    name: str
+    method: str
+    path: str
+    queries: int
+    latency_ms: int = 500
+    auth: bool = True
+    data: Optional[Dict] = None
+    status: int = 200
+    content_type: str = 'application/json'
+
+
+def recipe_data(fixture: 'Fixture') -> Dict:
+    return {
+        'ingredients': [
+            {'id': ingredient_id, 'amount': 10}
+            for ingredient_id in fixture.ingredients
+        ],
+        'tags': fixture.tags,
+        'image': IMAGE,
+        'name': 'Budget recipe',
+        'text': 'Budget recipe text',
+        'cooking_time': 10,
+    }
+
+
+BUDGETS = [
+    Budget('api-root', 'GET', '/api/', queries=1),
+    Budget(
+        'token-login', 'POST', '/api/auth/token/login/', queries=2,
+        latency_ms=2000, auth=False,
+        data={'email': '{actor_email}', 'password': ACTOR_PASSWORD},
+    ),
+    Budget(
+        'token-logout', 'POST', '/api/auth/token/logout/', queries=2,
+        status=204,
+    ),
+    Budget('users-list', 'GET', '/api/users/', queries=4),
+    Budget('users-list', 'GET', '/api/users/', queries=2, auth=False),
+    Budget(
+        'users-list', 'POST', '/api/users/', queries=5, latency_ms=2000,
+        auth=False, status=201,
+        data={
+            'email': 'budget_user@example.com',
+            'username': 'budget_user',
+            'first_name': 'Budget',
+            'last_name': 'User',
+            'password': 'budget-user-password',
+        },
+    ),
+    Budget('users-detail', 'GET', '/api/users/{author}/', queries=3),
+    Budget('users-me', 'GET', '/api/users/me/', queries=2),
+    # The tags and the ingredients are selected once per chunk of recipes
+    Budget('users-export', 'GET', '/api/users/me/export/', queries=8),
+    Budget(
+        'users-set-password', 'POST', '/api/users/set_password/',
+        queries=4, latency_ms=2000, status=204,
+        data={
+            'current_password': ACTOR_PASSWORD,
+            'new_password': 'budget-new-password',
+        },
+    ),
+    Budget(
+        'users-subscriptions', 'GET', '/api/users/subscriptions/',
+        queries=5,
+    ),
+    Budget(
+        'users-subscriptions', 'GET',
+        '/api/users/subscriptions/?recipes_limit=2', queries=5,
+    ),
+    Budget(
+        'users-subscribe', 'POST', '/api/users/{stranger}/subscribe/',
+        queries=7, status=201,
+    ),
+    Budget(
+        'users-subscribe', 'DELETE', '/api/users/{author}/subscribe/',
+        queries=4, status=204,
+    ),
+    Budget('tags-list', 'GET', '/api/tags/', queries=1, auth=False),
+    Budget('tags-detail', 'GET', '/api/tags/{tag}/', queries=1, auth=False),
+    Budget(
+        'ingredients-list', 'GET', '/api/ingredients/', queries=1,
+        auth=False,
+    ),
+    Budget(
+        'ingredients-list', 'GET', '/api/ingredients/?name=synthetic',
+        queries=1, auth=False,
+    ),
+    Budget(
+        'ingredients-detail', 'GET', '/api/ingredients/{ingredient}/',
+        queries=1, auth=False,
+    ),
+    Budget('recipes-list', 'GET', '/api/recipes/', queries=4, auth=False),
+    Budget('recipes-list', 'GET', '/api/recipes/', queries=6),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?tags={tag_slug}', queries=6),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?author={author}', queries=6),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?is_favorited=1', queries=6),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?is_in_shopping_cart=1',
+        queries=6,
+    ),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?view=card', queries=2,
+        auth=False,
+    ),
+    # measure() clears the cache, so the budgets are of a miss of the cache
+    # of the memberships (api.memberships): one query selects the favorites,
+    # the cart and the followings of the user instead of the subqueries of
+    # the flags in every row. With the cached memberships, as on the most
+    # requests, the flags need no query (test_memberships)
+    Budget('recipes-list', 'GET', '/api/recipes/?view=card', queries=4),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?ordering=popular', queries=6),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?ordering=trending', queries=4,
+        auth=False,
+    ),
+    Budget(
+        'recipes-list', 'GET', '/api/recipes/?fields=id,name&expand=author',
+        queries=4,
+    ),
+    Budget(
+        'recipes-list', 'POST', '/api/recipes/', queries=13, status=201,
+        data=recipe_data,
+    ),
+    # One line of NDJSON: the tags and the ingredients are checked and the
+    # rows inserted once per batch of lines
+    Budget(
+        'recipes-import', 'POST', '/api/recipes/import/', queries=8,
+        latency_ms=5000, status=201, data=recipe_data,
+        content_type='application/x-ndjson',
+    ),
+    Budget(
+        'recipes-detail', 'GET', '/api/recipes/{recipe}/', queries=3,
+        auth=False,
+    ),
+    Budget('recipes-detail', 'GET', '/api/recipes/{recipe}/', queries=5),
+    # The memberships on a miss of the cache, as of the card list above
+    Budget(
+        'recipes-detail', 'GET', '/api/recipes/{recipe}/?view=card',
+        queries=3,
+    ),
+    Budget(
+        'recipes-detail', 'PUT', '/api/recipes/{own_recipe}/', queries=17,
+        data=recipe_data,
+    ),
+    Budget(
+        'recipes-detail', 'PATCH', '/api/recipes/{own_recipe}/', queries=17,
+        data=recipe_data,
+    ),
+    # The tags of the deleted recipe name the cached pages to purge
+    Budget(
+        'recipes-detail', 'DELETE', '/api/recipes/{own_recipe}/',
+        queries=8, status=204,
+    ),
+    Budget(
+        'recipes-download-shopping-cart', 'GET',
+        '/api/recipes/download_shopping_cart/', queries=2, latency_ms=2000,
+    ),
+    # The additions update the popularity of the recipe (api.popularity).
+    # The cart items and the favorites are inserted in a savepoint
+    # (SAVEPOINT and RELEASE in the test transaction) instead of a check
+    # before them, so their unique constraints report concurrent duplicates
+    Budget(
+        'recipes-shopping-cart', 'POST',
+        '/api/recipes/{stranger_recipe}/shopping_cart/', queries=6,
+        status=201,
+    ),
+    Budget(
+        'recipes-shopping-cart', 'DELETE',
+        '/api/recipes/{recipe}/shopping_cart/', queries=3, status=204,
+    ),
+    Budget(
+        'recipes-favorite', 'POST',
+        '/api/recipes/{stranger_recipe}/favorite/', queries=6, status=201,
+    ),
+    Budget(
+        'recipes-favorite', 'DELETE', '/api/recipes/{recipe}/favorite/',
+        queries=4, status=204,
+    ),
+]
+
+
+@dataclass
+class Fixture:
+    """Objects which the requests refer to. The actor follows, favorites
+    and has in the shopping cart the more objects the larger the dataset is,
+    so every list grows with the dataset."""
+    actor: User
+    author: int
+    stranger: int
+    recipe: int
+    stranger_recipe: int
+    own_recipe: int
+    tag: int
+    tag_slug: str
+    ingredient: int
+    ingredients: List[int] = field(default_factory=list)
+    tags: List[int] = field(default_factory=list)
+
+    @property
+    def actor_email(self) -> str:
+        return self.actor.email
+
+    def format(self, value):
+        if callable(value):
+            return value(self)
+        if isinstance(value, str):
+            return value.format_map(self)
+        if isinstance(value, dict):
+            return {key: self.format(item) for key, item in value.items()}
+        return value
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+def seed(scale: int) -> Fixture:
+    flush_synthetic_data()
+    SyntheticDataGenerator(make_config(scale)).generate()
+
+    actor = User.objects.create_user(
+        username='synthetic_actor',
+        email='synthetic_actor@example.com',
+        first_name='Actor',
+        last_name='Actor',
+        password=ACTOR_PASSWORD,
+    )
+    authors = list(
+        User.objects.filter(recipes__isnull=False).distinct()[:4 * scale])
+    actor.followings.add(*authors)
+
+    recipes = list(Recipe.objects.all()[:5 * scale])
+    actor.favourite_recipes.add(*recipes)
+    CartItem.objects.bulk_create(
+        CartItem(user=actor, recipe=recipe) for recipe in recipes)
+
+    ingredients = list(Ingredient.objects.values_list('id', flat=True)[:3])
+    tags = list(Tag.objects.values_list('id', flat=True)[:2])
+    own_recipe = Recipe.objects.create(
+        name='Own recipe', image='recipes/synthetic.png', text='Own recipe',
+        author=actor, cooking_time=5,
+    )
+    RecipeIngredientMap.objects.bulk_create(
+        RecipeIngredientMap(
+            recipe=own_recipe, ingredient_id=ingredient_id, amount=1)
+        for ingredient_id in ingredients
+    )
+    own_recipe.tags.add(*tags)
+
+    stranger = User.objects.exclude(
+        pk__in=[author.pk for author in authors]
+    ).exclude(pk=actor.pk).filter(recipes__isnull=False).first()
+    stranger_recipe = Recipe.objects.exclude(
+        pk__in=[recipe.pk for recipe in recipes]).exclude(
+        author=actor).first()
+    tag = Tag.objects.filter(recipe__isnull=False).first()
+    # The favorites of the actor are added in bulk
+    recount_favorites(batch_size=1000)
+
+    return Fixture(
+        actor=actor,
+        author=authors[0].pk,
+        stranger=stranger.pk,
+        recipe=recipes[0].pk,
+        stranger_recipe=stranger_recipe.pk,
+        own_recipe=own_recipe.pk,
+        tag=tag.pk,
+        tag_slug=tag.slug,
+        ingredient=ingredients[0],
+        ingredients=ingredients,
+        tags=tags,
+    )
+
+
+@dataclass
+class Measurement:
+    queries: List[str]
+    latency_ms: float
+    status: int
+
+
+def iter_url_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def measure(self, budget: Budget, fixture: Fixture) -> Measurement:
+        client = APIClient()
+        if budget.auth:
+            token = Token.objects.get_or_create(user=fixture.actor)[0]
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        # The budgets are of the requests missing the API cache
+        cache.clear()
+        with transaction.atomic():
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.generic(
+                    budget.method,
+                    fixture.format(budget.path),
+                    data=json.dumps(fixture.format(budget.data)),
+                    content_type=budget.content_type,
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latency = time.perf_counter() - start
+            transaction.set_rollback(True)
+
+        return Measurement(
+            queries=[query['sql'] for query in queries.captured_queries],
+            latency_ms=latency * 1000,
+            status=response.status_code,
+        )
+
+    def test_every_route_has_budget(self):
+        budget_names = {budget.name for budget in BUDGETS}
+        for name in set(iter_url_names(urlpatterns)):
+            with self.subTest(route=name):
+                self.assertIn(name, budget_names)
+
+    def test_query_budgets(self):
+        measurements = {}
+        with override_settings(
+            MEDIA_ROOT=self.media_root, PROTECTED_MEDIA_ROOT=self.media_root
+        ):
+            for size, scale in SIZES.items():
+                fixture = seed(scale)
+                measurements[size] = [
+                    self.measure(budget, fixture) for budget in BUDGETS
+                ]
+
+        for number, budget in enumerate(BUDGETS):
+            small = measurements['small'][number]
+            large = measurements['large'][number]
+            request = f'{budget.method} {budget.path}'
+            if not budget.auth:
+                request += ' (anonymous)'
+
+            with self.subTest(request=request):
+                self.assertEqual(small.status, budget.status, request)
+                self.assertEqual(large.status, budget.status, request)
+                queries = '\n'.join(
+                    f'{index}. {sql}'
+                    for index, sql in enumerate(large.queries, start=1)
+                )
+                self.assertEqual(
+                    len(small.queries), len(large.queries),
+                    f'{request}: number of queries depends on the amount of '
+                    f'data ({len(small.queries)} with small dataset, '
+                    f'{len(large.queries)} with large one). Queries with '
+                    f'large dataset:\n{queries}'
+                )
+                self.assertLessEqual(
+                    len(large.queries), budget.queries,
+                    f'{request}: {len(large.queries)} queries, budget is '
+                    f'{budget.queries}. Queries:\n{queries}'
+                )
+                self.assertLessEqual(
+                    large.latency_ms, budget.latency_ms,
+                    f'{request}: {large.latency_ms:.0f} ms, budget is '
+                    f'{budget.latency_ms} ms'
+                )
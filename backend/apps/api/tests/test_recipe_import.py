@@ -0,0 +1,135 @@
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from benchmarks.synthetic import PNG_PIXEL
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from recipes.models import Ingredient, MeasurementUnit, Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THROTTLE_RATES={})
+class RecipeImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cook = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.tag = Tag.objects.create(name='Lunch', slug='lunch')
+        cls.salt = Ingredient.objects.create(
+            name='Salt', measurement_unit=MeasurementUnit.objects.create(
+                name='g'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def make_line(self, name: str, **fields) -> str:
+        recipe = {
+            'ingredients': [
+                {'id': self.salt.pk, 'amount': 2},
+                {'id': self.salt.pk, 'amount': 3},
+            ],
+            'tags': [self.tag.pk],
+            'image': base64.b64encode(PNG_PIXEL).decode(),
+            'name': name,
+            'text': 'Boil',
+            'cooking_time': 10,
+            **fields,
+        }
+        return json.dumps(recipe)
+
+    def test_import(self):
+        # The anonymous page of the list is cached before the import
+        self.assertEqual(self.client.get('/api/recipes/').json()['count'], 0)
+
+        lines = [
+            self.make_line('Soup'),
+            '',
+            '{"type": "user", "username": "cook"}',
+            'not json',
+            self.make_line('Stew', tags=[self.tag.pk + 1]),
+            self.make_line('Salad', image='aW1hZ2U='),
+            self.make_line('Borsch', cooking_time=-1),
+            self.make_line('Porridge', tags=[{'id': self.tag.pk}]),
+        ]
+        self.client.force_authenticate(self.cook)
+        response = self.client.post(
+            '/api/recipes/import/', data='\n'.join(lines),
+            content_type='application/x-ndjson',
+        )
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['imported'], report['failed']), (2, 4))
+        self.assertEqual(
+            [error['line'] for error in report['errors']], [4, 7, 5, 6])
+        self.assertEqual(
+            report['errors'][2]['errors'],
+            {'tags': [f'Unknown tags: [{self.tag.pk + 1}]']},
+        )
+        soup = Recipe.objects.get(name='Soup')
+        self.assertEqual(soup.author, self.cook)
+        self.assertEqual(list(soup.tags.all()), [self.tag])
+        self.assertEqual(soup.ingredient_maps.get().amount, 5)
+        self.assertTrue(os.path.isfile(soup.image.path))
+
+        self.client.force_authenticate(None)
+        names = [
+            recipe['name']
+            for recipe in self.client.get('/api/recipes/').json()['results']
+        ]
+        self.assertCountEqual(names, ['Soup', 'Porridge'])
+
+    def test_oversized_import_is_rejected(self):
+        data = '\n'.join([self.make_line('Soup'), self.make_line('Stew')])
+        self.client.force_authenticate(self.cook)
+        with override_settings(RECIPE_IMPORT_MAX_SIZE=len(data) - 1):
+            response = self.client.post(
+                '/api/recipes/import/', data=data,
+                content_type='application/x-ndjson',
+            )
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_import_without_length_is_rejected(self):
+        self.client.force_authenticate(self.cook)
+        response = self.client.post(
+            '/api/recipes/import/', data=self.make_line('Soup'),
+            content_type='application/x-ndjson', CONTENT_LENGTH='',
+        )
+
+        self.assertEqual(response.status_code, 411)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_command_decodes_images_on_process_pool(self):
+        path = os.path.join(MEDIA_ROOT, 'recipes.ndjson')
+        with open(path, 'w') as file:
+            file.write('\n'.join(
+                self.make_line(f'Soup {number}') for number in range(5)))
+
+        stdout = io.StringIO()
+        call_command(
+            'import_recipes', path, author='cook', batch_size=2, workers=2,
+            stdout=stdout, stderr=io.StringIO(),
+        )
+
+        self.assertEqual(
+            Recipe.objects.filter(name__startswith='Soup').count(), 5)
+        self.assertIn('Imported 4, failed 0', stdout.getvalue())
+        self.assertIn('5 recipes imported, 0 failed', stdout.getvalue())
@@ -0,0 +1,80 @@
+import datetime
+import gzip
+import io
+from decimal import Decimal
+
+from api.middleware import accepted_encodings
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from django.test import TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from recipes.models import Tag
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRendererTest(TestCase):
+    def test_output_is_identical(self):
+        data = {
+            'name': 'Борщ  ',
+            'created': datetime.datetime(
+                2022, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            'amount': Decimal('1.50'),
+            'label': gettext_lazy('Name'),
+            1: [None, True, 1.5, {'nested': []}],
+        }
+
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back(self):
+        self.assertEqual(
+            ORJSONRenderer().render(
+                {'a': 1}, 'application/json; indent=4'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=4'),
+        )
+
+    def test_parser(self):
+        parser = ORJSONParser()
+        self.assertEqual(
+            parser.parse(io.BytesIO('{"name": "Суп"}'.encode())),
+            {'name': 'Суп'},
+        )
+        for body in (b'{"name": ', b'{"amount": NaN}'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.bulk_create(
+            Tag(name=f'Tag {number}', slug=f'tag-{number}')
+            for number in range(10)
+        )
+
+    def test_gzip(self):
+        plain = self.client.get('/api/tags/')
+        compressed = self.client.get(
+            '/api/tags/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed['Vary'], plain['Vary'])
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+    def test_small_response_is_not_compressed(self):
+        response = self.client.get(
+            '/api/ingredients/?name=missing', HTTP_ACCEPT_ENCODING='gzip')
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            large = self.client.get('/api/tags/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(large.has_header('Content-Encoding'))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=0, br;q=0.5, identity'),
+            {'br', 'identity'},
+        )
@@ -0,0 +1,128 @@
+"""Routing of the API reads to the read replicas.
+
+The replica is a second connection to the test database, as it would be
+with a SQLite file copy or a PostgreSQL replica without lag, and the
+queries are told apart by the connection alias.
+"""
+
+import shutil
+import tempfile
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from monitoring.queries import capture_queries
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .test_query_budgets import seed
+
+REPLICA = 'replica1'
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class AliasCounter:
+    """Database execute wrapper which counts queries per connection."""
+
+    def __init__(self):
+        self.queries = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries[context['connection'].alias] += 1
+        return execute(sql, params, many, context)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PROTECTED_MEDIA_ROOT=MEDIA_ROOT)
+class ReplicaRoutingTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        connections.settings[REPLICA] = {
+            **connections['default'].settings_dict}
+        self.addCleanup(self.remove_replica)
+        # The cache fills read from the primary
+        settings_override = override_settings(
+            DATABASE_REPLICAS=[REPLICA], API_CACHE_TIMEOUT=0,
+            MEMBERSHIP_CACHE_TIMEOUT=0, PAGE_CACHE_TIMEOUT=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        caches[settings.REPLICA_PIN_CACHE].clear()
+
+        # The replica connection must see the data, so it is committed
+        self.fixture = seed(scale=1)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token '
+            + Token.objects.create(user=self.fixture.actor).key
+        )
+
+    @staticmethod
+    def remove_replica():
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def request(self, method: str, path: str) -> Counter:
+        counter = AliasCounter()
+        with capture_queries(counter):
+            response = self.client.generic(
+                method, self.fixture.format(path))
+        self.assertLess(response.status_code, 400)
+        return counter.queries
+
+    def test_reads_use_replica(self):
+        for path in (
+            '/api/recipes/', '/api/recipes/{recipe}/', '/api/tags/',
+            '/api/ingredients/', '/api/users/me/', '/api/users/',
+        ):
+            with self.subTest(path=path):
+                queries = self.request('GET', path)
+
+                self.assertGreater(queries[REPLICA], 0)
+                # Token check only
+                self.assertLessEqual(queries['default'], 1)
+
+    def test_cached_page_is_filled_from_primary(self):
+        self.client.credentials()
+        with override_settings(PAGE_CACHE_TIMEOUT=600):
+            queries = self.request('GET', '/api/recipes/')
+            self.assertGreater(queries['default'], 0)
+            self.assertEqual(queries[REPLICA], 0)
+
+            self.assertEqual(self.request('GET', '/api/recipes/'), {})
+
+    def test_writes_use_primary(self):
+        queries = self.request(
+            'POST', '/api/recipes/{stranger_recipe}/favorite/')
+
+        self.assertGreater(queries['default'], 0)
+        self.assertEqual(queries[REPLICA], 0)
+
+    def test_user_is_pinned_to_primary_after_write(self):
+        self.request('POST', '/api/recipes/{stranger_recipe}/favorite/')
+        # The pins are not evicted with the other values
+        cache.clear()
+
+        queries = self.request('GET', '/api/recipes/?is_favorited=1')
+        self.assertEqual(queries[REPLICA], 0)
+
+        # Other users still read from the replica
+        self.client.credentials()
+        queries = self.request('GET', '/api/recipes/')
+        self.assertGreater(queries[REPLICA], 0)
+        self.assertGreater(queries[REPLICA], 0)
+
+    def test_pin_expires(self):
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.request('POST', '/api/recipes/{stranger_recipe}/favorite/')
+
+        queries = self.request('GET', '/api/recipes/')
+        self.assertGreater(queries[REPLICA], 0)
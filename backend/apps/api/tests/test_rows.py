@@ -0,0 +1,100 @@
+from api.serializers import (IngredientSerializer, RecipeGetSerializer,
+                             TagSerializer)
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.test import TestCase
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredientMap, Tag)
+from rest_framework.test import APIClient, APIRequestFactory
+from shopping_carts.models import CartItem
+
+User = get_user_model()
+
+
+class RowSerializersTest(TestCase):
+    """The responses serialized from values() rows are the same as of the
+    model serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.author = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password',
+            first_name='Chef', last_name='Cook',
+        )
+        cls.user.followings.add(cls.author)
+        gram = MeasurementUnit.objects.create(name='g')
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=gram)
+            for name in ('Flour', 'Sugar', 'Salt')
+        ]
+        tags = [
+            Tag.objects.create(name='Lunch', slug='lunch'),
+            Tag.objects.create(name='Dinner', slug='dinner', hexcolor='#000'),
+        ]
+        for number in range(4):
+            recipe = Recipe.objects.create(
+                name=f'Recipe {number}', text='Bake',
+                image=f'recipes/{number}.png' if number else '',
+                author=cls.author if number % 2 else cls.user,
+                cooking_time=number + 10,
+            )
+            recipe.tags.add(*tags[:number])
+            for amount, ingredient in enumerate(ingredients[number:], 1):
+                RecipeIngredientMap.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=amount)
+            if number % 2:
+                recipe.followers.add(cls.user)
+            if number > 1:
+                CartItem.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_json(self, path: str):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_expected_recipes(self):
+        request = APIRequestFactory().get('/api/recipes/')
+        request.user = self.user
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_maps',
+                queryset=RecipeIngredientMap.objects.select_related(
+                    'ingredient__measurement_unit'),
+            ),
+        ).order_by('-pub_date')
+        return RecipeGetSerializer(
+            recipes, many=True, context={'request': request}).data
+
+    def test_recipes(self):
+        expected = self.get_expected_recipes()
+
+        self.assertEqual(
+            self.get_json('/api/recipes/?limit=10')['results'], expected)
+        self.assertEqual(
+            self.get_json(f'/api/recipes/{expected[0]["id"]}/'), expected[0])
+        recipe = self.get_json(
+            '/api/recipes/?fields=name,id&expand=author,tags')['results'][0]
+        self.assertEqual(list(recipe), ['id', 'tags', 'author', 'name'])
+        self.assertEqual(recipe, {name: expected[0][name] for name in recipe})
+
+    def test_tags_and_ingredients(self):
+        self.assertEqual(
+            self.get_json('/api/tags/'),
+            TagSerializer(Tag.objects.all(), many=True).data,
+        )
+        self.assertEqual(
+            self.get_json('/api/ingredients/'),
+            IngredientSerializer(Ingredient.objects.all(), many=True).data,
+        )
+        ingredient = Ingredient.objects.last()
+        self.assertEqual(
+            self.get_json(f'/api/ingredients/{ingredient.pk}/'),
+            IngredientSerializer(ingredient).data,
+        )
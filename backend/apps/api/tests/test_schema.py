@@ -0,0 +1,67 @@
+import os
+import tempfile
+from unittest import mock
+
+from api.schema import generate_schema, schema_cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+
+class CachedSchemaTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'swagger.json')
+        settings = override_settings(SWAGGER_SCHEMA_FILE=self.path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        schema_cache.clear()
+        self.addCleanup(schema_cache.clear)
+
+    def test_schema_is_generated_once(self):
+        with mock.patch(
+            'api.schema.generate_schema', wraps=generate_schema
+        ) as generate:
+            for url in (
+                '/swagger.json', '/swagger/?format=openapi', '/swagger.json'
+            ):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+        generate.assert_called_once()
+
+    def test_swagger_ui_does_not_generate_schema(self):
+        with mock.patch.object(
+            OpenAPISchemaGenerator, 'get_schema',
+            autospec=True, side_effect=OpenAPISchemaGenerator.get_schema,
+        ) as get_schema:
+            for url in ('/swagger/', '/swagger/', '/swagger.json'):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(get_schema.call_count, 1)
+        response = self.client.get('/swagger/')
+        self.assertContains(response, 'Snippets API')
+
+    def test_not_modified(self):
+        response = self.client.get('/swagger.json')
+        etag = response['ETag']
+
+        response = self.client.get(
+            '/swagger.json', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_generated_file_is_served(self):
+        call_command('generate_schema', stdout=open(os.devnull, 'w'))
+
+        with mock.patch.object(
+            OpenAPISchemaGenerator, 'get_schema'
+        ) as get_schema:
+            response = self.client.get('/swagger.json')
+
+        get_schema.assert_not_called()
+        with open(self.path, 'rb') as file:
+            self.assertEqual(response.content, file.read())
+        self.assertIn('/recipes/', response.json()['paths'])
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from shopping_carts.models import CartItem
+
+User = get_user_model()
+
+
+@override_settings(THROTTLE_RATES={})
+class AddToShoppingCartTest(TestCase):
+    def test_duplicate_is_bad_request(self):
+        user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        recipe = Recipe.objects.create(
+            name='Soup', text='Boil', image='recipes/soup.png',
+            author=user, cooking_time=10,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        # Added by a concurrent request
+        CartItem.objects.create(user=user, recipe=recipe)
+
+        response = client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CartItem.objects.count(), 1)
+        # The transaction is still usable
+        self.assertEqual(
+            client.delete(
+                f'/api/recipes/{recipe.pk}/shopping_cart/').status_code,
+            204,
+        )
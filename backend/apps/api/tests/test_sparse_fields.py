@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredientMap, Tag)
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class SparseFieldsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.recipe = Recipe.objects.create(
+            name='Soup', image='recipes/soup.png', text='Boil',
+            author=cls.user, cooking_time=30,
+        )
+        cls.recipe.tags.add(Tag.objects.create(name='Lunch', slug='lunch'))
+        RecipeIngredientMap.objects.create(
+            recipe=cls.recipe,
+            ingredient=Ingredient.objects.create(
+                name='Water',
+                measurement_unit=MeasurementUnit.objects.create(name='ml'),
+            ),
+            amount=500,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_recipe(self, query: str = ''):
+        response = self.client.get(f'/api/recipes/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]
+
+    def test_card_view(self):
+        full = self.get_recipe()
+        card = self.get_recipe('?view=card')
+
+        self.assertEqual(
+            list(card),
+            ['id', 'is_favorited', 'is_in_shopping_cart', 'name', 'image',
+             'cooking_time'],
+        )
+        self.assertEqual(card, {name: full[name] for name in card})
+
+    def test_fields_and_expand(self):
+        full = self.get_recipe()
+        recipe = self.get_recipe('?fields=name,id&expand=author,ingredients')
+
+        self.assertEqual(
+            list(recipe), ['id', 'author', 'ingredients', 'name'])
+        self.assertEqual(recipe, {name: full[name] for name in recipe})
+        self.assertEqual(self.get_recipe('?view=full'), full)
+
+    def test_unknown_fields(self):
+        for query in ('?fields=id,password', '?view=compact'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/recipes/{query}')
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,118 @@
+import threading
+from unittest import mock
+
+from api.checks import check_throttle_cache
+from api.locks import cache_lock
+from api.throttling import CacheBucketStore, parse_rate
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(THROTTLE_RATES={
+    'tags-list': '2/min',
+    'tags-detail:anon': '1/min',
+    'tags-detail': '3/min',
+})
+class ThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        cache.clear()
+
+    @staticmethod
+    def get_key() -> str:
+        user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        return Token.objects.create(user=user).key
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), (10 / 60, 10))
+        self.assertEqual(parse_rate('2/s:5'), (2, 5))
+        self.assertEqual(parse_rate('24/day'), (24 / 86400, 24))
+
+    def test_throttled_before_the_database(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/tags/').status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tags/')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertIn('throttled', response.json()['detail'])
+        self.assertEqual(len(queries), 0)
+        # Other endpoints and users have their own buckets
+        self.assertEqual(
+            self.client.get('/api/ingredients/').status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.get_key()}')
+        self.assertEqual(self.client.get('/api/tags/').status_code, 200)
+
+    def test_made_up_tokens_share_address_bucket(self):
+        for authorization in ('Token missing', 'Bearer random', 'Token'):
+            self.client.credentials(HTTP_AUTHORIZATION=authorization)
+            self.client.get('/api/tags/')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer other')
+        self.assertEqual(self.client.get('/api/tags/').status_code, 429)
+
+    def test_user_and_anonymous_rates(self):
+        tag = Tag.objects.create(name='Lunch', slug='lunch')
+        path = f'/api/tags/{tag.pk}/'
+        self.assertEqual(self.client.get(path).status_code, 200)
+        self.assertEqual(self.client.get(path).status_code, 429)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token missing')
+        self.assertEqual(self.client.get(path).status_code, 429)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.get_key()}')
+        statuses = [self.client.get(path).status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    def test_bucket_is_taken_atomically(self):
+        store = CacheBucketStore()
+        waits = []
+        threads = [
+            threading.Thread(
+                target=lambda: waits.append(store.take('bucket', 0.001, 5)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(waits.count(0), 5)
+
+    def test_busy_bucket_lets_request_through(self):
+        store = CacheBucketStore()
+        with mock.patch('api.throttling.LOCK_WAIT', 0.05), cache_lock(
+                'default', 'bucket', wait=0, timeout=10):
+            self.assertEqual(store.take('bucket', 0.001, 1), 0)
+        # The bucket was not touched
+        self.assertEqual(store.take('bucket', 0.001, 1), 0)
+        self.assertGreater(store.take('bucket', 0.001, 1), 0)
+
+    def test_local_throttle_cache_is_reported(self):
+        self.assertEqual(
+            [error.id for error in check_throttle_cache(None)], ['api.W001'])
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/throttle',
+        }}):
+            self.assertEqual(check_throttle_cache(None), [])
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'example.cache.CustomCache',
+        }}):
+            self.assertEqual(
+                [error.id for error in check_throttle_cache(None)],
+                ['api.E001'],
+            )
@@ -0,0 +1,178 @@
+"""Rate limiting of the expensive endpoints by token buckets.
+
+Every client has a bucket per endpoint, which holds up to `burst` tokens
+and is refilled at the configured rate. A request takes one token, a
+request to the empty bucket gets 429 response with Retry-After header.
+The limits are checked by the middleware after URL resolution, before the
+view, so the throttled requests do not reach the view and its queries.
+The users are told apart by the user of their token, checked by one query
+of the token, the other requests (without a valid token) by the IP
+address.
+
+THROTTLE_RATES maps URL names to rates like `10/min` or `10/min:20`, where
+20 is the burst (by default equal to the number of requests). A rate of
+`<name>:user` or `<name>:anon` key takes precedence for the requests with
+and without a valid token. The buckets are kept by THROTTLE_STORE.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from monitoring.middleware import AsyncCapableMiddleware
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import BaseThrottle
+
+from .locks import cache_lock
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+Rate = Tuple[float, float]
+
+
+def parse_rate(rate: str) -> Rate:
+    """Returns (tokens per second, burst) of the rate string."""
+    rate, _, burst = rate.partition(':')
+    requests, _, period = rate.partition('/')
+    requests = int(requests)
+    return (
+        requests / PERIODS[period.strip()[0]],
+        float(burst) if burst else float(requests),
+    )
+
+
+# Seconds a bucket is locked for at most, and waited for
+LOCK_TIMEOUT = 1
+LOCK_WAIT = 0.5
+
+# Per-process and no-op backends, with which the workers do not share the
+# buckets (see api.checks)
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class BucketStore(ABC):
+    """Storage of the buckets shared by the workers."""
+
+    @abstractmethod
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Takes a token of the bucket. Returns 0 if it is taken, otherwise
+        seconds until the next token."""
+
+
+class CacheBucketStore(BucketStore):
+    """Keeps the buckets in THROTTLE_CACHE. The cache must be shared by the
+    workers (file, database, memcached or redis backend), otherwise every
+    worker has its own buckets. A bucket is updated under a lock of the
+    cache (api.locks), so simultaneous requests of one client do not take
+    the same token."""
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE]
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        with cache_lock(
+            settings.THROTTLE_CACHE, key, wait=LOCK_WAIT,
+            timeout=LOCK_TIMEOUT,
+        ) as taken:
+            if not taken:
+                # Busy with simultaneous requests of the client, which
+                # may still have tokens: let through, not throttled
+                return 0
+            now = time.time()
+            tokens, updated = self.cache.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            # The missing bucket is the full one
+            self.cache.set(
+                key, (tokens - 1, now), timeout=math.ceil(burst / rate))
+            return 0
+
+
+def get_token(request) -> Optional[Token]:
+    """Token of the request with its active user, checked like by
+    TokenAuthentication. It is kept in the request for api.authentication,
+    so the token is selected once."""
+    if not hasattr(request, 'checked_token'):
+        request.checked_token = None
+        authorization = get_authorization_header(request).split()
+        if len(authorization) == 2 and authorization[0].lower() == b'token':
+            try:
+                key = authorization[1].decode()
+            except UnicodeError:
+                return None
+            request.checked_token = Token.objects.select_related(
+                'user').filter(key=key, user__is_active=True).first()
+    return request.checked_token
+
+
+def get_client_key(request) -> str:
+    """User of the token of the request, or the IP address of the client
+    (behind NUM_PROXIES proxies) for the requests without a valid token,
+    so made up tokens do not get new buckets."""
+    token = get_token(request)
+    if token is not None:
+        return f'user:{token.user_id}'
+    return f'anon:{BaseThrottle().get_ident(request)}'
+
+
+class ThrottleMiddleware(AsyncCapableMiddleware):
+    """Answers 429 to the requests over THROTTLE_RATES of the endpoint."""
+
+    def process(self, request):
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    @cached_property
+    def rates(self) -> Dict[str, Rate]:
+        return {
+            name: parse_rate(rate)
+            for name, rate in settings.THROTTLE_RATES.items()
+        }
+
+    @cached_property
+    def throttled_names(self) -> Set[str]:
+        # The token is checked only for the throttled endpoints
+        return {name.partition(':')[0] for name in self.rates}
+
+    @cached_property
+    def store(self) -> BucketStore:
+        return import_string(settings.THROTTLE_STORE)()
+
+    def get_rate(self, name: str, client: str) -> Optional[Rate]:
+        kind = client.partition(':')[0]
+        return self.rates.get(f'{name}:{kind}', self.rates.get(name))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.url_name
+        if not name or name not in self.throttled_names:
+            return None
+        client = get_client_key(request)
+        rate = self.get_rate(name, client)
+        if rate is None:
+            return None
+        wait = self.store.take(f'throttle:{name}:{client}', *rate)
+        if not wait:
+            return None
+        wait = math.ceil(wait)
+        response = JsonResponse(
+            {
+                'detail': 'Request was throttled. Expected available in '
+                          f'{wait} second{"s" if wait != 1 else ""}.'
+            },
+            status=429,
+        )
+        response['Retry-After'] = str(wait)
+        return response
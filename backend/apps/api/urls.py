@@ -1,6 +1,7 @@
-from django.urls import path
+from django.urls import path, re_path
 from rest_framework import routers
 
+from .async_views import async_view
 from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
                     TokenLoginView, TokenLogoutView, UserViewSet)
 
@@ -14,6 +15,25 @@ router.register(r'recipes', RecipeViewSet, basename='recipes')
 urlpatterns = router.urls
 
 urlpatterns += [
-    path(r'auth/token/login/', TokenLoginView.as_view()),
-    path(r'auth/token/logout/', TokenLogoutView.as_view())
+    path(r'auth/token/login/', TokenLoginView.as_view(), name='token-login'),
+    path(
+        r'auth/token/logout/', TokenLogoutView.as_view(), name='token-logout'
+    ),
+]
+
+# Served by async views in the ASGI application (api_foodgram.asgi_urls)
+ASYNC_ROUTES = (
+    'tags-list', 'tags-detail',
+    'ingredients-list', 'ingredients-detail',
+    'recipes-list', 'recipes-detail',
+    'users-me',
+)
+
+async_urlpatterns = [
+    re_path(
+        pattern.pattern.regex.pattern,
+        async_view(pattern.callback),
+        name=pattern.name,
+    )
+    for pattern in router.urls if pattern.name in ASYNC_ROUTES
 ]
@@ -1,27 +1,37 @@
+"""In this module there are different functions which makes the business logic
+of the project.
+"""
+
+import hashlib
 import io
 import logging
 import os
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import BadRequest
+from django.db import IntegrityError, transaction
 from django.db.models import QuerySet, Sum
+from monitoring.metrics import PDF_RENDER_DURATION
 from recipes.models import Ingredient, Recipe
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFError, TTFont
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
-from shopping_carts.models import ShoppingCart
+from shopping_carts.models import CartItem
 
-"""In this module there are different functions which makes the business logic
-of the project.
-"""
+from .files import (remove_protected_files, touch_protected_file,
+                    write_protected_file)
+from .memberships import CART, FAVORITES, FOLLOWINGS, update_memberships
+from .popularity import (CART_WEIGHT, FAVORITE_WEIGHT, record_activity,
+                         record_favorite_removal)
 
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+PDF_FONT = 'DejaVuSerif'
+
 
 def email_authentication(email=None, password=None):
     """User authentication using email and password."""
@@ -34,21 +44,64 @@ def email_authentication(email=None, password=None):
             return user
 
 
-def make_user_shopping_cart(user: User) -> bytes:
-    """Makes shopping cart (byte string) of the user's favorite recipes."""
-    ingredients = Ingredient.objects.filter(
-        recipe__shopping_carts__owner=user
+def register_pdf_fonts() -> bool:
+    """Registers the cyrillic font of shopping cart PDF once per process.
+    Returns False if there is no font."""
+    if PDF_FONT in pdfmetrics.getRegisteredFontNames():
+        return True
+    try:
+        font_path = os.path.join(settings.FONT_ROOT, 'DejaVuSerif.ttf')
+        pdfmetrics.registerFont(TTFont(PDF_FONT, font_path, 'UTF-8'))
+    except TTFError:
+        logger.error(msg='There is no cyrillic font for pdf constructor')
+        return False
+    return True
+
+
+def get_user_shopping_cart_ingredients(user: User) -> QuerySet[Ingredient]:
+    """Ingredients of the recipes in the user's shopping cart with their
+    total amounts."""
+    return Ingredient.objects.filter(
+        recipe__cart_items__user=user
     ).annotate(
         amount=Sum('recipeingredientmap__amount')
     ).select_related('measurement_unit')
 
+
+def make_user_shopping_cart(user: User) -> bytes:
+    """Makes shopping cart (byte string) of the user's favorite recipes."""
+    ingredients = get_user_shopping_cart_ingredients(user=user)
     return make_shopping_cart_pdf_from_ingredients(ingredients=ingredients)
 
 
+def make_user_shopping_cart_file(user: User) -> str:
+    """Makes shopping cart PDF of the user in the protected media area and
+    returns its name. The file is named by the hash of the shopping list,
+    so it is rendered again only after the list has changed."""
+    ingredients = list(get_user_shopping_cart_ingredients(user=user))
+    digest = hashlib.sha256(repr([
+        (ingredient.name, str(ingredient.measurement_unit), ingredient.amount)
+        for ingredient in ingredients
+    ]).encode()).hexdigest()[:32]
+    directory = f'shopping_carts/{user.pk}'
+    name = f'{directory}/{digest}.pdf'
+
+    if not touch_protected_file(name):
+        write_protected_file(
+            name, make_shopping_cart_pdf_from_ingredients(ingredients))
+        remove_protected_files(directory, keep=[name])
+    return name
+
+
 def make_shopping_cart_pdf_from_ingredients(
         ingredients: QuerySet[Ingredient]
 ) -> bytes:
     """Gets QuerySet of Ingredients and makes shopping cart (byte string)."""
+    with PDF_RENDER_DURATION.time():
+        return _render_shopping_cart_pdf(ingredients=ingredients)
+
+
+def _render_shopping_cart_pdf(ingredients: QuerySet[Ingredient]) -> bytes:
     buff = io.BytesIO()
 
     doc = SimpleDocTemplate(
@@ -61,14 +114,9 @@ def make_shopping_cart_pdf_from_ingredients(
     styles['Normal'].leading = 15
 
     # For cyrillic symbols
-    try:
-        font_path = os.path.join(settings.FONT_ROOT, 'DejaVuSerif.ttf')
-        pdfmetrics.registerFont(TTFont('DejaVuSerif', font_path, 'UTF-8'))
-    except TTFError:
-        logger.error(msg='There is no cyrillic font for pdf constructor')
-    else:
-        styles['Normal'].fontName = 'DejaVuSerif'
-        styles['Heading1'].fontName = 'DejaVuSerif'
+    if register_pdf_fonts():
+        styles['Normal'].fontName = PDF_FONT
+        styles['Heading1'].fontName = PDF_FONT
 
     title_style = styles['Heading1']
     title_style.alignment = 1
@@ -93,40 +141,53 @@ def make_shopping_cart_pdf_from_ingredients(
     return result
 
 
-def add_recipe_to_shopping_cart(
-    recipe: Recipe, shopping_cart: ShoppingCart
-) -> None:
-    """Adds recipe to shopping_cart. Raise BadRequest exception
-    if this recipe has already exists in this shopping_cart."""
-    if shopping_cart.recipes.filter(pk=recipe.pk).exists():
+def add_recipe_to_shopping_cart(recipe: Recipe, user: User) -> None:
+    """Adds recipe to user shopping cart. Raise BadRequest exception
+    if this recipe has already exists in user shopping cart."""
+    # The unique constraint reports the duplicate, also the one added by a
+    # concurrent request. The savepoint keeps the outer transaction usable
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(user=user, recipe=recipe)
+    except IntegrityError:
         raise BadRequest('This recipe has already in shopping cart')
-    shopping_cart.recipes.add(recipe)
+    update_memberships(user=user, kind=CART, pk=recipe.pk, member=True)
+    record_activity(recipe=recipe, weight=CART_WEIGHT)
 
 
-def remove_recipe_from_shopping_cart(
-    recipe: Recipe, shopping_cart: ShoppingCart
-) -> None:
-    """Removes recipe from shopping_cart. Raise BadRequest exception
-    if there is no this recipe in this shopping_cart."""
-    if not shopping_cart.recipes.filter(pk=recipe.pk).exists():
+def remove_recipe_from_shopping_cart(recipe: Recipe, user: User) -> None:
+    """Removes recipe from user shopping cart. Raise BadRequest exception
+    if there is no this recipe in user shopping cart."""
+    deleted, _ = CartItem.objects.filter(user=user, recipe=recipe).delete()
+    if not deleted:
         raise BadRequest('There is no this recipe in shopping cart')
-    shopping_cart.recipes.remove(recipe)
+    update_memberships(user=user, kind=CART, pk=recipe.pk, member=False)
 
 
 def add_recipe_to_favorites(recipe: Recipe, user: User) -> None:
     """Adds recipe to user favorites. Raise BadRequest exception
     if this recipe has already exists in user favorites."""
-    if user.favourite_recipes.filter(pk=recipe.pk).exists():
+    # Inserted like the cart items, so a concurrent duplicate is reported
+    # instead of ignored and counted twice
+    try:
+        with transaction.atomic():
+            Recipe.followers.through.objects.create(user=user, recipe=recipe)
+    except IntegrityError:
         raise BadRequest('This recipe has already in user favorites')
-    user.favourite_recipes.add(recipe)
+    update_memberships(user=user, kind=FAVORITES, pk=recipe.pk, member=True)
+    record_activity(recipe=recipe, weight=FAVORITE_WEIGHT, favorites=1)
 
 
 def remove_recipe_from_favorites(recipe: Recipe, user: User) -> None:
     """Removes recipe from user favorites. Raise BadRequest exception
     if there is no this recipe in user favorites."""
-    if not user.favourite_recipes.filter(pk=recipe.pk).exists():
+    deleted, _ = Recipe.followers.through.objects.filter(
+        user=user, recipe=recipe).delete()
+    if not deleted:
         raise BadRequest('There is no this recipe in user favorites')
-    user.favourite_recipes.remove(recipe)
+    update_memberships(
+        user=user, kind=FAVORITES, pk=recipe.pk, member=False)
+    record_favorite_removal(recipe=recipe)
 
 
 def subscribe(following: User, follower: User) -> None:
@@ -138,6 +199,8 @@ def subscribe(following: User, follower: User) -> None:
     if follower == following:
         raise BadRequest('Self-subscription is banned')
     follower.followings.add(following)
+    update_memberships(
+        user=follower, kind=FOLLOWINGS, pk=following.pk, member=True)
 
 
 def unsubscribe(following: User, follower: User) -> None:
@@ -146,10 +209,5 @@ def unsubscribe(following: User, follower: User) -> None:
     if not follower.followings.filter(pk=following.pk).exists():
         raise BadRequest('There is no this user in followings')
     follower.followings.remove(following)
-
-
-def get_is_subscribed(following: User, follower: User) -> bool:
-    """Returns True if User2 (follower) is following User1 (following)."""
-    if isinstance(follower, AnonymousUser):
-        return False
-    return follower.followings.filter(pk=following.pk).exists()
+    update_memberships(
+        user=follower, kind=FOLLOWINGS, pk=following.pk, member=False)
@@ -1,10 +1,13 @@
 import logging
+from dataclasses import asdict
+from typing import Dict, Optional, Tuple
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import BadRequest
-from django.db.models import BooleanField, Case, IntegerField, Sum, When
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
 from drf_yasg.utils import no_body, swagger_auto_schema
@@ -13,11 +16,21 @@ from rest_framework import mixins, permissions, status, views, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from shopping_carts.models import ShoppingCart
 
-from .filters import (IngredientNameSearchFilter, RecipeFilter,
-                      RecipesLimitFilterBackend)
+from . import page_cache
+from .caching import CachedReadMixin, api_cache
+from .export import IMAGES, export_user
+from .files import protected_file_response
+from .filters import (RECIPE_FIELDS, RECIPE_VIEWS, IngredientNameSearchFilter,
+                      RecipeFilter, RecipesLimitFilterBackend,
+                      get_recipe_fields)
+from .memberships import get_memberships
+from .parsers import NDJSONParser
 from .permissions import ReadAllCreateAuthenticatedChangeAuthor
+from .recipe_import import import_recipes
+from .replicas import ReplicaReadMixin, read_from_primary
+from .rows import (MEMBERSHIP_FIELDS, IngredientRowSerializer,
+                   RecipeRowSerializer, RowSerializerMixin, TagRowSerializer)
 from .serializers import (IngredientSerializer, RecipeBriefSerializer,
                           RecipeCreateUpdateRequestSerializer,
                           RecipeGetSerializer, RecipeResponseSerializer,
@@ -26,7 +39,7 @@ from .serializers import (IngredientSerializer, RecipeBriefSerializer,
                           TokenLoginResponseSerializer, UserCreateSerializer,
                           UserGetSerializer, UserSubscriptionSerializer)
 from .utils import (add_recipe_to_favorites, add_recipe_to_shopping_cart,
-                    make_user_shopping_cart, remove_recipe_from_favorites,
+                    make_user_shopping_cart_file, remove_recipe_from_favorites,
                     remove_recipe_from_shopping_cart, subscribe, unsubscribe)
 
 logger = logging.getLogger(__name__)
@@ -58,6 +71,7 @@ class TokenLogoutView(views.APIView):
 
 
 class UserViewSet(
+    ReplicaReadMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -77,7 +91,7 @@ class UserViewSet(
 
     def get_permissions(self):
         if self.action in (
-                'retrieve', 'me', 'set_password',
+                'retrieve', 'me', 'export', 'set_password',
                 'subscriptions', 'subscribe'
         ):
             permission_classes = [permissions.IsAuthenticated]
@@ -94,6 +108,41 @@ class UserViewSet(
         serializer = self.get_serializer(request.user)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name='images',
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=list(IMAGES),
+                required=False,
+                description='Images of the recipes, url by default',
+            ),
+        ],
+        responses={
+            status.HTTP_200_OK: 'NDJSON of the user, its recipes, '
+                                'favorites, followings and cart',
+        },
+    )
+    @action(methods=['GET'], detail=False, url_path='me/export')
+    def export(self, request):
+        images = request.query_params.get('images', 'url')
+        if images not in IMAGES:
+            return Response(
+                data={'errors': f'images must be one of: {", ".join(IMAGES)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        response = StreamingHttpResponse(
+            export_user(
+                user=request.user, images=images,
+                url=request.build_absolute_uri,
+            ),
+            content_type='application/x-ndjson',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={request.user.username}.ndjson')
+        return response
+
     @swagger_auto_schema(
         request_body=SetPasswordSerializer,
         responses={
@@ -113,7 +162,10 @@ class UserViewSet(
         filter_backends=[RecipesLimitFilterBackend],
     )
     def subscriptions(self, request):
-        subscriptions = request.user.followings.all()
+        # Explicit ordering, as Meta.ordering is dropped by the annotation
+        # of RecipesLimitFilterBackend
+        subscriptions = self.filter_queryset(
+            queryset=request.user.followings.order_by('id'))
 
         page = self.paginate_queryset(queryset=subscriptions)
         if page is not None:
@@ -174,91 +226,179 @@ class UserViewSet(
 
 
 class TagViewSet(
+    CachedReadMixin,
+    RowSerializerMixin,
+    ReplicaReadMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
 ):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    row_serializer_class = TagRowSerializer
+    cache_namespaces = ('tags', )
     permission_classes = []
     pagination_class = None
 
 
 class IngredientViewSet(
+    CachedReadMixin,
+    RowSerializerMixin,
+    ReplicaReadMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
 ):
-    queryset = Ingredient.objects.all()
+    queryset = Ingredient.objects.select_related('measurement_unit')
     serializer_class = IngredientSerializer
+    row_serializer_class = IngredientRowSerializer
+    cache_namespaces = ('ingredients', )
     permission_classes = []
     pagination_class = None
     filter_backends = [IngredientNameSearchFilter]
     filterset_fields = ['category', ]
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+RECIPE_FIELDS_PARAMETERS = [
+    openapi.Parameter(
+        name='fields',
+        in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        required=False,
+        description=f'Comma separated fields: {", ".join(RECIPE_FIELDS)}',
+    ),
+    openapi.Parameter(
+        name='view',
+        in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        enum=list(RECIPE_VIEWS),
+        required=False,
+        description='Predefined fields, card: '
+                    f'{", ".join(RECIPE_VIEWS["card"])}',
+    ),
+    openapi.Parameter(
+        name='expand',
+        in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        required=False,
+        description='Comma separated fields added to fields or view',
+    ),
+]
+
+
+# Recipes contain their author, tags and ingredients
+RECIPE_CACHE_NAMESPACES = ('recipes', 'users', 'tags', 'ingredients')
+
+
+def get_anonymous_recipe(recipe: Dict) -> Dict:
+    """Serialized recipe as seen by anonymous users."""
+    recipe = dict(recipe)
+    for name in ('is_favorited', 'is_in_shopping_cart'):
+        if name in recipe:
+            recipe[name] = False
+    if 'author' in recipe:
+        recipe['author'] = {**recipe['author'], 'is_subscribed': False}
+    return recipe
+
+
+class RecipeViewSet(
+    RowSerializerMixin, ReplicaReadMixin, viewsets.ModelViewSet
+):
     permission_classes = [ReadAllCreateAuthenticatedChangeAuthor]
     filterset_class = RecipeFilter
+    serializer_class = RecipeGetSerializer
+    row_serializer_class = RecipeRowSerializer
+
+    @cached_property
+    def recipe_fields(self) -> Optional[Tuple[str, ...]]:
+        """Fields of the recipes requested by `fields`, `view` and `expand`
+        query parameters, None for all the fields."""
+        return get_recipe_fields(request=self.request)
+
+    @swagger_auto_schema(manual_parameters=RECIPE_FIELDS_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        # The pages of anonymous users are cached whole
+        key = page_cache.get_page_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        data = page_cache.get_page(key)
+        if data is not None:
+            return Response(data)
+
+        started = page_cache.now()
+        # Not from a lagging replica, the page is kept for its versions
+        with read_from_primary():
+            response = super().list(request, *args, **kwargs)
+        surrogate_keys = page_cache.get_recipe_page_keys(
+            request=request,
+            rows=self.paginator.page.object_list,
+            results=response.data['results'],
+        )
+        if surrogate_keys is not None:
+            page_cache.set_page(key, response.data, surrogate_keys, started)
+        return response
 
-    def get_queryset(self):
-        user = self.request.user
-        queryset = Recipe.objects.prefetch_related(
-            'ingredients'
-        ).prefetch_related(
-            'tags'
-        ).prefetch_related(
-            'author'
+    @swagger_auto_schema(manual_parameters=RECIPE_FIELDS_PARAMETERS)
+    def retrieve(self, request, *args, **kwargs):
+        # The recipe is cached as seen by anonymous users, the flags of the
+        # user are set from its memberships on the hits
+        retrieve = super().retrieve
+        response = None
+
+        def compute():
+            nonlocal response
+            response = retrieve(request, *args, **kwargs)
+            return get_anonymous_recipe(response.data)
+
+        fields = ','.join(self.recipe_fields or ())
+        recipe = api_cache.get_or_set(
+            namespaces=RECIPE_CACHE_NAMESPACES,
+            key=f'recipes:detail:{self.kwargs["pk"]}:{fields}:'
+                f'{request.build_absolute_uri("/")}',
+            compute=compute,
         )
-        if not user.is_anonymous:
-            queryset = queryset.annotate(
-                is_favorited_int=Sum(Case(
-                    When(followers=user, then=1),
-                    default=0,
-                    output_field=IntegerField()
-                ))
-            ).annotate(
-                is_favorited=Case(
-                    When(is_favorited_int__gt=0, then=True),
-                    default=False,
-                    output_field=BooleanField()
-                )
-            ).annotate(
-                is_in_shopping_cart_int=Sum(
-                    Case(
-                        When(shopping_carts__owner=user, then=1),
-                        default=0,
-                        output_field=IntegerField()
-                    )
-                ),
-            ).annotate(
-                is_in_shopping_cart=Case(
-                    When(is_in_shopping_cart_int__gt=0, then=True),
-                    default=False,
-                    output_field=BooleanField()
-                )
-            )
-        else:
-            queryset = queryset.annotate(
-                is_favorited=Case(
-                    default=False,
-                    output_field=BooleanField()
-                )
-            ).annotate(
-                is_in_shopping_cart=Case(
-                    default=False,
-                    output_field=BooleanField()
-                )
-            )
+        if response is not None:
+            return response
+        if not request.user.is_authenticated:
+            return Response(recipe)
+        return Response(self.get_user_recipe(recipe))
+
+    def get_user_recipe(self, recipe: Dict) -> Dict:
+        """The cached recipe with the flags of the request user."""
+        memberships = get_memberships(self.request.user)
+        recipe = dict(recipe)
+        for name, kind in MEMBERSHIP_FIELDS.items():
+            if name in recipe:
+                recipe[name] = recipe['id'] in getattr(memberships, kind)
+        if 'author' in recipe:
+            recipe['author'] = {
+                **recipe['author'],
+                'is_subscribed': (
+                    recipe['author']['id'] in memberships.followings),
+            }
+        return recipe
+
+    def get_queryset(self):
+        if self.action not in ('list', 'retrieve'):
+            # Only list and retrieve serialize recipes with RecipeGetSerializer
+            return Recipe.objects.all()
 
-        return queryset.order_by('-pub_date')
+        return self.get_rows(Recipe.objects.order_by('-pub_date'))
+
+    def get_serializer_fields(self) -> Optional[Tuple[str, ...]]:
+        return self.recipe_fields
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
-            return RecipeGetSerializer
+            return super().get_serializer_class()
         if self.action in ('create', 'update', 'partial_update'):
             return RecipeCreateUpdateRequestSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.recipe_fields)
+        return super().get_serializer(*args, **kwargs)
+
     def filter_queryset(self, queryset):
         filter_backends = (DjangoFilterBackend,)
         for backend in list(filter_backends):
@@ -285,16 +425,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
         data = self._update_recipe(request=request, pk=pk)
         return Response(data=data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_STRING,
+            description='NDJSON, a recipe of POST /api/recipes/ per line',
+        ),
+        responses={
+            status.HTTP_201_CREATED: 'Numbers of the imported and the failed '
+                                     'recipes, errors of the lines',
+            status.HTTP_411_LENGTH_REQUIRED: 'No Content-Length header',
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE:
+                'Body is larger than RECIPE_IMPORT_MAX_SIZE',
+        },
+    )
+    @action(
+        methods=['POST'], detail=False, url_path='import', url_name='import',
+        parser_classes=[NDJSONParser], filter_backends=None,
+        pagination_class=None,
+    )
+    def bulk_import(self, request):
+        # The import runs in the worker, the limit keeps it well under the
+        # timeout of the worker. Larger imports are done by the command
+        try:
+            size = int(request.META.get('CONTENT_LENGTH'))
+        except (TypeError, ValueError):
+            # The size of a chunked body is not known before it is read
+            return Response(
+                data={'errors': 'Content-Length header is required'},
+                status=status.HTTP_411_LENGTH_REQUIRED,
+            )
+        if size > settings.RECIPE_IMPORT_MAX_SIZE:
+            return Response(
+                data={'errors': 'Request body must not exceed '
+                                f'{settings.RECIPE_IMPORT_MAX_SIZE} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        # The images of a body of this size are decoded in the request
+        # thread faster than a process pool starts
+        report = import_recipes(author=request.user, lines=request.data)
+        return Response(data=asdict(report), status=status.HTTP_201_CREATED)
+
     @action(
         methods=['GET'], detail=False, filter_backends=None,
         pagination_class=None, permission_classes=[permissions.IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        response = HttpResponse(content_type='application/pdf')
-        pdf_name = 'Shopping list.pdf'
-        response['Content-Disposition'] = f'attachment; filename={pdf_name}'
-        response.write(make_user_shopping_cart(user=request.user))
-        return response
+        return protected_file_response(
+            name=make_user_shopping_cart_file(user=request.user),
+            filename='Shopping list.pdf',
+            content_type='application/pdf',
+        )
 
     @action(
         methods=['POST', ], detail=True, filter_backends=None,
@@ -302,11 +482,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk):
         recipe = self.get_object()
-        shopping_cart = ShoppingCart.objects.get_or_create(
-            owner=request.user)[0]
         try:
-            add_recipe_to_shopping_cart(
-                recipe=recipe, shopping_cart=shopping_cart)
+            add_recipe_to_shopping_cart(recipe=recipe, user=request.user)
             serializer = RecipeBriefSerializer(instance=recipe)
             return Response(
                 data=serializer.data,
@@ -320,11 +497,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request, pk):
         recipe = self.get_object()
-        shopping_cart = ShoppingCart.objects.get_or_create(
-            owner=request.user)[0]
         try:
-            remove_recipe_from_shopping_cart(
-                recipe=recipe, shopping_cart=shopping_cart)
+            remove_recipe_from_shopping_cart(recipe=recipe, user=request.user)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except BadRequest as e:
             logger.warning(msg=str(e))
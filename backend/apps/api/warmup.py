@@ -0,0 +1,43 @@
+"""Warm-up of the application process before it serves requests.
+
+The gunicorn master process (gunicorn.conf.py) runs it after loading the
+application with preload_app, so the workers inherit the warmed state
+copy-on-write instead of paying for it on their first requests.
+"""
+
+import time
+
+from django.db import connections
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory
+
+from .schema import schema_cache
+from .utils import register_pdf_fonts
+
+# Requests whose responses are cached in api_cache (api.caching)
+CACHED_PATHS = ('/api/tags/', '/api/ingredients/')
+
+
+def warm_up() -> float:
+    """Returns the duration of the warm-up in seconds."""
+    start = time.perf_counter()
+
+    # Populates the URL resolver
+    reverse('api-root')
+
+    # Parses the font file
+    register_pdf_fonts()
+
+    # Fills the entries of api_cache of the lists of the tags and the
+    # ingredients by the views of their URLs, so the keys and the data are
+    # the ones of the API requests
+    factory = APIRequestFactory()
+    for path in CACHED_PATHS:
+        resolve(path).func(factory.get(path))
+
+    # Reads the API schema file (or generates the schema)
+    schema_cache.get('json')
+
+    # The forked workers must not share the connections of the master
+    connections.close_all()
+    return time.perf_counter() - start
@@ -0,0 +1,304 @@
+"""Load-test harness which replays a realistic mix of API calls in-process
+and reports latency percentiles, throughput and SQL query counts for
+each endpoint."""
+
+import math
+import random
+import subprocess
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+from .synthetic import synthetic_users
+
+User = get_user_model()
+
+# (endpoint name, method, path)
+Call = Tuple[str, str, str]
+
+
+@dataclass
+class Dataset:
+    """Ids and values of the seeded database used to build request paths."""
+    recipe_ids: List[int]
+    user_ids: List[int]
+    tag_slugs: List[str]
+    ingredient_prefixes: List[str]
+    tokens: List[str]
+
+    @classmethod
+    def load(cls, users: int, rng: random.Random) -> 'Dataset':
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        author_ids = list(
+            Recipe.objects.values_list('author_id', flat=True).distinct())
+        ingredient_names = list(
+            Ingredient.objects.values_list('name', flat=True)[:1000])
+
+        clients = list(
+            synthetic_users().filter(
+                followings__isnull=False).distinct()[:users]
+        ) or list(User.objects.all()[:users])
+        tokens = [
+            Token.objects.get_or_create(user=user)[0].key for user in clients
+        ]
+        return cls(
+            recipe_ids=recipe_ids,
+            user_ids=author_ids or list(
+                User.objects.values_list('id', flat=True)[:1000]),
+            tag_slugs=list(Tag.objects.values_list('slug', flat=True)),
+            ingredient_prefixes=sorted({
+                name[:rng.randint(1, 3)] for name in ingredient_names
+            }),
+            tokens=tokens,
+        )
+
+
+@dataclass
+class Scenario:
+    """One user action. `calls` returns the requests the action makes,
+    `auth` means that the action is possible only for authenticated users."""
+    weight: int
+    calls: Callable[[random.Random, Dataset], List[Call]]
+    auth: bool = False
+
+
+def _page(rng: random.Random) -> int:
+    # Most of the visitors look at the first pages only
+    return min(1 + int(rng.expovariate(1.5)), 5)
+
+
+def _toggle_favorite(rng: random.Random, data: Dataset) -> List[Call]:
+    # Adding and removing keeps the seeded data unchanged between runs
+    path = f'/api/recipes/{rng.choice(data.recipe_ids)}/favorite/'
+    return [
+        ('recipes-favorite[post]', 'POST', path),
+        ('recipes-favorite[delete]', 'DELETE', path),
+    ]
+
+
+SCENARIOS = [
+    Scenario(30, lambda rng, data: [(
+        'recipes-list', 'GET',
+        f'/api/recipes/?page={_page(rng)}&limit=6',
+    )]),
+    Scenario(10, lambda rng, data: [(
+        'recipes-list[tags]', 'GET',
+        f'/api/recipes/?limit=6&tags={rng.choice(data.tag_slugs)}',
+    )]),
+    Scenario(5, lambda rng, data: [(
+        'recipes-list[author]', 'GET',
+        f'/api/recipes/?limit=6&author={rng.choice(data.user_ids)}',
+    )]),
+    Scenario(5, lambda rng, data: [(
+        'recipes-list[is_favorited]', 'GET',
+        '/api/recipes/?limit=6&is_favorited=1',
+    )], auth=True),
+    Scenario(5, lambda rng, data: [(
+        'recipes-list[ordering]', 'GET',
+        '/api/recipes/?limit=6&ordering='
+        + rng.choice(['popular', 'trending']),
+    )]),
+    Scenario(15, lambda rng, data: [(
+        'recipes-detail', 'GET',
+        f'/api/recipes/{rng.choice(data.recipe_ids)}/',
+    )]),
+    Scenario(8, lambda rng, data: [(
+        'users-subscriptions', 'GET',
+        f'/api/users/subscriptions/?page={_page(rng)}&limit=6'
+        f'&recipes_limit=3',
+    )], auth=True),
+    Scenario(5, lambda rng, data: [(
+        'users-me', 'GET', '/api/users/me/',
+    )], auth=True),
+    Scenario(3, lambda rng, data: [(
+        'users-list', 'GET', f'/api/users/?page={_page(rng)}&limit=6',
+    )]),
+    Scenario(3, lambda rng, data: [(
+        'users-detail', 'GET', f'/api/users/{rng.choice(data.user_ids)}/',
+    )], auth=True),
+    Scenario(5, lambda rng, data: [(
+        'tags-list', 'GET', '/api/tags/',
+    )]),
+    Scenario(8, lambda rng, data: [(
+        'ingredients-list[name]', 'GET',
+        f'/api/ingredients/?name={rng.choice(data.ingredient_prefixes)}',
+    )]),
+    Scenario(3, lambda rng, data: [(
+        'recipes-download-shopping-cart', 'GET',
+        '/api/recipes/download_shopping_cart/',
+    )], auth=True),
+    Scenario(3, _toggle_favorite, auth=True),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile with linear interpolation between closest ranks."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class QueryCounter:
+    """Database execute wrapper which counts SQL queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    queries: List[int] = field(default_factory=list)
+    statuses: Dict[int, int] = field(
+        default_factory=lambda: defaultdict(int))
+    errors: int = 0
+
+    def record(self, latency: float, queries: int, status: int) -> None:
+        self.latencies.append(latency)
+        self.queries.append(queries)
+        self.statuses[status] += 1
+        if status >= 500:
+            self.errors += 1
+
+    def report(self) -> Dict:
+        total_time = sum(self.latencies)
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 2),
+            'mean_ms': round(total_time / len(self.latencies) * 1000, 2),
+            'throughput_rps': round(len(self.latencies) / total_time, 2),
+            'queries_mean': round(sum(self.queries) / len(self.queries), 2),
+            'queries_max': max(self.queries),
+        }
+
+
+class LoadRunner:
+    """Replays the weighted scenario mix through Django test clients.
+
+    Requests are made in-process, so SQL queries of each request can be
+    counted, and latencies do not include network and server overhead."""
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        seed: int = 0,
+        anonymous_share: float = 0.3,
+        scenarios: Optional[List[Scenario]] = None,
+    ):
+        self.dataset = dataset
+        self.rng = random.Random(seed)
+        self.anonymous_share = anonymous_share
+        self.scenarios = scenarios or SCENARIOS
+        self.anonymous_client = Client(raise_request_exception=False)
+        self.clients = [
+            Client(
+                raise_request_exception=False,
+                HTTP_AUTHORIZATION=f'Token {token}',
+            )
+            for token in dataset.tokens
+        ]
+        self.stats = defaultdict(EndpointStats)
+
+    def _next_calls(self) -> Tuple[Client, List[Call]]:
+        scenarios = self.scenarios
+        if not self.clients:
+            scenarios = [s for s in scenarios if not s.auth]
+        scenario = self.rng.choices(
+            scenarios, weights=[s.weight for s in scenarios])[0]
+
+        if (
+            not scenario.auth
+            and self.rng.random() < self.anonymous_share
+            or not self.clients
+        ):
+            client = self.anonymous_client
+        else:
+            client = self.rng.choice(self.clients)
+        return client, scenario.calls(self.rng, self.dataset)
+
+    def _request(self, client: Client, call: Call, record: bool) -> None:
+        name, method, path = call
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = client.generic(method, path)
+            latency = time.perf_counter() - start
+        if record:
+            self.stats[name].record(
+                latency, counter.count, response.status_code)
+
+    def run(self, requests: int, warmup: int = 0) -> Dict:
+        made = 0
+        while made < warmup:
+            client, calls = self._next_calls()
+            for call in calls:
+                self._request(client, call, record=False)
+            made += len(calls)
+
+        made = 0
+        start = time.perf_counter()
+        while made < requests:
+            client, calls = self._next_calls()
+            for call in calls:
+                self._request(client, call, record=True)
+            made += len(calls)
+        elapsed = time.perf_counter() - start
+
+        latencies = [
+            latency
+            for stats in self.stats.values()
+            for latency in stats.latencies
+        ]
+        return {
+            'meta': {
+                'commit': _git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+                'recipes': len(self.dataset.recipe_ids),
+                'clients': len(self.clients),
+            },
+            'total': {
+                'requests': made,
+                'errors': sum(s.errors for s in self.stats.values()),
+                'elapsed_s': round(elapsed, 3),
+                'throughput_rps': round(made / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            },
+            'endpoints': {
+                name: stats.report()
+                for name, stats in sorted(self.stats.items())
+            },
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,75 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ...harness import Dataset, LoadRunner
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays a realistic mix of API calls against the current database '
+        'and writes p50/p95/p99 latency, throughput and SQL query counts '
+        'of each endpoint into a JSON file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Number of measured requests. Default: 2000',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=100,
+            help='Number of requests before measuring. Default: 100',
+        )
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Number of authenticated clients. Default: 50',
+        )
+        parser.add_argument(
+            '--anonymous-share', type=float, default=0.3,
+            help='Share of public requests made anonymously. Default: 0.3',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Path of the JSON report. Default: benchmark.json',
+        )
+
+    def handle(self, *args, **options):
+        dataset = Dataset.load(
+            users=options['users'], rng=random.Random(options['seed']))
+        if not dataset.recipe_ids:
+            raise CommandError(
+                'There are no recipes. Run seed_synthetic command first.')
+
+        runner = LoadRunner(
+            dataset=dataset,
+            seed=options['seed'],
+            anonymous_share=options['anonymous_share'],
+        )
+        # The mix replays many clients from one address
+        with override_settings(THROTTLE_RATES={}):
+            report = runner.run(
+                requests=options['requests'], warmup=options['warmup'])
+
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+        self.stdout.write(
+            f'{"endpoint":<36}{"n":>6}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"rps":>9}{"queries":>9}'
+        )
+        for name, stats in report['endpoints'].items():
+            self.stdout.write(
+                f'{name:<36}{stats["requests"]:>6}{stats["p50_ms"]:>9}'
+                f'{stats["p95_ms"]:>9}{stats["p99_ms"]:>9}'
+                f'{stats["throughput_rps"]:>9}{stats["queries_mean"]:>9}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["total"]["requests"]} requests, '
+            f'{report["total"]["throughput_rps"]} rps. '
+            f'Report saved to {options["output"]}'
+        ))
@@ -0,0 +1,119 @@
+import gzip
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from api.middleware import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from api.renderers import ORJSONRenderer
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ...harness import _git_commit
+
+User = get_user_model()
+
+
+def median_ms(func, iterations: int) -> float:
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return round(statistics.median(durations) * 1000, 3)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the render time of an API response by the standard and '
+        'the orjson renderers, and its size and compression time with gzip '
+        'and brotli. Writes the results into a JSON file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='/api/recipes/?limit=100',
+            help='Default: /api/recipes/?limit=100',
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Number of measurements of each case. Default: 50',
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Request as an anonymous user instead of a user with '
+                 'favorites',
+        )
+        parser.add_argument(
+            '--output', default='benchmark-rendering.json',
+            help='Path of the JSON report. Default: benchmark-rendering.json',
+        )
+
+    def get_data(self, path: str, anonymous: bool):
+        """Data of the response of the view before rendering."""
+        request = APIRequestFactory().get(path)
+        if not anonymous:
+            user = User.objects.filter(
+                favourite_recipes__isnull=False).first()
+            if user is not None:
+                force_authenticate(request, user=user)
+        response = resolve(urlsplit(path).path).func(request)
+        if response.status_code != 200:
+            raise CommandError(
+                f'GET {path} returned {response.status_code}')
+        return response.data
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        data = self.get_data(options['path'], options['anonymous'])
+        standard = JSONRenderer().render(data)
+        fast = ORJSONRenderer().render(data)
+        if json.loads(standard) != json.loads(fast):
+            raise CommandError('The renderers output different JSON')
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'path': options['path'],
+                'iterations': iterations,
+                'identical_bytes': standard == fast,
+            },
+            'render_ms': {
+                'json': median_ms(
+                    lambda: JSONRenderer().render(data), iterations),
+                'orjson': median_ms(
+                    lambda: ORJSONRenderer().render(data), iterations),
+            },
+            'bytes': {'identity': len(fast)},
+            'compress_ms': {},
+        }
+        encoders = {
+            'gzip': lambda: gzip.compress(
+                fast, compresslevel=GZIP_LEVEL, mtime=0),
+        }
+        if brotli is not None:
+            encoders['br'] = lambda: brotli.compress(
+                fast, quality=BROTLI_QUALITY)
+        for encoding, compress in encoders.items():
+            report['bytes'][encoding] = len(compress())
+            report['compress_ms'][encoding] = median_ms(compress, iterations)
+
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+        for renderer, duration in report['render_ms'].items():
+            self.stdout.write(f'render {renderer:<10}{duration:>10} ms')
+        for encoding, size in report['bytes'].items():
+            compress_ms = report['compress_ms'].get(encoding, 0)
+            self.stdout.write(
+                f'{encoding:<17}{size:>10} bytes{compress_ms:>10} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Report saved to {options["output"]}'))
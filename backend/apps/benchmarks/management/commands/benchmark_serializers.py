@@ -0,0 +1,130 @@
+import json
+
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.utils import timezone
+from recipes.models import RecipeIngredientMap
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from ...harness import _git_commit
+from .benchmark_rendering import median_ms
+
+User = get_user_model()
+
+ENDPOINTS = {
+    'recipes': RecipeViewSet,
+    'tags': TagViewSet,
+    'ingredients': IngredientViewSet,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the time of the querysets and the serialization of the '
+        'recipe, tag and ingredient lists by the model serializers and by '
+        'the row serializers. Writes the results into a JSON file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='Number of recipes. Default: 100',
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Number of measurements of each case. Default: 50',
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Request as an anonymous user instead of a user with '
+                 'favorites',
+        )
+        parser.add_argument(
+            '--output', default='benchmark-serializers.json',
+            help='Path of the JSON report. '
+                 'Default: benchmark-serializers.json',
+        )
+
+    @staticmethod
+    def get_request(anonymous: bool) -> Request:
+        request = APIRequestFactory().get('/api/')
+        if not anonymous:
+            user = User.objects.filter(
+                favourite_recipes__isnull=False).first()
+            if user is not None:
+                force_authenticate(request, user=user)
+        return APIView().initialize_request(request)
+
+    @staticmethod
+    def get_serialize(viewset, request: Request, rows: bool, limit: int):
+        """Function which selects and serializes the list of the endpoint
+        like the view does."""
+        view = viewset(
+            request=request, action='list', format_kwarg=None, kwargs={})
+        if not rows:
+            # The model serializer of the view is used by the schema
+            view.use_rows = lambda: False
+        queryset = view.get_queryset()
+        if viewset is RecipeViewSet:
+            if not rows:
+                queryset = queryset.select_related('author').prefetch_related(
+                    'tags',
+                    Prefetch(
+                        'ingredient_maps',
+                        queryset=RecipeIngredientMap.objects.select_related(
+                            'ingredient__measurement_unit'),
+                    ),
+                )
+            queryset = queryset[:limit]
+        return lambda: view.get_serializer(
+            queryset.all(), many=True).data
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = self.get_request(options['anonymous'])
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'limit': options['limit'],
+                'iterations': iterations,
+                'anonymous': request.user.is_anonymous,
+            },
+            'results': {},
+        }
+
+        for name, viewset in ENDPOINTS.items():
+            model = self.get_serialize(
+                viewset, request, rows=False, limit=options['limit'])
+            rows = self.get_serialize(
+                viewset, request, rows=True, limit=options['limit'])
+            # Compared as JSON, as the model serializers return OrderedDicts
+            if json.dumps(model()) != json.dumps(rows()):
+                raise CommandError(
+                    f'The serializers of {name} output different data')
+            result = {
+                'model_ms': median_ms(model, iterations),
+                'rows_ms': median_ms(rows, iterations),
+            }
+            result['speedup'] = round(
+                result['model_ms'] / result['rows_ms'], 2)
+            report['results'][name] = result
+
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+        self.stdout.write(
+            f'{"endpoint":<14}{"model ms":>12}{"rows ms":>12}{"speedup":>10}')
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f'{name:<14}{result["model_ms"]:>12}{result["rows_ms"]:>12}'
+                f'{result["speedup"]:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Report saved to {options["output"]}'))
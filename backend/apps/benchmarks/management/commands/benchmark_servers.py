@@ -0,0 +1,114 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from ...harness import Dataset, _git_commit
+from ...servers import SERVERS, ConcurrentLoad, Server, read_calls
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts the sync (WSGI), threaded (WSGI, gthread workers) and async '
+        '(ASGI, uvicorn workers) application servers against the current '
+        'database, loads their read endpoints through concurrent '
+        'connections and writes the throughput and latency percentiles '
+        'into a JSON file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 10, 50, 100],
+            help='Numbers of concurrent connections. Default: 1 10 50 100',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Number of requests per concurrency level. Default: 2000',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Number of worker processes of each server. Default: 2',
+        )
+        parser.add_argument(
+            '--servers', nargs='+', choices=list(SERVERS),
+            default=list(SERVERS),
+        )
+        parser.add_argument(
+            '--conn-max-age', type=int, nargs='+', default=[],
+            help=(
+                'Run every server with each of these DB_CONN_MAX_AGE '
+                'values, e.g. 0 60 to compare a new connection per request '
+                'with persistent connections. Default: the settings value'
+            ),
+        )
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Number of authenticated clients. Default: 50',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default='benchmark-servers.json',
+            help='Path of the JSON report. Default: benchmark-servers.json',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        dataset = Dataset.load(users=options['users'], rng=rng)
+        if not dataset.recipe_ids:
+            raise CommandError(
+                'There are no recipes. Run seed_synthetic command first.')
+        calls = read_calls(dataset, rng, options['requests'])
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'workers': options['workers'],
+                'requests': options['requests'],
+            },
+            'servers': {},
+        }
+        runs = [
+            (kind, conn_max_age)
+            for kind in options['servers']
+            for conn_max_age in options['conn_max_age'] or [None]
+        ]
+        self.stdout.write(
+            f'{"server":<22}{"conns":>7}{"rps":>10}{"p50":>9}{"p95":>9}'
+            f'{"p99":>9}{"errors":>8}'
+        )
+        for kind, conn_max_age in runs:
+            # The load comes from one address
+            name, env = kind, {'THROTTLE_RATES': ''}
+            if conn_max_age is not None:
+                name = f'{kind}[conn_max_age={conn_max_age}]'
+                env['DB_CONN_MAX_AGE'] = str(conn_max_age)
+            results = report['servers'][name] = {}
+            try:
+                with Server(
+                    kind, workers=options['workers'], env=env
+                ) as server:
+                    # Warms up the workers: imports, connections, caches
+                    ConcurrentLoad(
+                        server.port, calls[:100], options['workers']).run()
+                    for concurrency in options['concurrency']:
+                        result = ConcurrentLoad(
+                            server.port, calls, concurrency).run()
+                        results[str(concurrency)] = result
+                        self.stdout.write(
+                            f'{name:<22}{concurrency:>7}'
+                            f'{result["throughput_rps"]:>10}'
+                            f'{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                            f'{result["p99_ms"]:>9}{result["errors"]:>8}'
+                        )
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write('\n')
+        self.stdout.write(self.style.SUCCESS(
+            f'Report saved to {options["output"]}'))
@@ -0,0 +1,226 @@
+import json
+import random
+import re
+from collections import defaultdict
+from typing import Dict, Iterator, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from monitoring.queries import capture_queries
+
+from ...harness import SCENARIOS, Dataset, _git_commit
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+class SelectCollector:
+    """Database execute wrapper which keeps the SELECT queries."""
+
+    def __init__(self):
+        self.queries: List[Tuple[str, tuple]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, tuple(params or ())))
+        return execute(sql, params, many, context)
+
+
+class PlanChecker:
+    """Finds sequential scans of big tables and sorts of many rows in the
+    plans of the queries."""
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self._table_rows: Dict[str, int] = {}
+
+    def table_rows(self, table: str) -> int:
+        if table not in self._table_rows:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class WHERE relname = %s',
+                        [table],
+                    )
+                    row = cursor.fetchone()
+                    rows = int(row[0]) if row else 0
+                else:
+                    name = connection.ops.quote_name(table)
+                    cursor.execute(f'SELECT COUNT(*) FROM {name}')
+                    rows = cursor.fetchone()[0]
+            self._table_rows[table] = max(rows, 0)
+        return self._table_rows[table]
+
+    def check(self, sql: str, params: tuple) -> Tuple[List[str], List[Dict]]:
+        """Returns the plan as lines of text and the found issues."""
+        if connection.vendor == 'postgresql':
+            return self._check_postgresql(sql, params)
+        if connection.vendor == 'sqlite':
+            return self._check_sqlite(sql, params)
+        raise CommandError(f'{connection.vendor} is not supported')
+
+    def _check_postgresql(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        lines, issues = [], []
+        for depth, node in self._walk(plan[0]['Plan']):
+            node_type = node['Node Type']
+            relation = node.get('Relation Name')
+            lines.append(
+                '  ' * depth + node_type
+                + (f' on {relation}' if relation else '')
+                + f' (rows={node["Plan Rows"]})'
+            )
+            if node_type == 'Seq Scan':
+                rows = self.table_rows(relation)
+                if rows >= self.threshold:
+                    issues.append(
+                        {'type': 'seq_scan', 'table': relation, 'rows': rows})
+            elif node_type in ('Sort', 'Incremental Sort'):
+                if node['Plan Rows'] >= self.threshold:
+                    issues.append({'type': 'sort', 'rows': node['Plan Rows']})
+        return lines, issues
+
+    @classmethod
+    def _walk(cls, node: Dict, depth: int = 0) -> Iterator[Tuple[int, Dict]]:
+        yield depth, node
+        for child in node.get('Plans', ()):
+            yield from cls._walk(child, depth + 1)
+
+    def _check_sqlite(self, sql, params):
+        # SQLite plans have no row estimates: scans are compared by the
+        # size of the table, sorts by the size of the largest scanned one
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = cursor.fetchall()
+        lines, issues, scanned = [], [], 0
+        tables = set(connection.introspection.table_names())
+        for _, _, _, detail in plan:
+            lines.append(detail)
+            match = SQLITE_SCAN_RE.match(detail)
+            # Subqueries in FROM are scanned too
+            if match and match.group(1) in tables:
+                rows = self.table_rows(match.group(1))
+                scanned = max(scanned, rows)
+                if rows >= self.threshold:
+                    issues.append({
+                        'type': 'seq_scan', 'table': match.group(1),
+                        'rows': rows,
+                    })
+            elif (
+                detail.startswith('USE TEMP B-TREE FOR')
+                and 'ORDER BY' in detail
+                and scanned >= self.threshold
+            ):
+                issues.append({'type': 'sort', 'rows': scanned})
+        return lines, issues
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests every endpoint of the load-test scenarios, runs EXPLAIN '
+        'on its SELECT queries and reports the sequential scans of big '
+        'tables and the sorts of many rows. Run it against a seeded '
+        'database (seed_synthetic command).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int, default=1000,
+            help='Number of rows of the scanned table or of the sort which '
+                 'makes it an issue. Default: 1000',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default='query-plans.json',
+            help='Path of the JSON report. Default: query-plans.json',
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Exit with an error if any issue is found',
+        )
+
+    def get_queries(self, dataset: Dataset, rng: random.Random):
+        """SELECT queries of every GET endpoint of the scenarios."""
+        # Authenticated requests make the queries of the anonymous ones and
+        # the queries of the request user's flags
+        client = Client(raise_request_exception=False, **({
+            'HTTP_AUTHORIZATION': f'Token {dataset.tokens[0]}'
+        } if dataset.tokens else {}))
+        queries: Dict[str, List[Tuple[str, tuple]]] = defaultdict(list)
+        for scenario in SCENARIOS:
+            if scenario.auth and not dataset.tokens:
+                continue
+            for name, method, path in scenario.calls(rng, dataset):
+                if method != 'GET':
+                    continue
+                collector = SelectCollector()
+                with capture_queries(collector):
+                    response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'GET {path} returned {response.status_code}')
+                queries[name].extend(collector.queries)
+        return queries
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        dataset = Dataset.load(users=1, rng=rng)
+        if not dataset.recipe_ids:
+            raise CommandError(
+                'There are no recipes. Run seed_synthetic command first.')
+        checker = PlanChecker(threshold=options['threshold'])
+
+        # Every request reaches the database
+        with override_settings(
+                API_CACHE_TIMEOUT=0, PAGE_CACHE_TIMEOUT=0, THROTTLE_RATES={}):
+            endpoint_queries = self.get_queries(dataset, rng)
+
+        endpoints = {}
+        for name, queries in endpoint_queries.items():
+            results = []
+            for sql, params in dict.fromkeys(queries):
+                plan, issues = checker.check(sql, params)
+                results.append({'sql': sql, 'plan': plan, 'issues': issues})
+            endpoints[name] = results
+        issues_count = sum(
+            len(query['issues'])
+            for results in endpoints.values() for query in results
+        )
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'threshold': options['threshold'],
+                'issues': issues_count,
+            },
+            'endpoints': endpoints,
+        }
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+        for name, results in endpoints.items():
+            self.stdout.write(f'{name}: {len(results)} queries')
+            for query in results:
+                for issue in query['issues']:
+                    self.stdout.write(self.style.WARNING(
+                        f'  {self.describe(issue)}: {query["sql"][:160]}'))
+        message = f'{issues_count} issues, report saved to {options["output"]}'
+        if issues_count and options['fail']:
+            raise CommandError(message)
+        self.stdout.write(
+            self.style.WARNING(message) if issues_count
+            else self.style.SUCCESS(message))
+
+    @staticmethod
+    def describe(issue: Dict) -> str:
+        if issue['type'] == 'seq_scan':
+            return (
+                f'sequential scan of {issue["table"]} ({issue["rows"]} rows)')
+        return f'sort of {issue["rows"]} rows'
@@ -0,0 +1,206 @@
+"""Benchmark of concurrent connections against real application servers:
+WSGI with gunicorn sync workers, WSGI with threaded workers and ASGI with
+uvicorn workers, which serves the read endpoints by async views. The rest
+of the server settings comes from gunicorn.conf.py."""
+
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .harness import SCENARIOS, Dataset, EndpointStats, percentile
+
+SERVERS = {
+    'wsgi': ['api_foodgram.wsgi:application', '--worker-class', 'sync'],
+    'gthread': [
+        'api_foodgram.wsgi:application', '--worker-class', 'gthread',
+    ],
+    'asgi': [
+        'api_foodgram.asgi:application',
+        '--worker-class', 'uvicorn.workers.UvicornWorker',
+    ],
+}
+
+# The endpoints of the harness served by the async read path
+READ_ENDPOINTS = (
+    'recipes-list', 'recipes-list[tags]', 'recipes-list[author]',
+    'recipes-list[is_favorited]', 'recipes-detail', 'users-me',
+    'tags-list', 'ingredients-list[name]',
+)
+
+# (endpoint name, path, token)
+ReadCall = Tuple[str, str, Optional[str]]
+
+
+def read_calls(
+    dataset: Dataset, rng: random.Random, count: int,
+    anonymous_share: float = 0.3,
+) -> List[ReadCall]:
+    """Requests of the read endpoints in the proportions of the harness
+    scenario mix."""
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if scenario.calls(rng, dataset)[0][0] in READ_ENDPOINTS
+        and (dataset.tokens or not scenario.auth)
+    ]
+    calls = []
+    while len(calls) < count:
+        scenario = rng.choices(
+            scenarios, weights=[s.weight for s in scenarios])[0]
+        token = None
+        if dataset.tokens and (
+            scenario.auth or rng.random() >= anonymous_share
+        ):
+            token = rng.choice(dataset.tokens)
+        calls.extend(
+            (name, path, token)
+            for name, _, path in scenario.calls(rng, dataset)
+        )
+    return calls[:count]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """Application server started in a subprocess for the time of the
+    `with` block."""
+
+    def __init__(
+        self,
+        kind: str,
+        workers: int,
+        env: Optional[Dict[str, str]] = None,
+        timeout: float = 30,
+    ):
+        self.kind = kind
+        self.workers = workers
+        self.env = env or {}
+        self.timeout = timeout
+        self.port = _free_port()
+        self.process = None
+
+    def __enter__(self) -> 'Server':
+        self.process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', *SERVERS[self.kind],
+                '--bind', f'127.0.0.1:{self.port}',
+                '--workers', str(self.workers),
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, **self.env},
+        )
+        self._wait_ready()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def _wait_ready(self) -> None:
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(
+                    f'{self.kind} server exited with code '
+                    f'{self.process.returncode}'
+                )
+            try:
+                connection = http.client.HTTPConnection(
+                    '127.0.0.1', self.port, timeout=5)
+                connection.request('GET', '/api/tags/')
+                if connection.getresponse().status == 200:
+                    connection.close()
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f'{self.kind} server has not started')
+
+
+class ConcurrentLoad:
+    """Makes the requests through `concurrency` keep-alive connections,
+    each served by its own thread."""
+
+    def __init__(self, port: int, calls: List[ReadCall], concurrency: int):
+        self.port = port
+        self.calls = calls
+        self.concurrency = concurrency
+        self.stats = defaultdict(EndpointStats)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _take(self) -> Optional[ReadCall]:
+        with self._lock:
+            if self._next >= len(self.calls):
+                return None
+            call = self.calls[self._next]
+            self._next += 1
+            return call
+
+    def _worker(self) -> None:
+        connection = http.client.HTTPConnection(
+            '127.0.0.1', self.port, timeout=60)
+        while True:
+            call = self._take()
+            if call is None:
+                break
+            name, path, token = call
+            headers = {'Authorization': f'Token {token}'} if token else {}
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = 599
+            latency = time.perf_counter() - start
+            with self._lock:
+                self.stats[name].record(latency, 0, status)
+        connection.close()
+
+    def run(self) -> Dict:
+        threads = [
+            threading.Thread(target=self._worker)
+            for _ in range(self.concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = [
+            latency
+            for stats in self.stats.values()
+            for latency in stats.latencies
+        ]
+        return {
+            'requests': len(latencies),
+            'errors': sum(s.errors for s in self.stats.values()),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        }
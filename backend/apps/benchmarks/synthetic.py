@@ -0,0 +1,370 @@
+"""Synthetic data generator for benchmarks and query budget tests.
+
+Every generated object is marked with the `synthetic` prefix, so the data
+can be removed without touching real users, recipes, tags or ingredients.
+Popularity is skewed with Zipf-like weights: few authors write most of the
+recipes and get most of the followers, few recipes get most of the favorites
+and few ingredients (salt, sugar, ...) are used in most of the recipes.
+"""
+
+import base64
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from api.popularity import recount_favorites
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredientMap, Tag)
+from shopping_carts.models import CartItem
+
+User = get_user_model()
+
+SYNTHETIC_PREFIX = 'synthetic'
+SYNTHETIC_PASSWORD = 'synthetic-password'
+SYNTHETIC_IMAGE = 'recipes/synthetic.png'
+SYNTHETIC_UNITS = ('syn-g', 'syn-ml', 'syn-pcs', 'syn-tbsp', 'syn-tsp')
+
+# 1x1 transparent PNG shared by all synthetic recipes
+PNG_PIXEL = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA'
+    '60e6kgAAAABJRU5ErkJggg=='
+)
+
+WORDS = (
+    'mix', 'bake', 'stir', 'boil', 'chop', 'slice', 'whisk', 'season',
+    'serve', 'simmer', 'fry', 'roast', 'pour', 'blend', 'grate', 'knead',
+    'rest', 'cool',
+)
+
+
+@dataclass
+class SyntheticConfig:
+    """Volumes of the generated data. `*_per_*` values are means:
+    the actual amount per object is drawn from an exponential distribution,
+    so most users are passive and a few are very active."""
+    users: int = 1000
+    recipes: int = 5000
+    tags: int = 10
+    ingredients: int = 500
+    ingredients_per_recipe: int = 8
+    tags_per_recipe: int = 2
+    follows_per_user: int = 20
+    favorites_per_user: int = 30
+    cart_per_user: int = 5
+    skew: float = 1.1
+    days: int = 365
+    seed: int = 0
+    batch_size: int = 1000
+
+
+def synthetic_users():
+    """QuerySet of all generated users."""
+    return User.objects.filter(username__startswith=f'{SYNTHETIC_PREFIX}_')
+
+
+def has_synthetic_data() -> bool:
+    return synthetic_users().exists()
+
+
+def flush_synthetic_data() -> None:
+    """Removes all generated objects (recipes, maps, follows, favorites and
+    shopping carts are removed by cascade with their users)."""
+    with transaction.atomic():
+        # The image is shared with the other recipes, so it is detached
+        # before the delete signals of the recipes remove the file
+        Recipe.objects.filter(
+            author__in=synthetic_users(), image=SYNTHETIC_IMAGE
+        ).update(image='')
+        synthetic_users().delete()
+        Tag.objects.filter(slug__startswith=f'{SYNTHETIC_PREFIX}-').delete()
+        MeasurementUnit.objects.filter(name__in=SYNTHETIC_UNITS).delete()
+
+
+def _zipf_cum_weights(size: int, skew: float) -> List[float]:
+    weights = (1 / (rank ** skew) for rank in range(1, size + 1))
+    return list(itertools.accumulate(weights))
+
+
+def _weighted_sample(
+    rng: random.Random,
+    population: Sequence[int],
+    cum_weights: List[float],
+    k: int,
+) -> List[int]:
+    """Draws `k` distinct items, more popular items first."""
+    k = min(k, len(population))
+    chosen = {}
+    for _ in range(10):
+        if len(chosen) >= k:
+            break
+        for item in rng.choices(population, cum_weights=cum_weights, k=k):
+            chosen.setdefault(item, None)
+    if len(chosen) < k:
+        # Long tail: top up with uniform picks
+        rest = [item for item in population if item not in chosen]
+        for item in rng.sample(rest, k - len(chosen)):
+            chosen[item] = None
+    return list(chosen)[:k]
+
+
+class SyntheticDataGenerator:
+    """Generates users, follows, recipes, ingredient maps, favorites and
+    shopping carts according to SyntheticConfig."""
+
+    def __init__(
+        self,
+        config: SyntheticConfig,
+        log: Optional[Callable[[str], None]] = None,
+    ):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.log = log or (lambda message: None)
+
+    def generate(self) -> Dict[str, int]:
+        with transaction.atomic():
+            self._save_image()
+            user_ids = self._create_users()
+            tag_ids = self._create_tags()
+            ingredient_ids = self._create_ingredients()
+            recipe_ids = self._create_recipes(user_ids)
+            maps = self._create_recipe_ingredient_maps(
+                recipe_ids, ingredient_ids)
+            tags = self._create_recipe_tags(recipe_ids, tag_ids)
+            follows = self._create_follows(user_ids)
+            favorites = self._create_favorites(user_ids, recipe_ids)
+            # The favorites are inserted in bulk, bypassing the counts of the
+            # popular ordering
+            recount_favorites(self.config.batch_size)
+            carts = self._create_shopping_carts(user_ids, recipe_ids)
+
+        return {
+            'users': len(user_ids),
+            'tags': self.config.tags,
+            'ingredients': self.config.ingredients,
+            'recipes': len(recipe_ids),
+            'recipe_ingredient_maps': maps,
+            'recipe_tags': tags,
+            'follows': follows,
+            'favorites': favorites,
+            'shopping_cart_items': carts,
+        }
+
+    def _amount(self, mean: int, limit: int) -> int:
+        """Number of related objects for one object (skewed around mean)."""
+        if mean <= 0 or limit <= 0:
+            return 0
+        return min(limit, int(self.rng.expovariate(1 / mean)))
+
+    def _bulk_create(self, model, objs) -> None:
+        model.objects.bulk_create(objs, batch_size=self.config.batch_size)
+
+    def _save_image(self) -> None:
+        if not default_storage.exists(SYNTHETIC_IMAGE):
+            default_storage.save(SYNTHETIC_IMAGE, ContentFile(PNG_PIXEL))
+
+    def _create_users(self) -> List[int]:
+        password = make_password(SYNTHETIC_PASSWORD)
+        self._bulk_create(User, [
+            User(
+                username=f'{SYNTHETIC_PREFIX}_{number}',
+                email=f'{SYNTHETIC_PREFIX}_{number}@example.com',
+                first_name=f'First{number}',
+                last_name=f'Last{number}',
+                password=password,
+            )
+            for number in range(self.config.users)
+        ])
+        user_ids = list(
+            synthetic_users().order_by('id').values_list('id', flat=True))
+        # Popularity rank of the authors
+        self.rng.shuffle(user_ids)
+        self.log(f'Created {len(user_ids)} users')
+        return user_ids
+
+    def _create_tags(self) -> List[int]:
+        self._bulk_create(Tag, [
+            Tag(
+                name=f'Synthetic tag {number}',
+                slug=f'{SYNTHETIC_PREFIX}-{number}',
+                hexcolor=f'#{self.rng.randrange(0x1000000):06X}',
+            )
+            for number in range(self.config.tags)
+        ])
+        tag_ids = list(
+            Tag.objects.filter(slug__startswith=f'{SYNTHETIC_PREFIX}-')
+            .order_by('id').values_list('id', flat=True)
+        )
+        self.rng.shuffle(tag_ids)
+        self.log(f'Created {self.config.tags} tags')
+        return tag_ids
+
+    def _create_ingredients(self) -> List[int]:
+        self._bulk_create(MeasurementUnit, [
+            MeasurementUnit(name=name) for name in SYNTHETIC_UNITS
+        ])
+        unit_ids = list(
+            MeasurementUnit.objects.filter(
+                name__in=SYNTHETIC_UNITS).values_list('id', flat=True)
+        )
+        self._bulk_create(Ingredient, [
+            Ingredient(
+                name=f'{SYNTHETIC_PREFIX} ingredient {number}',
+                measurement_unit_id=self.rng.choice(unit_ids),
+            )
+            for number in range(self.config.ingredients)
+        ])
+        ingredient_ids = list(
+            Ingredient.objects.filter(
+                name__startswith=f'{SYNTHETIC_PREFIX} ingredient ')
+            .order_by('id').values_list('id', flat=True)
+        )
+        self.rng.shuffle(ingredient_ids)
+        self.log(f'Created {self.config.ingredients} ingredients')
+        return ingredient_ids
+
+    def _create_recipes(self, user_ids: List[int]) -> List[int]:
+        if not user_ids:
+            return []
+        cum_weights = _zipf_cum_weights(len(user_ids), self.config.skew)
+        authors = self.rng.choices(
+            user_ids, cum_weights=cum_weights, k=self.config.recipes)
+        self._bulk_create(Recipe, [
+            Recipe(
+                name=f'Synthetic recipe {number}',
+                image=SYNTHETIC_IMAGE,
+                text=' '.join(
+                    self.rng.choices(WORDS, k=self.rng.randint(10, 200))),
+                author_id=author_id,
+                cooking_time=self.rng.randint(5, 180),
+            )
+            for number, author_id in enumerate(authors)
+        ])
+        recipes = list(
+            Recipe.objects.filter(
+                author__username__startswith=f'{SYNTHETIC_PREFIX}_'
+            ).order_by('id').only('id')
+        )
+
+        # `pub_date` is auto_now_add, so spread it over the last days
+        # after creation to get a realistic feed ordering
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=self.rng.randrange(self.config.days * 24 * 3600 or 1))
+        Recipe.objects.bulk_update(
+            recipes, ['pub_date'], batch_size=self.config.batch_size)
+
+        recipe_ids = [recipe.id for recipe in recipes]
+        self.rng.shuffle(recipe_ids)
+        self.log(f'Created {len(recipe_ids)} recipes')
+        return recipe_ids
+
+    def _create_recipe_ingredient_maps(
+        self, recipe_ids: List[int], ingredient_ids: List[int]
+    ) -> int:
+        if not ingredient_ids:
+            return 0
+        cum_weights = _zipf_cum_weights(len(ingredient_ids), self.config.skew)
+        maps = []
+        for recipe_id in recipe_ids:
+            amount = max(1, self._amount(
+                self.config.ingredients_per_recipe, len(ingredient_ids)))
+            for ingredient_id in _weighted_sample(
+                    self.rng, ingredient_ids, cum_weights, amount):
+                maps.append(RecipeIngredientMap(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500),
+                ))
+        self._bulk_create(RecipeIngredientMap, maps)
+        self.log(f'Created {len(maps)} recipe ingredients')
+        return len(maps)
+
+    def _create_recipe_tags(
+        self, recipe_ids: List[int], tag_ids: List[int]
+    ) -> int:
+        if not tag_ids:
+            return 0
+        through = Recipe.tags.through
+        cum_weights = _zipf_cum_weights(len(tag_ids), self.config.skew)
+        rows = []
+        for recipe_id in recipe_ids:
+            amount = max(1, self._amount(
+                self.config.tags_per_recipe, len(tag_ids)))
+            for tag_id in _weighted_sample(
+                    self.rng, tag_ids, cum_weights, amount):
+                rows.append(through(recipe_id=recipe_id, tag_id=tag_id))
+        self._bulk_create(through, rows)
+        self.log(f'Created {len(rows)} recipe tags')
+        return len(rows)
+
+    def _create_follows(self, user_ids: List[int]) -> int:
+        through = User.followings.through
+        cum_weights = _zipf_cum_weights(len(user_ids), self.config.skew)
+        rows = []
+        for user_id in user_ids:
+            amount = self._amount(
+                self.config.follows_per_user, len(user_ids) - 1)
+            followings = [
+                following_id
+                for following_id in _weighted_sample(
+                    self.rng, user_ids, cum_weights, amount + 1)
+                if following_id != user_id
+            ]
+            rows.extend(
+                through(from_user_id=user_id, to_user_id=following_id)
+                for following_id in followings[:amount]
+            )
+        self._bulk_create(through, rows)
+        self.log(f'Created {len(rows)} follows')
+        return len(rows)
+
+    def _create_favorites(
+        self, user_ids: List[int], recipe_ids: List[int]
+    ) -> int:
+        if not recipe_ids:
+            return 0
+        through = Recipe.followers.through
+        cum_weights = _zipf_cum_weights(len(recipe_ids), self.config.skew)
+        rows = []
+        for user_id in user_ids:
+            amount = self._amount(
+                self.config.favorites_per_user, len(recipe_ids))
+            rows.extend(
+                through(recipe_id=recipe_id, user_id=user_id)
+                for recipe_id in _weighted_sample(
+                    self.rng, recipe_ids, cum_weights, amount)
+            )
+        self._bulk_create(through, rows)
+        self.log(f'Created {len(rows)} favorites')
+        return len(rows)
+
+    def _create_shopping_carts(
+        self, user_ids: List[int], recipe_ids: List[int]
+    ) -> int:
+        if not recipe_ids:
+            return 0
+        cum_weights = _zipf_cum_weights(len(recipe_ids), self.config.skew)
+        cart_recipes = {}
+        for user_id in user_ids:
+            amount = self._amount(self.config.cart_per_user, len(recipe_ids))
+            if amount:
+                cart_recipes[user_id] = _weighted_sample(
+                    self.rng, recipe_ids, cum_weights, amount)
+
+        rows = [
+            CartItem(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipes in cart_recipes.items()
+            for recipe_id in recipes
+        ]
+        self._bulk_create(CartItem, rows)
+        self.log(f'Created {len(rows)} shopping cart items')
+        return len(rows)
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+
+from benchmarks.synthetic import (SYNTHETIC_IMAGE, SyntheticConfig,
+                                  SyntheticDataGenerator, flush_synthetic_data)
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredientMap, Tag)
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SyntheticDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cook = User.objects.create_user(
+            username='cook', email='cook@example.com', password='password')
+        cls.tag = Tag.objects.create(name='Lunch', slug='lunch')
+        cls.salt = Ingredient.objects.create(
+            name='Salt', measurement_unit=MeasurementUnit.objects.create(
+                name='g'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self):
+        SyntheticDataGenerator(SyntheticConfig(
+            users=5, recipes=20, tags=3, ingredients=10)).generate()
+
+    def test_existing_tags_and_ingredients_are_not_used(self):
+        self.generate()
+
+        self.assertFalse(Recipe.objects.filter(tags=self.tag).exists())
+        self.assertFalse(
+            RecipeIngredientMap.objects.filter(ingredient=self.salt).exists())
+
+    def test_favorites_are_counted(self):
+        self.generate()
+
+        recipes = Recipe.objects.annotate(count=Count('followers'))
+        self.assertTrue(recipes.filter(count__gt=0).exists())
+        self.assertFalse(recipes.exclude(favorites_count=F('count')).exists())
+
+    def test_flush_keeps_shared_image(self):
+        self.generate()
+        recipe = Recipe.objects.create(
+            name='Own recipe', image=SYNTHETIC_IMAGE, text='Own recipe',
+            author=self.cook, cooking_time=10,
+        )
+
+        flush_synthetic_data()
+
+        self.assertEqual(list(Recipe.objects.all()), [recipe])
+        self.assertTrue(
+            os.path.isfile(os.path.join(MEDIA_ROOT, SYNTHETIC_IMAGE)))
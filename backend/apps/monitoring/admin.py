@@ -0,0 +1,85 @@
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .models import RequestProfile
+from .profiling import ProfileStore
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Lists the profiles of ProfileStore instead of database rows."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '',
+                self.admin_site.admin_view(self.changelist_view),
+                name='monitoring_requestprofile_changelist',
+            ),
+            path(
+                '<str:profile_id>/',
+                self.admin_site.admin_view(self.profile_view),
+                name='monitoring_requestprofile_profile',
+            ),
+            path(
+                '<str:profile_id>/pstats/',
+                self.admin_site.admin_view(self.pstats_view),
+                name='monitoring_requestprofile_pstats',
+            ),
+        ]
+
+    def _context(self, request, **kwargs):
+        return {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': self.model._meta.verbose_name_plural,
+            **kwargs,
+        }
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise Http404
+        return TemplateResponse(
+            request,
+            'admin/monitoring/requestprofile/change_list.html',
+            self._context(request, profiles=ProfileStore().list()),
+        )
+
+    def profile_view(self, request, profile_id):
+        if not self.has_view_permission(request):
+            raise Http404
+        try:
+            profile = ProfileStore().get(profile_id)
+        except KeyError:
+            raise Http404
+        return TemplateResponse(
+            request,
+            'admin/monitoring/requestprofile/profile.html',
+            self._context(
+                request, profile=profile,
+                title=f'{profile["method"]} {profile["path"]}',
+            ),
+        )
+
+    def pstats_view(self, request, profile_id):
+        if not self.has_view_permission(request):
+            raise Http404
+        try:
+            path = ProfileStore().pstats_path(profile_id)
+        except KeyError:
+            raise Http404
+        return FileResponse(
+            open(path, 'rb'), as_attachment=True,
+            filename=f'{profile_id}.prof',
+        )
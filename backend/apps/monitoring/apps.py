@@ -0,0 +1,29 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+
+    def ready(self):
+        from .connections import (check_connections, track_connection,
+                                  update_connection_gauge)
+        from .logs import clear_request_id
+        from .queries import install_query_dispatcher
+
+        connection_created.connect(
+            install_query_dispatcher,
+            dispatch_uid='monitoring.install_query_dispatcher',
+        )
+        connection_created.connect(
+            track_connection, dispatch_uid='monitoring.track_connection')
+        request_started.connect(
+            check_connections, dispatch_uid='monitoring.check_connections')
+        request_finished.connect(
+            update_connection_gauge,
+            dispatch_uid='monitoring.update_connection_gauge',
+        )
+        request_finished.connect(
+            clear_request_id, dispatch_uid='monitoring.clear_request_id')
@@ -0,0 +1,57 @@
+"""Health checks and usage metrics of persistent database connections.
+
+With CONN_MAX_AGE the connections outlive the requests. Before a request
+uses a connection left open by a previous one, the connection is checked
+(if CONN_HEALTH_CHECKS of the database is on, as in Django 4.1) and is
+closed when the database has dropped it, so Django reconnects instead of
+failing the request.
+"""
+
+import threading
+import weakref
+
+from django.db import connections
+
+from .metrics import (DB_CONNECTIONS_HEALTH_CHECK_FAILURES,
+                      DB_CONNECTIONS_OPEN, DB_CONNECTIONS_OPENED,
+                      DB_CONNECTIONS_REUSED)
+
+# Connection wrappers of all the threads of the process
+_wrappers = weakref.WeakSet()
+_lock = threading.Lock()
+
+
+def track_connection(connection, **kwargs) -> None:
+    """`connection_created` signal receiver."""
+    with _lock:
+        _wrappers.add(connection)
+    DB_CONNECTIONS_OPENED.inc(alias=connection.alias)
+
+
+def check_connections(**kwargs) -> None:
+    """`request_started` signal receiver. Runs after Django has closed
+    the obsolete connections."""
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if (
+            connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not connection.is_usable()
+        ):
+            connection.close()
+            DB_CONNECTIONS_HEALTH_CHECK_FAILURES.inc(alias=connection.alias)
+            continue
+        DB_CONNECTIONS_REUSED.inc(alias=connection.alias)
+
+
+def update_connection_gauge(**kwargs) -> None:
+    """`request_finished` signal receiver."""
+    with _lock:
+        wrappers = list(_wrappers)
+    open_connections = dict.fromkeys(connections, 0)
+    for connection in wrappers:
+        if connection.connection is not None:
+            open_connections[connection.alias] = (
+                open_connections.get(connection.alias, 0) + 1)
+    for alias, count in open_connections.items():
+        DB_CONNECTIONS_OPEN.set(count, alias=alias)
@@ -0,0 +1,170 @@
+"""Logging which does not block requests.
+
+Views put the records into a queue and a listener thread writes them into
+a rotating file as JSON lines. Under gunicorn with preload_app the handler
+is created in the master process, so the workers inherit the queue and send
+their records to the single listener of the master. The file has a single
+writer then, the lines are not interleaved and the rotation is safe.
+Without preload every worker writes the file by its own listener.
+
+The queue is a pipe written by the logging thread itself. The feeder thread
+of multiprocessing.Queue is not restarted in the processes forked by
+gunicorn (os.fork), so after the master had logged anything the records of
+the workers would be lost.
+
+Every record of a request has its request id (see RequestIdMiddleware).
+"""
+
+import atexit
+import copy
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from multiprocessing.queues import SimpleQueue
+from typing import Optional
+
+REQUEST_ID_HEADER = 'HTTP_X_REQUEST_ID'
+
+_request_id: ContextVar[Optional[str]] = ContextVar(
+    'request_id', default=None)
+
+# Attributes of every LogRecord, the rest comes from `extra`
+RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord('', 0, '', 0, '', (), None).__dict__
+) | {'message', 'request_id'}
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def set_request_id(request_id: Optional[str]) -> None:
+    _request_id.set(request_id)
+
+
+def clear_request_id(**kwargs) -> None:
+    """Receiver of request_finished signal. The id is kept till the end of
+    the request, as Django logs the error responses after the middlewares
+    have returned them."""
+    _request_id.set(None)
+
+
+def new_request_id(request) -> str:
+    """Returns the id of the request given by the proxy (nginx $request_id)
+    or a new one."""
+    request_id = request.META.get(REQUEST_ID_HEADER, '')
+    if request_id and len(request_id) <= 64 and request_id.isprintable():
+        return request_id
+    return uuid.uuid4().hex
+
+
+def _json_safe(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats the record as a single line JSON object."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = record.stack_info
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and key not in data:
+                data[key] = _json_safe(value)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class PipeQueue(SimpleQueue):
+    """SimpleQueue with the interface of the queue used by QueueHandler and
+    QueueListener. A record is written into the pipe by the calling
+    thread under a lock shared by the processes, so it is never lost or
+    interleaved across a fork. The call waits only while the pipe is full,
+    until the listener has read it."""
+
+    def __init__(self):
+        super().__init__(ctx=multiprocessing.get_context())
+
+    def get(self, block: bool = True):
+        return super().get()
+
+    def put_nowait(self, obj) -> None:
+        self.put(obj)
+
+
+class QueueFileHandler(QueueHandler):
+    """Puts the records into a queue, the listener thread of the process
+    which created the handler writes them into a rotating file."""
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 0,
+        backup_count: int = 0,
+    ):
+        super().__init__(PipeQueue())
+        self.file_handler = RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8', delay=True,
+        )
+        self.file_handler.setFormatter(JsonFormatter())
+        self.listener = QueueListener(
+            self.queue, self.file_handler, respect_handler_level=True)
+        self._owner_pid = os.getpid()
+        self._stopped = threading.Event()
+        self.listener.start()
+        # Stopping the listener at exit writes the queued records
+        atexit.register(self.close)
+
+    def setFormatter(self, formatter: logging.Formatter) -> None:  # noqa
+        # The records are formatted by the listener
+        self.file_handler.setFormatter(formatter)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Makes a picklable copy of the record with the request id, the
+        message and the traceback rendered in the calling thread."""
+        record = copy.copy(record)
+        record.request_id = get_request_id()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.file_handler.formatter.formatException(
+                record.exc_info)
+            record.exc_info = None
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                record.__dict__[key] = _json_safe(value)
+        return record
+
+    def close(self) -> None:
+        # Forked workers share the queue, only the owner stops the listener
+        if os.getpid() == self._owner_pid and not self._stopped.is_set():
+            self._stopped.set()
+            self.listener.stop()
+            self.file_handler.close()
+        super().close()
@@ -0,0 +1,374 @@
+"""Minimal Prometheus metrics with multiprocess support.
+
+Every process keeps its samples in memory and periodically dumps them into
+its own file `<pid>.json` of the shared directory (METRICS_MULTIPROC_DIR).
+The metrics endpoint merges the files of all the processes, so the values
+are aggregated across gunicorn workers: counters and histograms are summed
+(including the workers which have already exited), gauges are summed over
+the alive processes only. Without the directory only the metrics of the
+current process are exposed.
+
+Gunicorn workers are recycled (max_requests), so the master merges the
+counters and histograms of every exited worker into the single file
+`archive.json` and removes the file of the worker (`archive_process`
+called by child_exit hook of gunicorn.conf.py).
+"""
+
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+LabelValues = Tuple[Tuple[str, str], ...]
+# (sample name, label values) -> value
+Samples = Dict[Tuple[str, LabelValues], float]
+
+ARCHIVE_FILE = 'archive.json'
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0,
+    7.5, 10.0, float('inf'),
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels: LabelValues) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+        )
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Registry:
+    def __init__(self, directory: Optional[str] = None):
+        self.metrics: Dict[str, 'Metric'] = {}
+        self.samples: Dict[str, Samples] = {}
+        self.lock = threading.Lock()
+        self._directory = directory
+        self._dirty = False
+        self._last_flush = 0.0
+
+    @property
+    def directory(self) -> Optional[str]:
+        return self._directory or getattr(
+            settings, 'METRICS_MULTIPROC_DIR', None)
+
+    def register(self, metric: 'Metric') -> None:
+        self.metrics[metric.name] = metric
+        self.samples[metric.name] = {}
+
+    def add(self, metric: 'Metric', sample: str, labels: LabelValues,
+            amount: float) -> None:
+        with self.lock:
+            samples = self.samples[metric.name]
+            key = (sample, labels)
+            samples[key] = samples.get(key, 0.0) + amount
+            self._dirty = True
+
+    def set(self, metric: 'Metric', sample: str, labels: LabelValues,
+            value: float) -> None:
+        with self.lock:
+            self.samples[metric.name][(sample, labels)] = value
+            self._dirty = True
+
+    def _dump(self) -> Dict[str, List]:
+        with self.lock:
+            self._dirty = False
+            return {
+                name: [[sample, list(labels), value]
+                       for (sample, labels), value in samples.items()]
+                for name, samples in self.samples.items()
+            }
+
+    def flush(self, force: bool = False) -> None:
+        """Writes the samples of the current process into the shared
+        directory. Without `force` writes at most once per
+        METRICS_FLUSH_INTERVAL seconds and only if something has changed."""
+        directory = self.directory
+        if not directory or not self._dirty:
+            return
+        now = time.monotonic()
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+        if not force and now - self._last_flush < interval:
+            return
+        self._last_flush = now
+
+        os.makedirs(directory, exist_ok=True)
+        _write_json(directory, f'{os.getpid()}.json', self._dump())
+
+    def _read_files(self) -> Iterator[Tuple[Optional[int], Dict[str, List]]]:
+        """Samples of the processes by their pids, the archive of the
+        exited processes has no pid."""
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            name = os.path.basename(path)
+            try:
+                pid = (
+                    None if name == ARCHIVE_FILE
+                    else int(name[:-len('.json')])
+                )
+                with open(path) as file:
+                    yield pid, json.load(file)
+            except (ValueError, OSError):
+                continue
+
+    def collect(self) -> Dict[str, Samples]:
+        """Merged samples of all the processes."""
+        if not self.directory:
+            with self.lock:
+                return {
+                    name: dict(samples)
+                    for name, samples in self.samples.items()
+                }
+
+        self.flush(force=True)
+        merged = {name: {} for name in self.metrics}
+        for pid, data in self._read_files():
+            for name, samples in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                if metric.type == 'gauge' and (
+                    pid is None or not _is_alive(pid)
+                ):
+                    continue
+                for sample, labels, value in samples:
+                    key = (sample, tuple(tuple(pair) for pair in labels))
+                    merged[name][key] = merged[name].get(key, 0.0) + value
+        return merged
+
+    def generate_latest(self) -> str:
+        """Metrics in Prometheus text exposition format."""
+        lines = []
+        for name, samples in sorted(self.collect().items()):
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for (sample, labels), value in sorted(
+                    samples.items(), key=metric.sort_key):
+                lines.append(
+                    f'{sample}{_format_labels(labels)} '
+                    f'{_format_value(value)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _write_json(directory: str, name: str, data) -> None:
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(data, file)
+    # Atomic, so the readers never see a partially written file
+    os.replace(path, os.path.join(directory, name))
+
+
+def archive_process(
+    directory: str, pid: int, registry: Registry = REGISTRY
+) -> None:
+    """Merges the counters and the histograms of the exited process into
+    the archive file and removes the file of the process. Called by the
+    gunicorn master only, so the archive has a single writer."""
+    path = os.path.join(directory, f'{pid}.json')
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return
+    except ValueError:
+        data = {}
+
+    archive = {}
+    try:
+        with open(os.path.join(directory, ARCHIVE_FILE)) as file:
+            archive = json.load(file)
+    except (FileNotFoundError, ValueError):
+        pass
+    for name, samples in data.items():
+        metric = registry.metrics.get(name)
+        if metric is None or metric.type == 'gauge':
+            continue
+        merged = {
+            (sample, tuple(map(tuple, labels))): value
+            for sample, labels, value in archive.get(name, [])
+        }
+        for sample, labels, value in samples:
+            key = (sample, tuple(map(tuple, labels)))
+            merged[key] = merged.get(key, 0.0) + value
+        archive[name] = [
+            [sample, [list(pair) for pair in labels], value]
+            for (sample, labels), value in merged.items()
+        ]
+    _write_json(directory, ARCHIVE_FILE, archive)
+    os.remove(path)
+
+
+class Metric:
+    type = ''
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Registry = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        registry.register(self)
+
+    def _labels(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    @staticmethod
+    def sort_key(item):
+        (sample, labels), value = item
+        return labels, sample
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.registry.add(
+            self, f'{self.name}_total', self._labels(labels), amount)
+
+
+class Gauge(Metric):
+    """Gauge of the current process. Values of the exited processes are
+    excluded from the aggregation."""
+    type = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        self.registry.set(self, self.name, self._labels(labels), value)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.registry.add(self, self.name, self._labels(labels), amount)
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        buckets = sorted(float(bucket) for bucket in buckets)
+        if buckets[-1] != float('inf'):
+            buckets.append(float('inf'))
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        label_values = self._labels(labels)
+        # Buckets are cumulative: the value is counted by every bucket
+        # with upper bound greater than or equal to the value
+        for bucket in self.buckets[bisect_left(self.buckets, value):]:
+            self.registry.add(
+                self,
+                f'{self.name}_bucket',
+                label_values + (('le', _format_value(bucket)),),
+                1,
+            )
+        self.registry.add(self, f'{self.name}_sum', label_values, value)
+        self.registry.add(self, f'{self.name}_count', label_values, 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def sort_key(self, item):
+        (sample, labels), value = item
+        base = tuple(pair for pair in labels if pair[0] != 'le')
+        le = dict(labels).get('le')
+        bucket = float('inf') if le == '+Inf' else float(le or 0)
+        suffix_order = ('_bucket', '_sum', '_count')
+        suffix = next(
+            order for order, suffix in enumerate(suffix_order)
+            if sample.endswith(suffix)
+        )
+        return base, suffix, bucket
+
+
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Duration of HTTP requests',
+    labelnames=('view', 'action', 'method', 'status'),
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries',
+    'Number of SQL queries',
+    labelnames=('view', 'action'),
+)
+DB_QUERY_DURATION = Counter(
+    'foodgram_db_query_duration_seconds',
+    'Total time of SQL queries',
+    labelnames=('view', 'action'),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'foodgram_db_queries_per_request',
+    'Number of SQL queries per HTTP request',
+    labelnames=('view', 'action'),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+PDF_RENDER_DURATION = Histogram(
+    'foodgram_pdf_render_duration_seconds',
+    'Duration of shopping cart PDF rendering',
+)
+DB_CONNECTIONS_OPEN = Gauge(
+    'foodgram_db_connections_open',
+    'Number of open database connections',
+    labelnames=('alias',),
+)
+DB_CONNECTIONS_OPENED = Counter(
+    'foodgram_db_connections_opened',
+    'Number of established database connections',
+    labelnames=('alias',),
+)
+DB_CONNECTIONS_REUSED = Counter(
+    'foodgram_db_connections_reused',
+    'Number of requests which reused an open database connection',
+    labelnames=('alias',),
+)
+DB_CONNECTIONS_HEALTH_CHECK_FAILURES = Counter(
+    'foodgram_db_connections_health_check_failures',
+    'Number of reused database connections closed by the health check',
+    labelnames=('alias',),
+)
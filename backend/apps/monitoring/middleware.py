@@ -0,0 +1,182 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import Tuple
+
+from asgiref.sync import sync_to_async
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .logs import new_request_id, set_request_id
+from .metrics import (DB_QUERIES, DB_QUERIES_PER_REQUEST, DB_QUERY_DURATION,
+                      REGISTRY, REQUEST_DURATION)
+from .profiling import aprofile_request, profile_request
+from .queries import capture_queries
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+
+
+class QueryStats:
+    """Database execute wrapper which counts SQL queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def get_view_labels(request) -> Tuple[str, str]:
+    """Returns (view, action) labels of the request. For DRF viewsets these
+    are the viewset name and its action, for other views the view name."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched', ''
+    func = match.func
+    view = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    actions = getattr(func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), '')
+    if view is not None:
+        return view.__name__, action
+    return getattr(func, '__name__', type(func).__name__), action
+
+
+class AsyncCapableMiddleware(ABC):
+    """Base of the middlewares which work both in sync (WSGI) and async
+    (ASGI) chains: `__call__` returns a coroutine, when the next handler is
+    async."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Makes Django treat the instance as a coroutine function, as
+            # django.utils.deprecation.MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.process(request)
+
+    @abstractmethod
+    def process(self, request):
+        """Handles the request in a sync chain."""
+
+    @abstractmethod
+    async def __acall__(self, request):
+        """Handles the request in an async chain."""
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Records request latency, SQL query count and SQL time of every
+    request per view and action."""
+
+    def process(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with capture_queries(stats):
+            response = self.get_response(request)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with capture_queries(stats):
+            response = await self.get_response(request)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def record(request, response, stats: QueryStats, duration: float):
+        view, action = get_view_labels(request)
+        REQUEST_DURATION.observe(
+            duration, view=view, action=action, method=request.method,
+            status=response.status_code,
+        )
+        DB_QUERIES.inc(stats.count, view=view, action=action)
+        DB_QUERY_DURATION.inc(stats.duration, view=view, action=action)
+        DB_QUERIES_PER_REQUEST.observe(stats.count, view=view, action=action)
+        REGISTRY.flush()
+
+
+class RequestIdMiddleware(AsyncCapableMiddleware):
+    """Binds the id of the request to its log records (till
+    request_finished signal) and returns it in `X-Request-ID` header."""
+
+    def process(self, request):
+        request_id = new_request_id(request)
+        set_request_id(request_id)
+        response = self.get_response(request)
+        response['X-Request-ID'] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id = new_request_id(request)
+        set_request_id(request_id)
+        response = await self.get_response(request)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+def get_staff_user(request):
+    """Returns the staff user of the request authenticated by session or
+    by API token, or None."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user_auth = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = user_auth[0] if user_auth else None
+    if user is not None and user.is_staff:
+        return user
+    return None
+
+
+def is_profiling_requested(request) -> bool:
+    return (
+        PROFILE_HEADER in request.META
+        or PROFILE_QUERY_PARAM in request.GET
+    )
+
+
+class ProfilerMiddleware(AsyncCapableMiddleware):
+    """Profiles the request when a staff user asks for it with `X-Profile`
+    header or `profile` query parameter, and returns the id of the saved
+    profile in `X-Profile-Id` header. Other requests are passed as is."""
+
+    def process(self, request):
+        if not is_profiling_requested(request):
+            return self.get_response(request)
+
+        user = get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        response, profile_id = profile_request(
+            get_response=self.get_response, request=request, user=user)
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    async def __acall__(self, request):
+        if not is_profiling_requested(request):
+            return await self.get_response(request)
+
+        user = await sync_to_async(get_staff_user)(request)
+        if user is None:
+            return await self.get_response(request)
+
+        response, profile_id = await aprofile_request(
+            get_response=self.get_response, request=request, user=user)
+        response['X-Profile-Id'] = profile_id
+        return response
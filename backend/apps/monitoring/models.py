@@ -0,0 +1,11 @@
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Request profiles are stored on disk (see monitoring.profiling),
+    the model has no table and exists to show them in the admin."""
+
+    class Meta:
+        managed = False
+        verbose_name = 'Request profile'
+        verbose_name_plural = 'Request profiles'
@@ -0,0 +1,270 @@
+"""On-demand request profiling.
+
+A profile contains the top functions of cProfile, the slowest SQL queries
+with their EXPLAIN plans and the raw pstats dump. Profiles are kept in a
+bounded directory (PROFILES_DIR): when there are more than
+PROFILER_MAX_PROFILES of them, the oldest ones are removed.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import re
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import HttpResponse
+
+from .queries import capture_queries
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+
+TOP_FUNCTIONS = 40
+SLOWEST_QUERIES = 10
+
+
+# Profiler of the async request which is being processed in the context
+_profiler: ContextVar[Optional[cProfile.Profile]] = ContextVar(
+    'profiler', default=None)
+
+
+class QueryCapture:
+    """Database execute wrapper which records SQL queries and their time."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': None if many else params,
+                'duration_ms': (time.perf_counter() - start) * 1000,
+            })
+
+
+def explain(alias: str, sql: str, params) -> str:
+    """EXPLAIN plan of the query (without executing it)."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    connection = connections[alias]
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+
+
+def _function_name(key) -> str:
+    filename, line, name = key
+    if filename == '~':
+        # Built-in functions
+        return name
+    path = '/'.join(filename.split(os.sep)[-3:])
+    return f'{name} ({path}:{line})'
+
+
+def top_functions(profiler: cProfile.Profile, limit: int) -> List[Dict]:
+    try:
+        stats = pstats.Stats(profiler)
+    except TypeError:
+        # Nothing has been profiled
+        return []
+    rows = sorted(
+        stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            'function': _function_name(key),
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        }
+        for key, (_, calls, tottime, cumtime, _) in rows[:limit]
+    ]
+
+
+class ProfileStore:
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_profiles: Optional[int] = None,
+    ):
+        self.directory = directory or settings.PROFILES_DIR
+        self.max_profiles = max_profiles or settings.PROFILER_MAX_PROFILES
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        if not PROFILE_ID_RE.match(profile_id):
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f'{profile_id}.{extension}')
+
+    def _write(self, path: str, write) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def save(self, profile: Dict, profiler: cProfile.Profile) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = (
+            f'{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}')
+        profile['id'] = profile_id
+
+        self._write(self._path(profile_id, 'prof'), profiler.dump_stats)
+
+        def write_json(path):
+            with open(path, 'w') as file:
+                json.dump(profile, file)
+        self._write(self._path(profile_id, 'json'), write_json)
+
+        self.prune()
+        return profile_id
+
+    def ids(self) -> List[str]:
+        """Ids of the stored profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            (
+                name[:-len('.json')] for name in os.listdir(self.directory)
+                if name.endswith('.json')
+                and PROFILE_ID_RE.match(name[:-len('.json')])
+            ),
+            reverse=True,
+        )
+
+    def prune(self) -> None:
+        for profile_id in self.ids()[self.max_profiles:]:
+            for extension in ('json', 'prof'):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def get(self, profile_id: str) -> Dict:
+        try:
+            with open(self._path(profile_id, 'json')) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise KeyError(profile_id)
+
+    def list(self) -> List[Dict]:
+        profiles = []
+        for profile_id in self.ids():
+            try:
+                profile = self.get(profile_id)
+            except (KeyError, ValueError):
+                continue
+            profile.pop('functions', None)
+            profile.pop('slowest_queries', None)
+            profiles.append(profile)
+        return profiles
+
+    def pstats_path(self, profile_id: str) -> str:
+        path = self._path(profile_id, 'prof')
+        if not os.path.exists(path):
+            raise KeyError(profile_id)
+        return path
+
+
+def save_profile(
+    request, user, response, duration: float, queries: List[Dict],
+    profiler: cProfile.Profile,
+) -> str:
+    """Saves the profile of the processed request and returns its id."""
+    slowest = sorted(
+        queries, key=lambda query: query['duration_ms'], reverse=True
+    )[:SLOWEST_QUERIES]
+    profile = {
+        'created': datetime.utcnow().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.path,
+        'query_string': request.META.get('QUERY_STRING', ''),
+        'user': user.get_username(),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'queries': len(queries),
+        'sql_ms': round(sum(query['duration_ms'] for query in queries), 3),
+        'functions': top_functions(profiler, TOP_FUNCTIONS),
+        'slowest_queries': [
+            {
+                'sql': query['sql'],
+                'params': repr(query['params']),
+                'duration_ms': round(query['duration_ms'], 3),
+                'plan': explain(
+                    query['alias'], query['sql'], query['params']),
+            }
+            for query in slowest
+        ],
+    }
+    return ProfileStore().save(profile, profiler)
+
+
+def profile_request(
+    get_response, request, user
+) -> Tuple[HttpResponse, str]:
+    """Processes the request under cProfile capturing its SQL queries.
+    Returns the response and the id of the saved profile."""
+    capture = QueryCapture()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    with capture_queries(capture):
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - start
+    profile_id = save_profile(
+        request, user, response, duration, capture.queries, profiler)
+    return response, profile_id
+
+
+async def aprofile_request(
+    get_response, request, user
+) -> Tuple[HttpResponse, str]:
+    """Async version of `profile_request`. The event loop serves other
+    requests at the same time, so only the code run in worker threads
+    under `profile_thread` is profiled."""
+    capture = QueryCapture()
+    profiler = cProfile.Profile()
+    token = _profiler.set(profiler)
+    start = time.perf_counter()
+    try:
+        with capture_queries(capture):
+            response = await get_response(request)
+    finally:
+        _profiler.reset(token)
+    duration = time.perf_counter() - start
+    profile_id = await sync_to_async(save_profile)(
+        request, user, response, duration, capture.queries, profiler)
+    return response, profile_id
+
+
+@contextmanager
+def profile_thread():
+    """Enables the profiler of the current async request, if any, while
+    its sync code is run in a worker thread."""
+    profiler = _profiler.get()
+    if profiler is None:
+        yield
+        return
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
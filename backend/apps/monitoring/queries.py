@@ -0,0 +1,45 @@
+"""Capturing of the SQL queries of a request.
+
+Every database connection gets `dispatch_queries` execute wrapper when it
+is created. The wrapper passes the queries to the wrappers registered with
+`capture_queries` in the current context. Unlike
+`connection.execute_wrapper`, this works for the queries made in other
+threads too: the sync part of an async request is run in a worker thread
+with its own connections, but with a copy of the request context.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Callable, Tuple
+
+ExecuteWrapper = Callable
+
+_wrappers: ContextVar[Tuple[ExecuteWrapper, ...]] = ContextVar(
+    'query_wrappers', default=())
+
+
+def dispatch_queries(execute, sql, params, many, context):
+    wrappers = _wrappers.get()
+    for wrapper in reversed(wrappers):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install_query_dispatcher(connection, **kwargs) -> None:
+    """`connection_created` signal receiver."""
+    if dispatch_queries not in connection.execute_wrappers:
+        # First, as `connection.execute_wrapper` removes the last wrapper
+        # on exit, and the connection may be created inside of it
+        connection.execute_wrappers.insert(0, dispatch_queries)
+
+
+@contextmanager
+def capture_queries(*wrappers: ExecuteWrapper):
+    """Passes the queries made in the current context (including worker
+    threads started from it) through the execute wrappers."""
+    token = _wrappers.set(_wrappers.get() + wrappers)
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from monitoring.connections import check_connections, update_connection_gauge
+from monitoring.metrics import REGISTRY
+
+
+def sample(metric: str, name: str, alias: str = 'default') -> float:
+    return REGISTRY.collect()[metric].get((name, (('alias', alias),)), 0)
+
+
+@override_settings(METRICS_MULTIPROC_DIR=None)
+class ConnectionHealthCheckTest(TransactionTestCase):
+    def setUp(self):
+        connection.ensure_connection()
+        health_checks = mock.patch.dict(
+            connection.settings_dict, {'CONN_HEALTH_CHECKS': True})
+        health_checks.start()
+        self.addCleanup(health_checks.stop)
+
+    def test_usable_connection_is_reused(self):
+        reused = sample(
+            'foodgram_db_connections_reused',
+            'foodgram_db_connections_reused_total',
+        )
+
+        check_connections()
+
+        self.assertIsNotNone(connection.connection)
+        self.assertEqual(
+            sample(
+                'foodgram_db_connections_reused',
+                'foodgram_db_connections_reused_total',
+            ),
+            reused + 1,
+        )
+
+    def test_broken_connection_is_closed(self):
+        failures = sample(
+            'foodgram_db_connections_health_check_failures',
+            'foodgram_db_connections_health_check_failures_total',
+        )
+
+        with mock.patch.object(
+            connection, 'is_usable', return_value=False
+        ), mock.patch.object(connection, 'close') as close:
+            check_connections()
+
+        close.assert_called_once()
+        self.assertEqual(
+            sample(
+                'foodgram_db_connections_health_check_failures',
+                'foodgram_db_connections_health_check_failures_total',
+            ),
+            failures + 1,
+        )
+
+    def test_open_connections_gauge(self):
+        update_connection_gauge()
+
+        self.assertGreaterEqual(
+            sample(
+                'foodgram_db_connections_open',
+                'foodgram_db_connections_open',
+            ),
+            1,
+        )
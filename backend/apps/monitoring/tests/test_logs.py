@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import tempfile
+
+from django.test import TestCase
+from monitoring.logs import QueueFileHandler, clear_request_id, set_request_id
+
+
+class QueueFileHandlerTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'logs.log')
+        self.handler = QueueFileHandler(self.filename)
+        self.addCleanup(self.handler.close)
+        self.logger = logging.getLogger('monitoring.tests.logs')
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def read_records(self):
+        # Stopping the listener writes the queued records
+        self.handler.close()
+        with open(self.filename) as file:
+            return [json.loads(line) for line in file]
+
+    def test_json_records_with_request_id(self):
+        set_request_id('request-1')
+        self.addCleanup(clear_request_id)
+        try:
+            raise ValueError('broken')
+        except ValueError:
+            self.logger.exception(
+                'Failed %s', 'recipe', extra={'request': object()})
+
+        record, = self.read_records()
+        self.assertEqual(record['message'], 'Failed recipe')
+        self.assertEqual(record['level'], 'ERROR')
+        self.assertEqual(record['request_id'], 'request-1')
+        self.assertIn('ValueError: broken', record['exc_info'])
+        self.assertIn('object object', record['request'])
+
+    def test_records_of_forked_process_after_parent_has_logged(self):
+        # Like gunicorn workers forked by the preloaded master
+        self.logger.warning('Master')
+        pid = os.fork()
+        if not pid:
+            try:
+                self.logger.warning('Worker')
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        messages = [record['message'] for record in self.read_records()]
+        self.assertEqual(messages, ['Master', 'Worker'])
+
+    def test_request_id_header(self):
+        response = self.client.get(
+            '/api/tags/', HTTP_X_REQUEST_ID='nginx-request-id')
+        self.assertEqual(response['X-Request-ID'], 'nginx-request-id')
+
+        response = self.client.get('/api/tags/')
+        self.assertEqual(len(response['X-Request-ID']), 32)
+
+    def test_error_responses_are_logged_with_request_id(self):
+        logger = logging.getLogger('django.request')
+        logger.addHandler(self.handler)
+        self.addCleanup(logger.removeHandler, self.handler)
+
+        self.client.get(
+            '/api/users/me/', HTTP_X_REQUEST_ID='nginx-request-id')
+
+        record, = self.read_records()
+        self.assertEqual(record['message'], 'Unauthorized: /api/users/me/')
+        self.assertEqual(record['request_id'], 'nginx-request-id')
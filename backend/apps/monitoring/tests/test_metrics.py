@@ -0,0 +1,133 @@
+import importlib.util
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from monitoring.metrics import (REGISTRY, Counter, Gauge, Histogram, Registry,
+                                archive_process)
+from rest_framework.test import APIClient
+
+# Pid which can not belong to an alive process
+DEAD_PID = 2 ** 22 + 1
+
+
+class RegistryTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.registry = Registry(directory=self.directory.name)
+        self.counter = Counter(
+            'test_requests', 'Requests', labelnames=('view',),
+            registry=self.registry,
+        )
+        self.gauge = Gauge(
+            'test_connections', 'Connections', registry=self.registry)
+        self.histogram = Histogram(
+            'test_duration_seconds', 'Duration', buckets=(0.1, 1),
+            registry=self.registry,
+        )
+
+    def write_dead_process_file(self, data, pid: int = DEAD_PID):
+        path = os.path.join(self.directory.name, f'{pid}.json')
+        with open(path, 'w') as file:
+            json.dump(data, file)
+
+    def test_counters_are_summed_across_processes(self):
+        self.counter.inc(2, view='TagViewSet')
+        self.write_dead_process_file({
+            'test_requests': [
+                ['test_requests_total', [['view', 'TagViewSet']], 3],
+            ],
+        })
+
+        self.assertIn(
+            'test_requests_total{view="TagViewSet"} 5',
+            self.registry.generate_latest(),
+        )
+
+    def test_gauges_of_exited_processes_are_ignored(self):
+        self.gauge.set(4)
+        self.write_dead_process_file({
+            'test_connections': [['test_connections', [], 10]],
+        })
+
+        self.assertIn('test_connections 4\n', self.registry.generate_latest())
+
+    def test_exited_processes_are_archived(self):
+        self.counter.inc(2, view='TagViewSet')
+        for pid in (DEAD_PID, DEAD_PID + 1):
+            self.write_dead_process_file({
+                'test_requests': [
+                    ['test_requests_total', [['view', 'TagViewSet']], 3],
+                ],
+                'test_connections': [['test_connections', [], 10]],
+            }, pid=pid)
+            archive_process(self.directory.name, pid, registry=self.registry)
+        archive_process(self.directory.name, DEAD_PID, registry=self.registry)
+
+        self.assertCountEqual(
+            os.listdir(self.directory.name), ['archive.json'])
+        exposition = self.registry.generate_latest()
+        self.assertIn('test_requests_total{view="TagViewSet"} 8', exposition)
+        self.assertNotIn('test_connections 10', exposition)
+
+    def test_gunicorn_child_exit_hook(self):
+        spec = importlib.util.spec_from_file_location(
+            'gunicorn_conf', settings.BASE_DIR / 'gunicorn.conf.py')
+        config = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(config)
+        self.write_dead_process_file({
+            'foodgram_db_queries': [
+                ['foodgram_db_queries_total', [['view', 'TagViewSet']], 3],
+            ],
+        })
+
+        with mock.patch.dict(
+            os.environ, METRICS_MULTIPROC_DIR=self.directory.name
+        ):
+            config.child_exit(None, SimpleNamespace(pid=DEAD_PID))
+
+        self.assertEqual(os.listdir(self.directory.name), ['archive.json'])
+        with open(os.path.join(self.directory.name, 'archive.json')) as file:
+            self.assertEqual(json.load(file), {
+                'foodgram_db_queries': [
+                    ['foodgram_db_queries_total', [['view', 'TagViewSet']], 3],
+                ],
+            })
+
+    def test_histogram_exposition(self):
+        self.histogram.observe(0.05)
+        self.histogram.observe(0.5)
+
+        self.assertIn(
+            '# TYPE test_duration_seconds histogram\n'
+            'test_duration_seconds_bucket{le="0.1"} 1\n'
+            'test_duration_seconds_bucket{le="1"} 2\n'
+            'test_duration_seconds_bucket{le="+Inf"} 2\n'
+            'test_duration_seconds_sum 0.55\n'
+            'test_duration_seconds_count 2\n',
+            self.registry.generate_latest(),
+        )
+
+
+@override_settings(METRICS_MULTIPROC_DIR=None)
+class MetricsMiddlewareTest(TestCase):
+    def test_request_is_recorded_per_view_and_action(self):
+        APIClient().get('/api/tags/')
+
+        response = APIClient().get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'foodgram_db_queries_total{view="TagViewSet",action="list"}',
+            response.content.decode(),
+        )
+        self.assertIn(
+            'foodgram_http_request_duration_seconds_count{view="TagViewSet",'
+            'action="list",method="GET",status="200"}',
+            REGISTRY.generate_latest(),
+        )
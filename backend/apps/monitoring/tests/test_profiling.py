@@ -0,0 +1,66 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from monitoring.profiling import ProfileStore
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class ProfilerMiddlewareTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            PROFILES_DIR=directory.name, PROFILER_MAX_PROFILES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='password',
+            is_staff=True, is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token '
+            + Token.objects.create(user=self.staff).key
+        )
+
+    def test_staff_request_is_profiled(self):
+        response = self.client.get('/api/tags/?profile=1')
+
+        profile = ProfileStore().get(response['X-Profile-Id'])
+        self.assertEqual(profile['path'], '/api/tags/')
+        self.assertEqual(profile['user'], 'staff')
+        self.assertTrue(profile['functions'])
+        self.assertTrue(profile['slowest_queries'][0]['plan'])
+
+    def test_not_staff_request_is_not_profiled(self):
+        user = User.objects.create_user(
+            username='user', email='user@example.com', password='password')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/api/tags/', HTTP_X_PROFILE='1')
+
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(ProfileStore().ids(), [])
+
+    def test_store_is_bounded(self):
+        for _ in range(3):
+            self.client.get('/api/tags/', HTTP_X_PROFILE='1')
+
+        self.assertEqual(len(ProfileStore().ids()), 2)
+
+    def test_profiles_are_shown_in_admin(self):
+        profile_id = self.client.get('/api/tags/?profile=1')['X-Profile-Id']
+        self.client.force_login(self.staff)
+
+        changelist = self.client.get('/admin/monitoring/requestprofile/')
+        profile = self.client.get(
+            f'/admin/monitoring/requestprofile/{profile_id}/')
+
+        self.assertContains(changelist, profile_id)
+        self.assertContains(profile, 'Slowest queries')
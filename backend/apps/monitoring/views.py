@@ -0,0 +1,11 @@
+from django.http import HttpResponse
+
+from .metrics import REGISTRY
+
+
+def metrics(request):
+    """Metrics of all the server processes in Prometheus text format."""
+    return HttpResponse(
+        REGISTRY.generate_latest(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,4 +1,7 @@
+from api.estimates import EstimatedCountPaginator
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 from .models import Ingredient, MeasurementUnit, Recipe, Tag
 
@@ -6,6 +9,7 @@ from .models import Ingredient, MeasurementUnit, Recipe, Tag
 class IngredientInline(admin.TabularInline):
     model = Recipe.ingredients.through
     extra = 0
+    autocomplete_fields = ('ingredient', )
 
 
 class TagInline(admin.TabularInline):
@@ -15,21 +19,40 @@ class TagInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', )
+    list_display = ('name', 'author', 'followers_count')
+    list_select_related = ('author', )
     inlines = [IngredientInline, TagInline]
-    list_filter = ('name', 'author__username', 'tags')
+    list_filter = ('tags', )
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author', )
     fields = (
         'name', 'image', 'text', 'author', 'cooking_time', 'followers_count')
     readonly_fields = ('followers_count', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+    def get_queryset(self, request):
+        # Subquery counts only the rows of the page, unlike GROUP BY
+        followers = Recipe.followers.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).values('recipe_id').annotate(count=Count('*')).values('count')
+        return super().get_queryset(request).annotate(
+            followers_count=Coalesce(
+                Subquery(followers, output_field=IntegerField()), 0)
+        )
+
+    @admin.display(ordering='followers_count')
     def followers_count(self, obj):
-        return obj.followers.count()
+        return obj.followers_count
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name', )
+    list_select_related = ('measurement_unit', )
+    search_fields = ('name', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(MeasurementUnit)
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.2 on 2026-10-19 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_remove_recipe_tags_delete_recipetagmap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        # Auto-created M2M tables index every foreign key column, but the
+        # single column index of user_id (tag_id) still needs table lookups
+        # for recipe_id. The composite indexes serve the favorites of a user
+        # and the recipes of a tag by index-only scans
+        migrations.RunSQL(
+            sql='CREATE INDEX recipe_followers_user_recipe_idx '
+                'ON recipes_recipe_followers (user_id, recipe_id)',
+            reverse_sql='DROP INDEX recipe_followers_user_recipe_idx',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX recipe_tags_tag_recipe_idx '
+                'ON recipes_recipe_tags (tag_id, recipe_id)',
+            reverse_sql='DROP INDEX recipe_tags_tag_recipe_idx',
+        ),
+    ]
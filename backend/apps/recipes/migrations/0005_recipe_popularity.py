@@ -0,0 +1,55 @@
+# Generated by Django 4.0.2 on 2026-10-19 09:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 2000
+
+
+def count_favorites(apps, schema_editor):
+    """Fills the favorites counts of the recipes which have favorites."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    db_alias = schema_editor.connection.alias
+    counts = Recipe.followers.through.objects.using(db_alias).values_list(
+        'recipe_id').annotate(count=Count('*')).order_by('recipe_id')
+    recipes = [
+        Recipe(pk=recipe_id, favorites_count=count)
+        for recipe_id, count in counts.iterator(chunk_size=BATCH_SIZE)
+    ]
+    Recipe.objects.using(db_alias).bulk_update(
+        recipes, ['favorites_count'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Favorites count'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, verbose_name='Trending score'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_updated_at',
+            field=models.FloatField(default=0, verbose_name='Trending score update time (Unix time)'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date'], name='recipe_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(
+            count_favorites, reverse_code=migrations.RunPython.noop),
+    ]
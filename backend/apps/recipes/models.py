@@ -39,11 +39,41 @@ class Recipe(models.Model):
         to=User,
         related_name='favourite_recipes'
     )
+    # Denormalized by api.popularity for the orderings of the recipe list
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Favorites count',
+        default=0,
+    )
+    trending_score = models.FloatField(
+        verbose_name='Trending score',
+        default=0,
+    )
+    trending_updated_at = models.FloatField(
+        verbose_name='Trending score update time (Unix time)',
+        default=0,
+    )
 
     class Meta:
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
         ordering = ('-pub_date',)
+        indexes = [
+            # The feed and the recipes of an author, newest first
+            models.Index(fields=('-pub_date', ), name='recipe_pub_date_idx'),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+            # The orderings of the recipe list by popularity
+            models.Index(
+                fields=('-favorites_count', '-pub_date'),
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=('-trending_score', '-pub_date'),
+                name='recipe_trending_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
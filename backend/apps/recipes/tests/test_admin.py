@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, MeasurementUnit, Recipe
+from users.admin import INLINE_LIMIT
+
+User = get_user_model()
+
+
+class AdminScaleTest(TestCase):
+    """The number of queries of the admin pages does not depend on the
+    amount of data."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password')
+        cls.unit = MeasurementUnit.objects.create(name='g')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_data(self, number: int) -> None:
+        start = Recipe.objects.count()
+        for index in range(start, start + number):
+            user = User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com')
+            self.admin.followings.add(user)
+            recipe = Recipe.objects.create(
+                name=f'Recipe {index}', text='Text', author=self.admin,
+                image='recipes/image.png', cooking_time=10,
+            )
+            recipe.followers.add(self.admin, user)
+            Ingredient.objects.create(
+                name=f'Ingredient {index}', measurement_unit=self.unit)
+
+    def count_queries(self, path: str) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_counts(self):
+        paths = (
+            '/admin/recipes/recipe/',
+            '/admin/recipes/recipe/?q=Recipe',
+            '/admin/recipes/ingredient/',
+            '/admin/users/user/',
+            f'/admin/users/user/{self.admin.pk}/change/',
+        )
+        self.add_data(2)
+        small = [self.count_queries(path) for path in paths]
+        self.add_data(INLINE_LIMIT + 5)
+        large = [self.count_queries(path) for path in paths]
+
+        self.assertEqual(large, small)
+
+    def test_followers_count_and_inline_limit(self):
+        self.add_data(INLINE_LIMIT + 5)
+        recipe = Recipe.objects.first()
+
+        response = self.client.get(
+            f'/admin/recipes/recipe/{recipe.pk}/change/')
+        self.assertContains(response, '<div class="readonly">2</div>')
+        response = self.client.get(
+            f'/admin/users/user/{self.admin.pk}/change/')
+        self.assertEqual(
+            response.context['inline_admin_formsets'][1].formset.total_form_count(),  # noqa: E501
+            INLINE_LIMIT,
+        )
@@ -1,14 +1,14 @@
+from api.estimates import EstimatedCountPaginator
 from django.contrib import admin
 
-from .models import ShoppingCart
+from .models import CartItem
 
 
-class RecipeInline(admin.TabularInline):
-    model = ShoppingCart.recipes.through
-    extra = 0
-
-
-@admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    fields = ('owner', )
-    inlines = [RecipeInline]
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipe', 'added_at')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', )
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping_carts', '0003_remove_shoppingcart_recipes_and_more'),
+    ]
+
+    operations = [
+        # The recipe flags of the API look up the carts of a recipe, the
+        # auto-created M2M table has the unique (shoppingcart_id, recipe_id)
+        # index only
+        migrations.RunSQL(
+            sql='CREATE INDEX shoppingcart_recipes_recipe_cart_idx '
+                'ON shopping_carts_shoppingcart_recipes '
+                '(recipe_id, shoppingcart_id)',
+            reverse_sql='DROP INDEX shoppingcart_recipes_recipe_cart_idx',
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.0.2 on 2026-10-19 08:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def copy_carts_to_items(apps, schema_editor):
+    """Every recipe of the carts of a user becomes a cart item of the
+    user, the duplicated carts of one owner are merged."""
+    ShoppingCart = apps.get_model('shopping_carts', 'ShoppingCart')
+    CartItem = apps.get_model('shopping_carts', 'CartItem')
+    db_alias = schema_editor.connection.alias
+    rows = ShoppingCart.recipes.through.objects.using(db_alias).values_list(
+        'shoppingcart__owner_id', 'recipe_id').order_by().distinct()
+    items = []
+    for user_id, recipe_id in rows.iterator(chunk_size=BATCH_SIZE):
+        items.append(CartItem(user_id=user_id, recipe_id=recipe_id))
+        if len(items) == BATCH_SIZE:
+            CartItem.objects.using(db_alias).bulk_create(items)
+            items = []
+    CartItem.objects.using(db_alias).bulk_create(items)
+
+
+def copy_items_to_carts(apps, schema_editor):
+    ShoppingCart = apps.get_model('shopping_carts', 'ShoppingCart')
+    CartItem = apps.get_model('shopping_carts', 'CartItem')
+    db_alias = schema_editor.connection.alias
+    user_ids = CartItem.objects.using(db_alias).values_list(
+        'user_id', flat=True).order_by().distinct()
+    ShoppingCart.objects.using(db_alias).bulk_create([
+        ShoppingCart(owner_id=user_id) for user_id in user_ids
+    ], batch_size=BATCH_SIZE)
+    cart_ids = dict(
+        ShoppingCart.objects.using(db_alias).values_list('owner_id', 'id'))
+    through = ShoppingCart.recipes.through
+    through.objects.using(db_alias).bulk_create([
+        through(shoppingcart_id=cart_ids[user_id], recipe_id=recipe_id)
+        for user_id, recipe_id in CartItem.objects.using(
+            db_alias).values_list('user_id', 'recipe_id').iterator()
+    ], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_recipe_indexes'),
+        ('shopping_carts', '0004_shoppingcart_recipes_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True, verbose_name='Added at')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='recipes.recipe', verbose_name='Recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Cart item',
+                'verbose_name_plural': 'Cart items',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['recipe', 'user'], name='cart_item_recipe_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='cart_item_unique'),
+        ),
+        migrations.RunPython(
+            code=copy_carts_to_items, reverse_code=copy_items_to_carts),
+        # The index of 0004 is dropped explicitly, so it is created again
+        # when the table of the carts is restored in reverse
+        migrations.RunSQL(
+            sql='DROP INDEX shoppingcart_recipes_recipe_cart_idx',
+            reverse_sql='CREATE INDEX shoppingcart_recipes_recipe_cart_idx '
+                        'ON shopping_carts_shoppingcart_recipes '
+                        '(recipe_id, shoppingcart_id)',
+        ),
+        migrations.DeleteModel(
+            name='ShoppingCart',
+        ),
+    ]
@@ -5,18 +5,39 @@ from recipes.models import Recipe
 User = get_user_model()
 
 
-class ShoppingCart(models.Model):
-    owner = models.ForeignKey(
-        verbose_name='Owner',
+class CartItem(models.Model):
+    user = models.ForeignKey(
+        verbose_name='User',
         to=User,
-        related_name='shopping_cart',
+        related_name='cart_items',
         on_delete=models.CASCADE,
     )
-    recipes = models.ManyToManyField(
-        verbose_name='Recipes',
+    recipe = models.ForeignKey(
+        verbose_name='Recipe',
         to=Recipe,
-        related_name='shopping_carts',
+        related_name='cart_items',
+        on_delete=models.CASCADE,
+    )
+    added_at = models.DateTimeField(
+        verbose_name='Added at',
+        auto_now_add=True,
     )
 
+    class Meta:
+        verbose_name = 'Cart item'
+        verbose_name_plural = 'Cart items'
+        constraints = [
+            # Also the covering index of the cart of a user
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='cart_item_unique'
+            )
+        ]
+        indexes = [
+            # `is_in_shopping_cart` flags look up the users by the recipe
+            models.Index(
+                fields=('recipe', 'user'), name='cart_item_recipe_user_idx'),
+        ]
+
     def __str__(self):
-        return f'Shopping cart of {self.owner.username}'
+        return f'{self.recipe.name} in shopping cart of {self.user.username}'
@@ -1,36 +1,75 @@
+from api.estimates import EstimatedCountPaginator
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.forms.models import BaseInlineFormSet
 from recipes.models import Recipe
 
 from .models import User
 
+# Rows of every inline of the user page
+INLINE_LIMIT = 20
 
-class FollowInline(admin.TabularInline):
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    """Formset of the first INLINE_LIMIT objects of the parent."""
+
+    def get_queryset(self):
+        if not hasattr(self, '_limited_queryset'):
+            queryset = super().get_queryset()
+            # Sliced querysets can not be filtered by the admin
+            self._limited_queryset = queryset.filter(pk__in=list(
+                queryset.values_list('pk', flat=True)[:INLINE_LIMIT]))
+        return self._limited_queryset
+
+
+class ReadOnlyLimitedInline(admin.TabularInline):
+    """Read only inline which shows INLINE_LIMIT objects at most, the rest
+    are found in the changelists."""
+    formset = LimitedInlineFormSet
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class FollowInline(ReadOnlyLimitedInline):
     model = User.followings.through
     fk_name = 'from_user'
-    extra = 0
     verbose_name = 'Following'
-    verbose_name_plural = 'Followings'
+    verbose_name_plural = f'Followings (first {INLINE_LIMIT})'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('to_user')
 
 
-class RecipeInline(admin.TabularInline):
+class RecipeInline(ReadOnlyLimitedInline):
     model = Recipe
     fields = ('name', 'image', 'text',)
     readonly_fields = ('name', 'image', 'text', )
-    extra = 0
     verbose_name = 'Recipe'
-    verbose_name_plural = 'Recipes'
+    verbose_name_plural = f'Recipes (latest {INLINE_LIMIT})'
 
 
-class FavouriteRecipeInline(admin.TabularInline):
+class FavouriteRecipeInline(ReadOnlyLimitedInline):
     model = User.favourite_recipes.through
-    extra = 0
     verbose_name = 'Favorite recipe'
-    verbose_name_plural = 'Favourite recipes'
+    verbose_name_plural = f'Favourite recipes (first {INLINE_LIMIT})'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('recipe')
 
 
 @admin.register(User)
 class FoodgramUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name')
     inlines = [FollowInline, RecipeInline, FavouriteRecipeInline]
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_active')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -13,10 +13,20 @@ then
 
 fi
 
+if [ -n "$METRICS_MULTIPROC_DIR" ]
+then
+  echo "Clean metrics directory"
+  rm -rf "$METRICS_MULTIPROC_DIR"
+  mkdir -p "$METRICS_MULTIPROC_DIR"
+fi
+
 echo "Collect static files"
 python manage.py collectstatic --noinput
 
 echo "Apply database migrations"
 python manage.py migrate
 
+echo "Generate API schema"
+python manage.py generate_schema
+
 exec "$@"
\ No newline at end of file
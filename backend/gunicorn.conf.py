@@ -0,0 +1,116 @@
+"""Gunicorn configuration of the backend.
+
+Gunicorn reads it from the working directory, so `gunicorn` without
+arguments starts the server. Every setting can be changed with environment
+variables.
+"""
+
+import math
+import multiprocessing
+import os
+import sys
+
+# The apps of the project, importable by the hooks of the master without
+# preload_app
+APPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'apps')
+
+WORKER_CLASSES = {
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+APPLICATIONS = {
+    'gthread': 'api_foodgram.wsgi:application',
+    'uvicorn': 'api_foodgram.asgi:application',
+}
+
+
+def available_cores() -> int:
+    """CPU cores available to the process, limited by the CPU quota of the
+    container (cgroup v2 or v1)."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = multiprocessing.cpu_count()
+
+    quota_files = (
+        ('/sys/fs/cgroup/cpu.max', None),
+        (
+            '/sys/fs/cgroup/cpu/cpu.cfs_quota_us',
+            '/sys/fs/cgroup/cpu/cpu.cfs_period_us',
+        ),
+    )
+    for quota_path, period_path in quota_files:
+        try:
+            with open(quota_path) as file:
+                values = file.read().split()
+            if period_path is not None:
+                with open(period_path) as file:
+                    values.append(file.read().strip())
+            quota, period = values[:2]
+            if quota not in ('max', '-1'):
+                cores = min(cores, math.ceil(int(quota) / int(period)))
+            break
+        except (OSError, ValueError):
+            continue
+    return max(cores, 1)
+
+
+kind = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if kind not in WORKER_CLASSES:
+    raise ValueError(
+        f'GUNICORN_WORKER_CLASS must be one of {", ".join(WORKER_CLASSES)}')
+cores = available_cores()
+
+wsgi_app = APPLICATIONS[kind]
+worker_class = WORKER_CLASSES[kind]
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+# Threads of gthread workers wait for the database most of the time, so
+# there are more workers than cores. Uvicorn workers do not block on I/O
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', 2 * cores + 1 if kind == 'gthread' else cores))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Imports, settings and URL resolution are done once in the master process
+# and shared by the workers copy-on-write
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Workers are restarted after a random number of requests around
+# max_requests (not all at the same time) to limit memory growth. They
+# finish the requests in progress within graceful_timeout
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+# Behind nginx
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Heartbeat files in memory, as /tmp of a container may be on disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def _warm_up(log) -> None:
+    from api.warmup import warm_up
+
+    log.info('Warmed up in %.2fs', warm_up())
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        _warm_up(server.log)
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log)
+
+
+def child_exit(server, worker):
+    # The metrics of the exited worker are merged into a single file, so
+    # the recycled workers do not add files read by every scrape
+    directory = os.getenv('METRICS_MULTIPROC_DIR')
+    if directory:
+        if APPS_DIR not in sys.path:
+            sys.path.insert(0, APPS_DIR)
+        from monitoring.metrics import archive_process
+
+        archive_process(directory, worker.pid)